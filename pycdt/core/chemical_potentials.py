@@ -17,10 +17,11 @@ import logging
 
 from pymatgen import Structure, Element
 from pymatgen.entries.computed_entries import ComputedStructureEntry
-from pymatgen.ext.matproj import MPRester
 from pymatgen.io.vasp.outputs import Vasprun
 from pymatgen.analysis.phase_diagram import PhaseDiagram
 
+from pycdt.utils.mp_provider import get_mp_provider
+
 def get_mp_chempots_from_dpd(dpd):
     """
     Grab Materials Project chemical potentials from a pymatgen DefectPhaseDiagram object
@@ -331,8 +332,8 @@ class MPChemPotAnalyzer(ChemPotAnalyzer):
         redcomp = bulk_composition.reduced_composition
         if not self.entries:
             self.bulk_species_symbol = [s.symbol for s in redcomp.elements]
-            with MPRester(api_key=self.mapi_key) as mp:
-                self.entries['bulk_derived'] = mp.get_entries_in_chemsys(self.bulk_species_symbol)
+            mp = get_mp_provider(self.mapi_key)
+            self.entries['bulk_derived'] = mp.get_entries_in_chemsys(self.bulk_species_symbol)
 
         pd = PhaseDiagram(self.entries['bulk_derived'])
         chem_lims = pd.get_all_chempots(redcomp)
@@ -350,14 +351,14 @@ class MPChemPotAnalyzer(ChemPotAnalyzer):
                 (if not in ~/.pmgrc.yaml already)
         """
         logger = logging.getLogger(__name__)
+        mp = get_mp_provider(self.mapi_key)
 
         if self.bulk_ce:
             self.bulk_species_symbol = [s.symbol for s in self.bulk_ce.composition.elements]
             self.redcomp = self.bulk_ce.composition.reduced_composition
             bce_override = True
         elif self.mpid:
-            with MPRester(api_key=self.mapi_key) as mp:
-                self.bulk_ce = mp.get_entry_by_material_id(self.mpid)
+            self.bulk_ce = mp.get_entry_by_material_id(self.mpid)
             self.bulk_species_symbol = [s.symbol for s in self.bulk_ce.composition.elements]
             self.redcomp = self.bulk_ce.composition.reduced_composition
             bce_override = False
@@ -372,8 +373,7 @@ class MPChemPotAnalyzer(ChemPotAnalyzer):
             for sub_el in self.sub_species:
                 species_symbols.append(sub_el)
 
-            with MPRester(api_key=self.mapi_key) as mp:
-                self.entries['bulk_derived'] = mp.get_entries_in_chemsys(species_symbols)
+            self.entries['bulk_derived'] = mp.get_entries_in_chemsys(species_symbols)
 
             self.entries['subs_set'] = {sub_el:[] for sub_el in self.sub_species}
             for entry in self.entries['bulk_derived']:
@@ -382,10 +382,9 @@ class MPChemPotAnalyzer(ChemPotAnalyzer):
                         self.entries['subs_set'][sub_el].append(entry)
 
         else: #this is recommended approach for running sub species seperately (assumes subs are in dilute concentrations)
-            with MPRester(api_key=self.mapi_key) as mp:
-                self.entries['bulk_derived'] = mp.get_entries_in_chemsys(self.bulk_species_symbol)
-                if self.mpid and bce_override: #overriding bulk_ce if mp-id is given.
-                    self.bulk_ce = mp.get_entry_by_material_id(self.mpid)
+            self.entries['bulk_derived'] = mp.get_entries_in_chemsys(self.bulk_species_symbol)
+            if self.mpid and bce_override: #overriding bulk_ce if mp-id is given.
+                self.bulk_ce = mp.get_entry_by_material_id(self.mpid)
             if not self.entries:
                 msg = "Could not fetch bulk entries for atomic chempots!" \
                       "MPRester query error."
@@ -397,8 +396,7 @@ class MPChemPotAnalyzer(ChemPotAnalyzer):
             bulk_entry_set = [entry.entry_id for entry in self.entries['bulk_derived']]
             for sub_el in self.sub_species:
                 els = self.bulk_species_symbol + [sub_el]
-                with MPRester(api_key=self.mapi_key) as mp:
-                    sub_entry_set = mp.get_entries_in_chemsys(els)
+                sub_entry_set = mp.get_entries_in_chemsys(els)
                 if not sub_entry_set:
                     msg = "Could not fetch sub entries for {} atomic chempots! " \
                           "Encountered MPRester query error".format(sub_el)
@@ -722,8 +720,8 @@ class UserChemPotInputGenerator(object):
 
         for entry in full_structure_entries:
             if (entry.name in setupphases) and (pd.get_decomp_and_e_above_hull(entry, allow_negative=True)[1] <= energy_above_hull):
-                with MPRester(api_key=self.mapi_key) as mp:
-                    localstruct = mp.get_structure_by_material_id(entry.entry_id)
+                localstruct = get_mp_provider(self.mapi_key).get_structure_by_material_id(
+                    entry.entry_id)
                 structures_to_setup[str(entry.entry_id)+'_'+str(entry.name)] = localstruct
 
         #Set up structure files locally if desired
@@ -23,14 +23,233 @@ If you use the corrections implemented in this module, cite
 __author__ = 'Danny Broberg, Bharat Medasani'
 __email__ = 'dbroberg@gmail.com, mbkumar@gmail.com'
 
+import json
+import math
+
 import numpy as np
+import scipy.integrate
 
 from pycdt.corrections.sxdefect_correction import SxdefectalignWrapper as SXD
 from pymatgen.analysis.defects.corrections import FreysoldtCorrection, KumagaiCorrection
+from pymatgen.analysis.defects.utils import ang_to_bohr, hart_to_ev, eV_to_k, \
+        invang_to_ev, converge
+
+
+def _reciprocal_lattice_slabs(a1, a2, a3, encut):
+    """
+    Reciprocal lattice vectors i*b1 + j*b2 + k*b3 within the box
+    |i|, |j|, |k| <= imax enclosing the cutoff sphere, in (i, j, k) order,
+    one slab of constant i (a (2*imax+1)^2 x 3 array) at a time so that the
+    memory used does not grow with the cube of imax.
+    """
+    vol = np.dot(a1, np.cross(a2, a3))  # 1/bohr^3
+    b1 = (2 * np.pi / vol) * np.cross(a2, a3)  # units 1/bohr
+    b2 = (2 * np.pi / vol) * np.cross(a3, a1)
+    b3 = (2 * np.pi / vol) * np.cross(a1, a2)
+
+    gcut = eV_to_k(encut)
+    imax = int(math.ceil(gcut/min(np.linalg.norm(b1), np.linalg.norm(b2),
+                                  np.linalg.norm(b3))))
+
+    n = np.arange(-imax, imax + 1)
+    j, k = [x.reshape(-1, 1) for x in np.meshgrid(n, n, indexing='ij')]
+    jb2, kb3 = j*b2, k*b3
+    for i in n:
+        # same order of the operations as i*b1 + j*b2 + k*b3
+        yield (i*b1 + jb2) + kb3
+
+
+def reciprocal_vectors(a1, a2, a3, encut, sort_by_shell=False):
+    """
+    Reciprocal lattice vectors with energy less than encut, as an array.
+    Args:
+        a1, a2, a3: lattice vectors in bohr
+        encut: energy cut off in eV
+        sort_by_shell (bool): sort the vectors by length. Vectors of the
+            same length are kept in (i, j, k) order.
+    Returns:
+        N x 3 array of the reciprocal lattice vectors (1/bohr), in (i, j, k)
+        order of the multiples of the reciprocal basis vectors unless
+        sorted by shell
+    """
+    vecs, ens = [], []
+    for slab in _reciprocal_lattice_slabs(a1, a2, a3, encut):
+        en = invang_to_ev * (((1.0/ang_to_bohr) * np.linalg.norm(slab, axis=1))**2)
+        inside = (en <= encut) & (en != 0)
+        vecs.append(slab[inside])
+        ens.append(en[inside])
+    vecs = np.concatenate(vecs)
+    if sort_by_shell:
+        vecs = vecs[np.argsort(np.concatenate(ens), kind='stable')]
+    return vecs
+
+
+def reciprocal_vectors_squared(a1, a2, a3, encut, sort_by_shell=False):
+    """
+    Squared magnitudes of the reciprocal vectors within the cutoff, as an
+    array.
+    Args:
+        a1: Lattice vector a (in Bohrs)
+        a2: Lattice vector b (in Bohrs)
+        a3: Lattice vector c (in Bohrs)
+        encut: Reciprocal vector energy cutoff
+        sort_by_shell (bool): sort the magnitudes in increasing order
+
+    Returns:
+        Array of the squares of the reciprocal vectors (1/Bohr)^2
+        determined by a1, a2, a3 and whose magntidue is less than gcut^2.
+    """
+    gcut = eV_to_k(encut)
+    gcut2 = gcut * gcut
+    vec2s = []
+    for slab in _reciprocal_lattice_slabs(a1, a2, a3, encut):
+        # row by row dot products, as np.dot(vec, vec)
+        vec2 = np.matmul(slab[:, None, :], slab[:, :, None])[:, 0, 0]
+        vec2s.append(vec2[(vec2 <= gcut2) & (vec2 != 0.0)])
+    vec2s = np.concatenate(vec2s)
+    if sort_by_shell:
+        vec2s = np.sort(vec2s, kind='stable')
+    return vec2s
+
+
+class BatchFreysoldtCorrection(FreysoldtCorrection):
+    """
+    FreysoldtCorrection for all the defect entries of a bulk supercell.
+    The point charge energy sums over the reciprocal vectors, which only
+    depend on the lattice, the charge model and the energy cutoff (the
+    charge only scales them), are shared by the entries: the reciprocal
+    vectors of a lattice are generated once, sorted by shell, with the
+    cumulative sums of their terms, so that the sum at each step of the
+    convergence in energy cutoff is a lookup. The electrostatic term of a
+    charge state is computed once per lattice. The potential alignment
+    terms are computed for each entry.
+    """
+
+    def __init__(self, dielectric_const, q_model=None, energy_cutoff=520,
+                 madetol=0.0001, axis=None):
+        FreysoldtCorrection.__init__(self, dielectric_const, q_model=q_model,
+                                     energy_cutoff=energy_cutoff,
+                                     madetol=madetol, axis=axis)
+        self._periodic_sums = {}
+        self._isolated_sums = {}
+        self._es_corrs = {}
+
+    def get_correction(self, entry):
+        # metadata (potential plots and uncertainties) of this entry only
+        self.metadata = {"pot_plot_data": {}, "pot_corr_uncertainty_md": {}}
+        return FreysoldtCorrection.get_correction(self, entry)
+
+    def get_corrections(self, entries):
+        """
+        Freysoldt corrections of defect entries of the bulk supercell
+
+        Args:
+            entries ([DefectEntry]): defect entries with the parameters
+                required by get_correction
+        Returns:
+            list of the FreysoldtCorrection values of the entries, as
+            dictionaries
+        """
+        return [self.get_correction(entry) for entry in entries]
+
+    def _get_periodic_sum(self, lattice, encut):
+        """
+        Volume (bohr^3) of a lattice and sum of the periodic energy terms
+        of a unit charge over its reciprocal vectors within encut
+        """
+        key = np.round(lattice.matrix, 8).tobytes()
+        vol, shells_encut, g2, cumsum = self._periodic_sums.get(
+            key, (None, -1, None, None))
+        if encut > shells_encut:
+            # generate the shells ahead of the convergence steps, so that
+            # they are only generated a few times
+            shells_encut = max(encut, min(2 * shells_encut, self.energy_cutoff))
+            [a1, a2, a3] = ang_to_bohr * np.array(lattice.get_cartesian_coords(1))
+            vol = np.dot(a1, np.cross(a2, a3))
+            g2 = reciprocal_vectors_squared(a1, a2, a3, shells_encut,
+                                            sort_by_shell=True)
+            cumsum = np.cumsum((self.q_model.rho_rec(g2) ** 2) / g2)
+            self._periodic_sums[key] = (vol, shells_encut, g2, cumsum)
+
+        gcut = eV_to_k(encut)
+        nvec = np.searchsorted(g2, gcut * gcut, side="right")
+        return vol, (cumsum[nvec - 1] if nvec else 0.)
+
+    def perform_es_corr(self, lattice, q, step=1e-4):
+        """
+        Peform Electrostatic Freysoldt Correction from the shared sums
+        Args:
+            lattice: Pymatgen lattice object
+            q (int): Charge of defect
+            step (float): step size for numerical integration
+        Return:
+            Electrostatic Point Charge contribution to Freysoldt Correction (float)
+        """
+        key = (np.round(lattice.matrix, 8).tobytes(), q, step)
+        if key in self._es_corrs:
+            return self._es_corrs[key]
+
+        def e_iso(encut):
+            if (encut, step) not in self._isolated_sums:
+                gcut = eV_to_k(encut)
+                self._isolated_sums[(encut, step)] = scipy.integrate.quad(
+                    lambda g: self.q_model.rho_rec(g * g) ** 2, step, gcut)[0]
+            return self._isolated_sums[(encut, step)] * (q ** 2) / np.pi
+
+        def e_per(encut):
+            vol, eper = self._get_periodic_sum(lattice, encut)
+            eper *= (q ** 2) * 2 * round(np.pi, 6) / vol
+            eper += (q ** 2) * 4 * round(np.pi, 6) * self.q_model.rho_rec_limit0 / vol
+            return eper
+
+        eiso = converge(e_iso, 5, self.madetol, self.energy_cutoff)
+        eper = converge(e_per, 5, self.madetol, self.energy_cutoff)
+        es_corr = round((eiso - eper) / self.dielectric * hart_to_ev, 6)
+        self._es_corrs[key] = es_corr
+        return es_corr
+
+
+def _freysoldt_correction_key(defect_entry, epsilon, axis=None):
+    """
+    Settings of the Freysoldt correction of a defect entry; entries with
+    the same settings can share a BatchFreysoldtCorrection
+    """
+    q_model = defect_entry.parameters.get('q_model', None)
+    if q_model is not None:
+        q_model = json.dumps(q_model.as_dict(), sort_keys=True)
+    return (json.dumps(np.array(epsilon).tolist()), q_model,
+            defect_entry.parameters.get('encut', 520),
+            defect_entry.parameters.get('madetol', 0.0001),
+            json.dumps(np.array(axis).tolist()) if axis is not None else None)
+
+
+def get_batch_freysoldt_correction(defect_entry, epsilon, axis=None,
+                                   corrections=None):
+    """
+    BatchFreysoldtCorrection of a defect entry, shared by the entries with
+    the same correction settings.
+
+    Args:
+        defect_entry (DefectEntry): defect entry to correct
+        epsilon (float or 3x3 matrix): Dielectric constant for the structure
+        axis (int or None): axis of the correction (see get_correction_freysoldt)
+        corrections (dict): BatchFreysoldtCorrection objects by settings,
+            updated with the new ones
+    """
+    key = _freysoldt_correction_key(defect_entry, epsilon, axis)
+    if corrections is None or key not in corrections:
+        corr_class = BatchFreysoldtCorrection(
+            epsilon, q_model=defect_entry.parameters.get('q_model', None),
+            energy_cutoff=defect_entry.parameters.get('encut', 520),
+            madetol=defect_entry.parameters.get('madetol', 0.0001), axis=axis)
+        if corrections is None:
+            return corr_class
+        corrections[key] = corr_class
+    return corrections[key]
 
 
 def get_correction_freysoldt( defect_entry, epsilon, title = None,
-                              partflag='All', axis=None):
+                              partflag='All', axis=None, corr_class=None):
     """
     Function to compute the isotropic freysoldt correction for each defect.
     If this correction is used, please reference Freysoldt's original paper.
@@ -77,6 +296,10 @@ def get_correction_freysoldt( defect_entry, epsilon, title = None,
                'AllSplit' for individual parts split up (form is [PC, potterm, full])
         axis (int or None): if integer, then freysoldt correction is performed on the single axis.
             If it is None, then averaging of the corrections for the three axes is used for the correction.
+        corr_class (FreysoldtCorrection): correction object to use, e.g. a
+            BatchFreysoldtCorrection shared by the entries of a supercell
+            (see get_corrections_freysoldt). Must have the same settings as
+            the entry. If None, a new FreysoldtCorrection is used.
 
     Returns Correction
     """
@@ -94,8 +317,9 @@ def get_correction_freysoldt( defect_entry, epsilon, title = None,
         return 0.
 
     template_defect = defect_entry.copy()
-    corr_class = FreysoldtCorrection( epsilon, q_model = q_model, energy_cutoff=encut, madetol=madetol,
-                                      axis= axis)
+    if corr_class is None:
+        corr_class = FreysoldtCorrection( epsilon, q_model = q_model, energy_cutoff=encut, madetol=madetol,
+                                          axis= axis)
     f_corr_summ = corr_class.get_correction( template_defect)
 
     if title:
@@ -126,6 +350,36 @@ def get_correction_freysoldt( defect_entry, epsilon, title = None,
     return freyval
 
 
+def get_corrections_freysoldt( defect_entries, epsilon, titles=None,
+                               partflag='All', axis=None):
+    """
+    Isotropic Freysoldt corrections of the defect entries of a bulk
+    supercell. The point charge energy sums are computed once for all the
+    entries with the same lattice and correction settings (see
+    BatchFreysoldtCorrection) instead of once per entry.
+
+    Args:
+        defect_entries ([DefectEntry]): defect entries with the parameters
+            required by get_correction_freysoldt
+        epsilon (float or 3x3 matrix): Dielectric constant for the structure
+        titles ([str]): titles of the potential plots of the entries
+            (see get_correction_freysoldt). None for no plots.
+        partflag: output of the corrections (see get_correction_freysoldt)
+        axis (int or None): axis of the correction (see get_correction_freysoldt)
+
+    Returns:
+        list of the corrections of the entries, as returned by
+        get_correction_freysoldt
+    """
+    titles = titles or [None] * len(defect_entries)
+    corrections = {}
+    return [get_correction_freysoldt(
+                defect_entry, epsilon, title=title, partflag=partflag, axis=axis,
+                corr_class=get_batch_freysoldt_correction(
+                    defect_entry, epsilon, axis, corrections))
+            for defect_entry, title in zip(defect_entries, titles)]
+
+
 def get_correction_kumagai( defect_entry, epsilon, title = None,
                               partflag='All'):
     """
@@ -245,4 +499,3 @@ def get_correction_sxdefect(path_def, path_blk, epsilon, pos, charge, title=None
         print('\n Final Sxdefectalign ',nomtype,' correction value is ',sxvals)
 
         return sxvals
-
@@ -16,9 +16,10 @@ __date__ = "August 11, 2015"
 import os
 import numpy as np
 
-from pymatgen.io.vasp.outputs import Locpot
 import matplotlib.pyplot as plt
 
+from pycdt.utils.output_readers import read_locpot
+
 import warnings
 
 warnings.warn("Replacing PyCDT usage of Freysoldt base classes with calls to "
@@ -68,8 +69,8 @@ class FreysoldtPlot(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potentials')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_defect)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_defect)
         get_agrid = bulkloc.get_axis_grid
         get_baavg = bulkloc.get_average_along_axis
         get_daavg = defloc.get_average_along_axis
@@ -98,8 +99,8 @@ class FreysoldtPlot(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potential difference')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_defect)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_defect)
         for axis in [0,1,2]:
             ax = fig.add_subplot(3, 1, axis+1)
             defect_axis = defloc.get_axis_grid(axis)
@@ -126,8 +127,8 @@ class FreysoldtPlot(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potentials and difference')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_defect)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_defect)
         for axis in [0,1,2]:
             ax = fig.add_subplot(3, 1, axis+1)
             defect_axis = defloc.get_axis_grid(axis)
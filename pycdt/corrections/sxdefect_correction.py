@@ -23,9 +23,10 @@ import subprocess
 import os
 import numpy as np
 
-from pymatgen.io.vasp.outputs import Locpot
 from monty.tempfile import ScratchDir
 
+from pycdt.utils.output_readers import read_locpot
+
 
 class SxdefectalignWrapper(object):
     """
@@ -70,7 +71,7 @@ class SxdefectalignWrapper(object):
         self._frac_coords = site_frac_coords   
         self._encut = encut
         if not lengths:
-            struct=Locpot.from_file(locpot_bulk_path)
+            struct=read_locpot(locpot_bulk_path)
             self._lengths=struct.structure.lattice.abc
             print('had to import lengths, if want to speed up set lengths='+str(self._lengths))
         else:
@@ -121,8 +122,8 @@ class SxdefectalignWrapper(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potentials')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_bulk)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_bulk)
         get_agrid = bulkloc.get_axis_grid
         get_baavg = bulkloc.get_average_along_axis
         get_daavg = defloc.get_average_along_axis
@@ -148,8 +149,8 @@ class SxdefectalignWrapper(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potential difference')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_defect)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_defect)
         for axis in [0,1,2]:
             ax = fig.add_subplot(3, 1, axis+1)
             defect_axis = defloc.get_axis_grid(axis)
@@ -173,8 +174,8 @@ class SxdefectalignWrapper(object):
         fig = plt.figure()
         ax = fig.add_subplot(3,1,1)
         ax.set_title('Locpot planar averaged potentials and difference')
-        bulkloc=Locpot.from_file(self._locpot_bulk)
-        defloc=Locpot.from_file(self._locpot_defect)
+        bulkloc=read_locpot(self._locpot_bulk)
+        defloc=read_locpot(self._locpot_defect)
         for axis in [0,1,2]:
             ax = fig.add_subplot(3, 1, axis+1)
             defect_axis = defloc.get_axis_grid(axis)
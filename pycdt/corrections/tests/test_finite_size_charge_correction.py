@@ -14,10 +14,13 @@ import unittest
 import numpy as np
 
 from pymatgen.core.sites import PeriodicSite
+from pymatgen.core.lattice import Lattice
 from pymatgen.util.testing import PymatgenTest
 from pymatgen.analysis.defects.core import DefectEntry, Vacancy
 
-from pycdt.corrections.finite_size_charge_correction import get_correction_freysoldt, get_correction_kumagai
+from pycdt.corrections.finite_size_charge_correction import get_correction_freysoldt, get_correction_kumagai, \
+        get_corrections_freysoldt, BatchFreysoldtCorrection, reciprocal_vectors, \
+        reciprocal_vectors_squared
 
 
 class FiniteSizeChargeCorrectionTest(PymatgenTest):
@@ -85,6 +88,28 @@ class FiniteSizeChargeCorrectionTest(PymatgenTest):
         self.assertEqual( freyout[1], 4.4700573687929905)
         self.assertEqual( freyout[2], 5.445950368792991)
 
+    def test_get_corrections_freysoldt(self):
+        entries = [self.defect_entry]
+        for charge in [-1, 2]:
+            defect = self.defect_entry.defect.copy()
+            defect.set_charge(charge)
+            entries.append(DefectEntry(defect, 0., parameters=self.defect_entry.parameters))
+        freyouts = get_corrections_freysoldt(entries + [entries[0]], self.epsilon,
+                                             partflag='AllSplit')
+        self.assertEqual(freyouts[0], [0.975893, 4.4700573687929905, 5.445950368792991])
+        self.assertEqual(freyouts[3], freyouts[0])
+        for entry, freyout in zip(entries, freyouts):
+            self.assertEqual(freyout, get_correction_freysoldt(entry, self.epsilon,
+                                                               partflag='AllSplit'))
+
+        # point charge sums shared by the charge states
+        corr_class = BatchFreysoldtCorrection(self.epsilon)
+        corr_class.get_corrections(entries)
+        self.assertEqual(len(corr_class._es_corrs), 3)
+        nsums = len(corr_class._periodic_sums)
+        corr_class.get_correction(entries[0].copy())
+        self.assertEqual(len(corr_class._periodic_sums), nsums)
+
     def test_get_correction_kumagai(self):
         kumagaiout = get_correction_kumagai( self.defect_entry, self.epsilon,
                                             title = None, partflag='AllSplit')
@@ -93,5 +118,34 @@ class FiniteSizeChargeCorrectionTest(PymatgenTest):
         self.assertEqual( kumagaiout[2], 1.2343741327723443)
 
 
+class ReciprocalVectorsTest(PymatgenTest):
+    def setUp(self):
+        self.a, self.b, self.c = Lattice.cubic(5.750183).matrix
+
+    def test_reciprocal_vectors(self):
+        recip = reciprocal_vectors(self.a, self.b, self.c, 1.3)
+        self.assertEqual(recip.shape, (6, 3))
+        self.assertArrayAlmostEqual(np.linalg.norm(recip, axis=1),
+                                    [1.0926931033637688] * 6)
+        self.assertArrayAlmostEqual(recip[0], [-1.0926931033637688, 0., 0.])
+
+        recip = reciprocal_vectors(self.a, self.b, self.c, 5.)
+        shells = reciprocal_vectors(self.a, self.b, self.c, 5., sort_by_shell=True)
+        self.assertTrue((np.diff(np.linalg.norm(shells, axis=1)) > -1e-12).all())
+        self.assertEqual(sorted(map(tuple, shells)), sorted(map(tuple, recip)))
+
+    def test_reciprocal_vectors_squared(self):
+        self.assertArrayAlmostEqual(
+            reciprocal_vectors_squared(self.a, self.b, self.c, 1.3),
+            [1.1939782181387439] * 6)
+        vec2 = reciprocal_vectors_squared(self.a, self.b, self.c, 5.)
+        recip = reciprocal_vectors(self.a, self.b, self.c, 5.)
+        self.assertArrayAlmostEqual(vec2, (recip * recip).sum(axis=1))
+        shells = reciprocal_vectors_squared(self.a, self.b, self.c, 5.,
+                                            sort_by_shell=True)
+        self.assertTrue((np.diff(shells) >= 0).all())
+        self.assertArrayAlmostEqual(shells, np.sort(vec2))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,12 +5,12 @@ correction metodules
 __author__ = 'Danny Broberg, Bharat Medasani'
 __email__ = 'dbroberg@gmail.com, mbkumar@gmail.com'
 
-import math
 import warnings
 import numpy as np
 norm = np.linalg.norm
 
-from pycdt.utils.units import eV_to_k, invang_to_ev, ang_to_bohr
+from pycdt.corrections.finite_size_charge_correction import reciprocal_vectors, \
+        reciprocal_vectors_squared
 
 warnings.warn("Replacing PyCDT correction utils with use "
               "corresponding objects in pymatgen.analysis.defects.corrections\n"
@@ -39,23 +39,10 @@ def genrecip(a1, a2, a3, encut):
         encut: energy cut off in eV
     Returns:
         reciprocal lattice vectors with energy less than encut
+        (iterator over the rows of
+        finite_size_charge_correction.reciprocal_vectors)
     """
-    vol = np.dot(a1, np.cross(a2, a3))  # 1/bohr^3
-    b1 = (2 * np.pi / vol) * np.cross(a2, a3)  # units 1/bohr
-    b2 = (2 * np.pi / vol) * np.cross(a3, a1)
-    b3 = (2 * np.pi / vol) * np.cross(a1, a2)
-
-    # create list of recip space vectors that satisfy |i*b1+j*b2+k*b3|<=encut
-    gcut = eV_to_k(encut)
-    imax = int(math.ceil(gcut/min(map(norm, [b1, b2, b3]))))
-
-    for i in range(-imax, imax + 1):
-        for j in range(-imax, imax + 1):
-            for k in range(-imax, imax + 1):
-                vec = i*b1 + j*b2 + k*b3
-                en = invang_to_ev * (((1.0/ang_to_bohr) * norm(vec))**2)
-                if (en <= encut and en != 0):
-                    yield vec
+    return iter(reciprocal_vectors(a1, a2, a3, encut))
 
 
 warnings.warn("Replacing PyCDT correction utils with use "
@@ -74,25 +61,11 @@ def generate_reciprocal_vectors_squared(a1, a2, a3, encut):
 
     Returns:
         [[g1^2], [g2^2], ...] Square of reciprocal vectors (1/Bohr)^2 
-        determined by a1, a2, a3 and whose magntidue is less than gcut^2.
+        determined by a1, a2, a3 and whose magntidue is less than gcut^2
+        (iterator over
+        finite_size_charge_correction.reciprocal_vectors_squared).
     """
-    vol = np.dot(a1, np.cross(a2, a3))  
-    b1 = (2 * np.pi / vol) * np.cross(a2, a3)  
-    b2 = (2 * np.pi / vol) * np.cross(a3, a1)
-    b3 = (2 * np.pi / vol) * np.cross(a1, a2)
-
-    # Max (i,j,k) that doesn't upset the condition |i*b1+j*b2+k*b3|<=gcut
-    gcut = eV_to_k(encut)
-    imax = int(math.ceil(gcut/min(norm(b1), norm(b2), norm(b3))))
-    gcut2 = gcut * gcut
-
-    for i in range(-imax, imax+1):
-        for j in range(-imax, imax+1):
-            for k in range(-imax, imax+1):
-                vec = i*b1 + j*b2 + k*b3
-                vec2 = np.dot(vec,vec)
-                if (vec2 <= gcut2 and vec2 != 0.0):
-                    yield vec2
+    return iter(reciprocal_vectors_squared(a1, a2, a3, encut))
 
 
 warnings.warn("Replacing PyCDT correction utils with use "
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+
+"""
+Columnar store of the parsed defect data (the output of
+PostProcess.compile_all). Instead of one json document embedding a full
+bulk supercell structure in every DefectEntry, the store is a folder with
+    manifest.json: the columns, the scalar data (epsilon, vbm, gap,
+        mu_range, ...) and the bulk entry
+    structures/<id>.json: each distinct structure, stored once and
+        referenced by its id (a digest of its content)
+    columns/: one file per column of the defect entries. Uniform scalar
+        columns (energies, charges, paths, ...) are binary numpy arrays,
+        the other columns are json files of their rows.
+Columns are only read when they are used, so that e.g. the formation
+energy analysis does not read the planar averages or site potentials.
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import json
+import shutil
+import numbers
+import importlib
+
+import numpy as np
+
+from monty.json import MontyEncoder, MontyDecoder
+
+from pymatgen.core.sites import PeriodicSite
+from pymatgen.core.structure import Structure
+from pymatgen.analysis.defects.core import DefectEntry
+
+from pycdt.utils.serialization import structure_digest, dumpfn_interned, \
+        loadfn_interned
+
+STORE_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+
+# columns of the defect entries, besides the "parameters.<key>" columns
+DEFECT_COLUMNS = ["defect_class", "charge", "multiplicity", "site_name",
+                  "site_species", "site_frac_coords", "site_properties",
+                  "structure_id", "uncorrected_energy", "corrections",
+                  "entry_id"]
+
+
+def _to_json(obj):
+    return json.loads(json.dumps(obj, cls=MontyEncoder))
+
+
+def _scalar_array(values):
+    """
+    Values as a numpy array if they are all booleans, numbers or strings,
+    else None.
+    """
+    if all(isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=bool)
+    if all(isinstance(v, numbers.Integral) and
+           not isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=np.int64)
+    if all(isinstance(v, numbers.Real) and
+           not isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=np.float64)
+    if all(isinstance(v, str) for v in values):
+        return np.array(values, dtype=str)
+    return None
+
+
+class _StoreWriter(object):
+    """
+    Writes the columns and the structures of a store in a folder
+    """
+
+    def __init__(self, path, nrows):
+        self.path = path
+        self.nrows = nrows
+        self.columns = {}
+        self.structure_ids = set()
+        os.makedirs(os.path.join(path, "columns"))
+        os.makedirs(os.path.join(path, "structures"))
+
+    def add_structure(self, structure):
+        sid = structure_digest(structure)
+        if sid not in self.structure_ids:
+            with open(os.path.join(self.path, "structures",
+                                   "{}.json".format(sid)), "w") as f:
+                json.dump(_to_json(structure), f)
+            self.structure_ids.add(sid)
+        return sid
+
+    def add_column(self, name, rows):
+        """
+        Args:
+            name (str): name of the column
+            rows (dict): {row index: value}. Rows without a value are
+                returned as None when the column is read.
+        """
+        if not rows:
+            return
+        fname = os.path.join("columns", "{:04d}".format(len(self.columns)))
+        values = [rows[i] for i in sorted(rows)]
+
+        array = None
+        if len(rows) == self.nrows:
+            array = _scalar_array(values)
+            if array is None and all(isinstance(v, np.ndarray) for v in values) \
+                    and len(set((v.shape, v.dtype) for v in values)) == 1:
+                array = np.array(values)
+        if array is not None:
+            np.save(os.path.join(self.path, fname + ".npy"), array)
+            self.columns[name] = {"kind": "array", "file": fname + ".npy"}
+            return
+
+        if all(isinstance(v, Structure) for v in values):
+            kind = "structure"
+            rows = dict((i, self.add_structure(v)) for i, v in rows.items())
+        else:
+            kind = "object"
+        with open(os.path.join(self.path, fname + ".json"), "w") as f:
+            json.dump(dict((str(i), v) for i, v in rows.items()), f,
+                      cls=MontyEncoder)
+        self.columns[name] = {"kind": kind, "file": fname + ".json"}
+
+
+def write_defect_store(defect_data, path):
+    """
+    Write the parsed defect data in a columnar store. An existing store at
+    path is replaced.
+
+    Args:
+        defect_data (dict): parsed defect data, with the DefectEntry
+            objects in "defects" and the bulk entry in "bulk_entry"
+        path (str): folder of the store
+    """
+    entries = list(defect_data.get("defects", []))
+    for entry in entries:
+        if not isinstance(entry, DefectEntry):
+            raise TypeError("Only DefectEntry objects can be stored in a "
+                            "defect store, not {}; write the defect data as "
+                            "json instead".format(type(entry).__name__))
+    if os.path.exists(path) and not \
+            os.path.isfile(os.path.join(path, MANIFEST_FILENAME)):
+        raise ValueError("{} exists and is not a defect store".format(path))
+
+    tmp_path = "{}.tmp{}".format(os.path.normpath(path), os.getpid())
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    writer = _StoreWriter(tmp_path, len(entries))
+
+    columns = dict((name, {}) for name in DEFECT_COLUMNS)
+    parameters = {}
+    for i, entry in enumerate(entries):
+        defect = entry.defect
+        site = defect.site
+        columns["defect_class"][i] = "{}.{}".format(
+            defect.__class__.__module__, defect.__class__.__name__)
+        columns["charge"][i] = defect.charge
+        columns["multiplicity"][i] = defect.multiplicity
+        columns["site_name"][i] = getattr(defect, "site_name", "")
+        columns["site_species"][i] = site.species_string
+        columns["site_frac_coords"][i] = np.array(site.frac_coords, dtype=np.float64)
+        if site.properties:
+            columns["site_properties"][i] = site.properties
+        columns["structure_id"][i] = writer.add_structure(defect.bulk_structure)
+        columns["uncorrected_energy"][i] = entry.uncorrected_energy
+        columns["corrections"][i] = entry.corrections
+        if entry.entry_id is not None:
+            columns["entry_id"][i] = entry.entry_id
+        for key, value in entry.parameters.items():
+            parameters.setdefault(key, {})[i] = value
+
+    for name in DEFECT_COLUMNS:
+        writer.add_column(name, columns[name])
+    for key in sorted(parameters):
+        writer.add_column("parameters." + key, parameters[key])
+
+    bulk_entry = defect_data.get("bulk_entry")
+    if bulk_entry is not None:
+        bulk_entry = _to_json(bulk_entry)
+        if "structure" in bulk_entry:
+            bulk_entry["structure"] = {
+                "@structure_id": writer.add_structure(bulk_entry["structure"])}
+    metadata = dict((k, v) for k, v in defect_data.items()
+                    if k not in ["defects", "bulk_entry"])
+    manifest = {"version": STORE_VERSION, "n_defects": len(entries),
+                "columns": writer.columns, "bulk_entry": bulk_entry,
+                "metadata": _to_json(metadata)}
+    with open(os.path.join(tmp_path, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+class DefectStore(object):
+    """
+    Read access to a columnar store of parsed defect data. Only the
+    manifest is read when the store is opened; the columns and the
+    structures are read when they are first used.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): folder of the store
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_VERSION:
+            raise ValueError("Unsupported defect store version {} in "
+                             "{}".format(manifest.get("version"), path))
+        self.n_defects = manifest["n_defects"]
+        self.metadata = MontyDecoder().process_decoded(manifest["metadata"])
+        self._columns = manifest["columns"]
+        self._bulk_entry = manifest["bulk_entry"]
+        self._column_data = {}
+        self._rows = {}
+        self._structures = {}
+
+    def __len__(self):
+        return self.n_defects
+
+    @property
+    def columns(self):
+        """
+        Names of the columns of the store
+        """
+        return sorted(self._columns)
+
+    @property
+    def parameter_keys(self):
+        """
+        Keys of the parameters of the defect entries
+        """
+        return [name.split(".", 1)[1] for name in self.columns
+                if name.startswith("parameters.")]
+
+    def column(self, name):
+        """
+        Values of a column. Binary columns are returned as (memory-mapped)
+        numpy arrays, the other columns as lists, with None for the rows
+        without a value.
+        """
+        if name in self._column_data:
+            return self._column_data[name]
+        if name not in self._columns:
+            values = [None] * self.n_defects
+        else:
+            info = self._columns[name]
+            fname = os.path.join(self.path, info["file"])
+            if info["kind"] == "array":
+                values = np.load(fname, mmap_mode="r")
+            else:
+                with open(fname) as f:
+                    rows = json.load(f)
+                values = [None] * self.n_defects
+                self._rows[name] = set(int(i) for i in rows)
+                for i, value in rows.items():
+                    if info["kind"] == "structure":
+                        values[int(i)] = self.get_structure(value)
+                    else:
+                        values[int(i)] = MontyDecoder().process_decoded(value)
+        self._column_data[name] = values
+        return values
+
+    def has_value(self, name, i):
+        """
+        Whether row i of a column has a value (possibly None)
+        """
+        if name not in self._columns:
+            return False
+        self.column(name)
+        return i in self._rows.get(name, range(self.n_defects))
+
+    def _value(self, name, i):
+        value = self.column(name)[i]
+        if isinstance(value, np.ndarray) and value.ndim:
+            return np.array(value)
+        return value.item() if isinstance(value, np.generic) else value
+
+    def get_structure(self, sid):
+        """
+        Structure with id sid. Each structure is read once, so the entries
+        of a same bulk structure share the same Structure object.
+        """
+        if sid not in self._structures:
+            with open(os.path.join(self.path, "structures",
+                                   "{}.json".format(sid))) as f:
+                self._structures[sid] = Structure.from_dict(json.load(f))
+        return self._structures[sid]
+
+    @property
+    def bulk_entry(self):
+        if self._bulk_entry is None:
+            return None
+        d = dict(self._bulk_entry)
+        if "structure" in d:
+            d["structure"] = self.get_structure(
+                d["structure"]["@structure_id"]).as_dict()
+        return MontyDecoder().process_decoded(d)
+
+    def get_defect(self, i):
+        """
+        Defect object of row i, on the shared bulk structure
+        """
+        module, cls_name = self._value("defect_class", i).rsplit(".", 1)
+        cls = getattr(importlib.import_module(module), cls_name)
+        structure = self.get_structure(self._value("structure_id", i))
+        site = PeriodicSite(self._value("site_species", i),
+                            self._value("site_frac_coords", i),
+                            structure.lattice,
+                            properties=self._value("site_properties", i))
+        kwargs = {"charge": self._value("charge", i),
+                  "multiplicity": self._value("multiplicity", i)}
+        if self._value("site_name", i):
+            kwargs["site_name"] = self._value("site_name", i)
+        return cls(structure, site, **kwargs)
+
+    def defect_entries(self, parameter_keys=None):
+        """
+        DefectEntry objects of the store.
+
+        Args:
+            parameter_keys ([str]): keys of the parameters to read. None
+                reads all the parameters.
+        """
+        if parameter_keys is None:
+            parameter_keys = self.parameter_keys
+        entries = []
+        for i in range(self.n_defects):
+            parameters = {}
+            for key in parameter_keys:
+                name = "parameters." + key
+                if self.has_value(name, i):
+                    parameters[key] = self._value(name, i)
+            entries.append(DefectEntry(
+                self.get_defect(i), self._value("uncorrected_energy", i),
+                corrections=self._value("corrections", i),
+                parameters=parameters, entry_id=self._value("entry_id", i)))
+        return entries
+
+    def to_defect_data(self, parameter_keys=None):
+        """
+        Parsed defect data, in the form returned by PostProcess.compile_all
+
+        Args:
+            parameter_keys ([str]): keys of the parameters of the defect
+                entries to read. None reads all the parameters.
+        """
+        defect_data = dict(self.metadata)
+        defect_data["defects"] = self.defect_entries(parameter_keys)
+        bulk_entry = self.bulk_entry
+        if bulk_entry is not None:
+            defect_data["bulk_entry"] = bulk_entry
+        return defect_data
+
+
+def _is_json_file(filename):
+    return filename.endswith(".json") or filename.endswith(".json.gz")
+
+
+def dump_defect_data(defect_data, filename):
+    """
+    Write the parsed defect data: as json if the filename ends with .json
+    (or .json.gz), with each distinct structure written once, else as a
+    columnar store in the folder filename.
+    """
+    if _is_json_file(filename):
+        dumpfn_interned(defect_data, filename, indent=2)
+    else:
+        write_defect_store(defect_data, filename)
+
+
+def load_defect_data(filename, parameter_keys=None):
+    """
+    Read parsed defect data written with dump_defect_data (json file or
+    columnar store).
+
+    Args:
+        filename (str): json file or folder of the store
+        parameter_keys ([str]): keys of the parameters of the defect
+            entries to read from a store. None reads all the parameters.
+            All the parameters are read from json files, written with
+            or without interned structures.
+    """
+    if os.path.isdir(filename):
+        return DefectStore(filename).to_defect_data(parameter_keys)
+    return loadfn_interned(filename)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+Reading and writing of the job manifest that records the layout of the
+VASP jobs generated by pycdt (calculation stages, run settings), so that
+the parsers know which outputs to read.
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+
+from monty.serialization import loadfn, dumpfn
+from monty.json import MontyEncoder
+
+MANIFEST_FILENAME = "job_manifest.json"
+
+
+def load_job_manifest(path_base):
+    """
+    Load the job manifest written in path_base.
+
+    Args:
+        path_base (str): Root folder of the defect calculations
+    Returns:
+        dict of {job folder relative to path_base: job info}. Empty dict
+        if no manifest exists (e.g. for inputs generated by older versions)
+    """
+    manifest_file = os.path.join(path_base, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_file):
+        return {}
+    return loadfn(manifest_file)
+
+
+def write_job_manifest(path_base, jobs):
+    """
+    Merge the job entries into the manifest in path_base. Entries of
+    jobs already present in the manifest are replaced.
+
+    Args:
+        path_base (str): Root folder of the defect calculations
+        jobs (dict): {job folder relative to path_base: job info}
+    """
+    manifest = load_job_manifest(path_base)
+    manifest.update(jobs)
+    if not os.path.exists(path_base):
+        os.makedirs(path_base)
+    dumpfn(manifest, os.path.join(path_base, MANIFEST_FILENAME),
+           cls=MontyEncoder, indent=2)
+
+
+def get_job_key(path_base, job_fldr):
+    """
+    Key of job_fldr in the manifest of path_base
+    """
+    rel_path = os.path.relpath(os.path.abspath(job_fldr),
+                               os.path.abspath(path_base))
+    return rel_path.replace(os.sep, "/")
+
+
+def get_output_path(path_base, job_fldr, manifest=None):
+    """
+    Folder holding the outputs to be parsed for a job. For staged jobs,
+    this is the folder of the stage named by "output_stage" in the
+    manifest entry; otherwise it is the job folder itself.
+
+    Args:
+        path_base (str): Root folder of the defect calculations
+        job_fldr (str): Folder of the job (e.g. path_base/vac_1_O/charge_0)
+        manifest (dict): Job manifest. Loaded from path_base if None.
+    Returns:
+        Path of the folder with the outputs to parse
+    """
+    if manifest is None:
+        manifest = load_job_manifest(path_base)
+    job = manifest.get(get_job_key(path_base, job_fldr), {})
+    output_stage = job.get("output_stage")
+    for stage in job.get("stages", []):
+        if stage["name"] == output_stage:
+            if stage["directory"] in [".", ""]:
+                return job_fldr
+            return os.path.join(job_fldr, stage["directory"])
+
+    return job_fldr
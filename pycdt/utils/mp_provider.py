@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+"""
+Providers of Materials Project data (computed entries, structures and
+band structures) used when parsing defect calculations and computing
+chemical potentials. Queries go through an on-disk cache keyed by the
+query and, optionally, a local snapshot of MP data before the MP
+database is queried, so that calculations can be parsed on nodes without
+network access and repeated parses make no remote calls.
+
+The default provider (get_mp_provider) is configured with the
+environment variables
+    PYCDT_MP_CACHE_DIR: folder of the query cache (default ~/.pycdt/mp_cache)
+    PYCDT_MP_SNAPSHOT: local snapshot file of MP data (optional)
+    PYCDT_MP_OFFLINE: if set to 1/true/yes, never query the MP database
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import abc
+import json
+import hashlib
+import logging
+
+from monty.json import MontyEncoder, MontyDecoder
+from monty.serialization import loadfn, dumpfn
+
+from pymatgen.ext.matproj import MPRester
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".pycdt", "mp_cache")
+
+
+class MPDataUnavailable(LookupError):
+    """
+    Raised when no provider can answer a query (e.g. offline cache miss)
+    """
+    pass
+
+
+class MPDataProvider(abc.ABC):
+    """
+    Interface of the providers of Materials Project data. The methods
+    mirror those of MPRester used by pycdt. Providers that can not answer
+    a query raise MPDataUnavailable.
+    """
+
+    @abc.abstractmethod
+    def get_entries_in_chemsys(self, elements):
+        """
+        Computed entries of the chemical system of elements
+        """
+
+    @abc.abstractmethod
+    def get_entry_by_material_id(self, material_id):
+        """
+        Computed entry of a material
+        """
+
+    @abc.abstractmethod
+    def get_structure_by_material_id(self, material_id):
+        """
+        Structure of a material
+        """
+
+    def get_structures_by_material_ids(self, material_ids):
+        """
+        Structures of several materials, as a dict {material_id: structure}.
+        Providers with batched queries override this.
+        """
+        return dict((material_id, self.get_structure_by_material_id(material_id))
+                    for material_id in material_ids)
+
+    @abc.abstractmethod
+    def get_bandstructure_by_material_id(self, material_id):
+        """
+        Band structure of a material
+        """
+
+
+class MPResterProvider(MPDataProvider):
+    """
+    Queries the Materials Project database through MPRester
+    """
+
+    def __init__(self, mapi_key=None):
+        """
+        Args:
+            mapi_key (str): Materials API key (if not in ~/.pmgrc.yaml)
+        """
+        self.mapi_key = mapi_key
+
+    def _query(self, method, *args):
+        with MPRester(api_key=self.mapi_key) as mp:
+            return getattr(mp, method)(*args)
+
+    def get_entries_in_chemsys(self, elements):
+        return self._query("get_entries_in_chemsys", list(elements))
+
+    def get_entry_by_material_id(self, material_id):
+        return self._query("get_entry_by_material_id", material_id)
+
+    def get_structure_by_material_id(self, material_id):
+        return self._query("get_structure_by_material_id", material_id)
+
+    def get_structures_by_material_ids(self, material_ids):
+        # one query for all the materials
+        docs = self._query("query", {"task_id": {"$in": list(material_ids)}},
+                           ["task_id", "structure"])
+        return dict((doc["task_id"], doc["structure"]) for doc in docs)
+
+    def get_bandstructure_by_material_id(self, material_id):
+        return self._query("get_bandstructure_by_material_id", material_id)
+
+
+class MPSnapshotProvider(MPDataProvider):
+    """
+    Local stand-in for the MP database, answering queries from a snapshot
+    file (json, can be gzipped) of the form
+        {"chemsys": [["Ga", "As", "Sb"], ...],
+         "entries": [ComputedStructureEntry, ...],
+         "bandstructures": {material_id: BandStructureSymmLine}}
+    The entries of all the chemical systems listed in "chemsys" must be
+    in the snapshot; queries outside of these systems are not answered.
+    """
+
+    def __init__(self, chemsys=(), entries=(), bandstructures=None):
+        self.chemsys = [set(els) for els in chemsys]
+        self.entries = list(entries)
+        self.bandstructures = bandstructures or {}
+        self._entries_by_id = dict((str(entry.entry_id), entry)
+                                   for entry in self.entries)
+
+    @classmethod
+    def from_file(cls, filename):
+        d = loadfn(filename, cls=MontyDecoder)
+        return cls(d.get("chemsys", []), d.get("entries", []),
+                   d.get("bandstructures", {}))
+
+    def to_file(self, filename):
+        dumpfn({"chemsys": [sorted(els) for els in self.chemsys],
+                "entries": self.entries,
+                "bandstructures": self.bandstructures},
+               filename, cls=MontyEncoder)
+
+    def get_entries_in_chemsys(self, elements):
+        elements = set(elements)
+        if not any(elements <= els for els in self.chemsys):
+            raise MPDataUnavailable("Chemical system {} not in snapshot".format(
+                "-".join(sorted(elements))))
+        return [entry for entry in self.entries
+                if set(el.symbol for el in entry.composition.elements) <= elements]
+
+    def get_entry_by_material_id(self, material_id):
+        if material_id not in self._entries_by_id:
+            raise MPDataUnavailable("{} not in snapshot".format(material_id))
+        return self._entries_by_id[material_id]
+
+    def get_structure_by_material_id(self, material_id):
+        entry = self.get_entry_by_material_id(material_id)
+        if not hasattr(entry, "structure"):
+            raise MPDataUnavailable("No structure for {} in snapshot".format(
+                material_id))
+        return entry.structure
+
+    def get_bandstructure_by_material_id(self, material_id):
+        if material_id not in self.bandstructures:
+            raise MPDataUnavailable("No band structure for {} in "
+                                    "snapshot".format(material_id))
+        return self.bandstructures[material_id]
+
+
+class CachedMPProvider(MPDataProvider):
+    """
+    Answers queries from an in-memory and on-disk cache keyed by the
+    query, and otherwise from the given providers in order (e.g. a local
+    snapshot, then the MP database). Answers are stored in the cache, so
+    a cache recorded with network access can be replayed offline.
+    """
+
+    def __init__(self, cache_dir=None, providers=(), offline=False):
+        """
+        Args:
+            cache_dir (str): folder of the on-disk cache. If None, queries
+                are only cached in memory.
+            providers ([MPDataProvider]): providers queried in order on
+                cache misses
+            offline (bool): Skip the MPResterProvider providers
+        """
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.providers = [provider for provider in providers
+                          if not (offline and isinstance(provider, MPResterProvider))]
+        self.offline = offline
+        self._memory = {}
+
+    def _cache_file(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "{}.json.gz".format(digest))
+
+    def _query(self, method, arg):
+        key = json.dumps([method, arg])
+        if key in self._memory:
+            return self._memory[key]
+
+        cache_file = self._cache_file(key) if self.cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                data = loadfn(cache_file, cls=MontyDecoder)["data"]
+                self._memory[key] = data
+                return data
+            except Exception:
+                logging.getLogger(__name__).warning(
+                    "Could not read MP cache file {}".format(cache_file))
+
+        for provider in self.providers:
+            try:
+                data = getattr(provider, method)(arg)
+            except MPDataUnavailable:
+                continue
+            self._memory[key] = data
+            if cache_file:
+                self._store(cache_file, method, arg, data)
+            return data
+
+        raise MPDataUnavailable("No cached or local data for {}({})".format(
+            method, arg))
+
+    def _store(self, cache_file, method, arg, data):
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # keep the extensions so that dumpfn writes gzipped json
+            tmp_file = cache_file.replace(
+                ".json.gz", ".tmp{}.json.gz".format(os.getpid()))
+            dumpfn({"method": method, "args": arg, "data": data},
+                   tmp_file, cls=MontyEncoder)
+            os.rename(tmp_file, cache_file)
+        except (OSError, IOError):
+            logging.getLogger(__name__).warning(
+                "Could not write MP cache in {}".format(self.cache_dir))
+
+    def get_entries_in_chemsys(self, elements):
+        return self._query("get_entries_in_chemsys", sorted(set(elements)))
+
+    def get_entry_by_material_id(self, material_id):
+        return self._query("get_entry_by_material_id", material_id)
+
+    def get_structure_by_material_id(self, material_id):
+        return self._query("get_structure_by_material_id", material_id)
+
+    def get_structures_by_material_ids(self, material_ids):
+        return self._query("get_structures_by_material_ids",
+                           sorted(set(material_ids)))
+
+    def get_bandstructure_by_material_id(self, material_id):
+        return self._query("get_bandstructure_by_material_id", material_id)
+
+
+# default providers of the session, by API key, and provider set with
+# set_mp_provider to be used instead
+_providers = {}
+_provider_override = None
+
+
+def get_mp_provider(mapi_key=None):
+    """
+    Default provider of MP data for the session: cache (PYCDT_MP_CACHE_DIR),
+    then local snapshot (PYCDT_MP_SNAPSHOT), then the MP database unless
+    PYCDT_MP_OFFLINE is set.
+
+    Args:
+        mapi_key (str): Materials API key (if not in ~/.pmgrc.yaml)
+    """
+    if _provider_override is not None:
+        return _provider_override
+    if mapi_key not in _providers:
+        providers = []
+        snapshot = os.environ.get("PYCDT_MP_SNAPSHOT")
+        if snapshot:
+            providers.append(MPSnapshotProvider.from_file(snapshot))
+        providers.append(MPResterProvider(mapi_key))
+        offline = os.environ.get("PYCDT_MP_OFFLINE", "").lower() in \
+            ["1", "true", "yes"]
+        cache_dir = os.environ.get("PYCDT_MP_CACHE_DIR", DEFAULT_CACHE_DIR)
+        _providers[mapi_key] = CachedMPProvider(cache_dir, providers, offline)
+    return _providers[mapi_key]
+
+
+def set_mp_provider(provider):
+    """
+    Use provider as the provider of MP data for the session (e.g. a
+    CachedMPProvider replaying a recorded cache offline). None restores
+    the default providers.
+    """
+    global _provider_override
+    _provider_override = provider
@@ -0,0 +1,1065 @@
+# coding: utf-8
+"""
+Targeted readers for VASP output files. These extract only the data
+needed for parsing defect calculations, instead of building the full
+pymatgen output objects.
+"""
+from __future__ import division
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__date__ = "Oct 18, 2026"
+
+import io
+import os
+import re
+import shutil
+import warnings
+import subprocess
+from contextlib import contextmanager
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from monty.io import zopen
+from monty.json import MSONable, MontyEncoder, MontyDecoder
+from monty.serialization import loadfn, dumpfn
+
+from pymatgen.core import Structure
+from pymatgen.io.vasp.inputs import Incar, Poscar
+from pymatgen.io.vasp.outputs import Locpot
+
+
+VASPRUN_FIELDS = ("incar", "parameters", "initial_structure",
+                  "final_structure", "final_energy", "converged",
+                  "epsilon_static", "epsilon_ionic")
+
+# vasprun.xml varrays of the dielectric tensors of DFPT (LEPSILON) runs,
+# and the corresponding fields
+_EPSILON_VARRAYS = {"epsilon": "epsilon_static", "epsilon_ion": "epsilon_ionic"}
+
+# Suffix of the binary sidecar files of LOCPOTs (see write_locpot_sidecar)
+LOCPOT_SIDECAR_SUFFIX = ".pycdt"
+
+# Suffix of the eigenvalue sidecar files of vasprun.xml files (see
+# write_eigenvalue_sidecar)
+EIGENVALUE_SIDECAR_SUFFIX = ".pycdt_eigenvalues.npz"
+
+# Compressed variants of output files, in order of preference, and the
+# (multithreaded) command line decompressors tried before the python codecs
+COMPRESSED_EXTENSIONS = (".gz", ".GZ", ".xz", ".XZ", ".bz2", ".BZ2",
+                         ".lzma", ".LZMA", ".z", ".Z")
+_DECOMPRESSORS = {".gz": [["pigz", "-dc"], ["gzip", "-dc"]],
+                  ".xz": [["xz", "-dc", "-T0"]],
+                  ".lzma": [["xz", "-dc", "-T0"]],
+                  ".bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"]]}
+
+_OUTCAR_POTENTIAL_MARKER = b"average (electrostatic) potential at core"
+_OUTCAR_POTENTIAL_NORM = b"(the norm of the test charge is"
+_OUTCAR_EPSILON_MARKERS = {
+    "epsilon_static": b"MACROSCOPIC STATIC DIELECTRIC TENSOR (including local field effects in DFT)",
+    "epsilon_ionic": b"MACROSCOPIC STATIC DIELECTRIC TENSOR IONIC CONTRIBUTION"}
+# markers read by the completion and convergence probe
+_VASPRUN_END = b"</modeling>"
+_OUTCAR_ITERATION = re.compile(br"-\s*Iteration\s+(\d+)\s*\(\s*(\d+)\s*\)")
+_VASPRUN_INT_PARAMETER = br'<i type="int" name="{}">\s*(-?\d+)\s*</i>'
+
+
+def resolve_output_path(path):
+    """
+    Path of an output file or of its compressed variant (e.g. vasprun.xml
+    or vasprun.xml.gz). If neither exists, path is returned unchanged.
+    """
+    if os.path.exists(path):
+        return path
+    for ext in COMPRESSED_EXTENSIONS:
+        if os.path.exists(path + ext):
+            return path + ext
+    return path
+
+
+def is_compressed(filename):
+    """
+    True if filename has the extension of a compressed file
+    """
+    return os.path.splitext(filename)[1] in COMPRESSED_EXTENSIONS
+
+
+@contextmanager
+def open_output_file(filename, mode="rt"):
+    """
+    Open a (possibly compressed) output file for streaming reads.
+    Compressed files are decompressed on the fly, without temporary
+    files, by a multithreaded command line decompressor (pigz, xz -T0,
+    lbzip2) if one is available, and otherwise by the python codecs.
+
+    Args:
+        filename (str): path to the file
+        mode (str): "rt" or "rb"
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    cmd = None
+    for candidate in _DECOMPRESSORS.get(ext, []):
+        if shutil.which(candidate[0]):
+            cmd = candidate + [filename]
+            break
+
+    if cmd is None:
+        with zopen(filename, mode) as f:
+            yield f
+        return
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    f = proc.stdout if "b" in mode else io.TextIOWrapper(proc.stdout)
+    try:
+        yield f
+    finally:
+        # the reader may stop before the end of the file, in which case
+        # the decompressor is stopped and its exit status is irrelevant
+        at_eof = proc.stdout.closed or not proc.stdout.peek(1)
+        if not at_eof:
+            proc.kill()
+        f.close()
+        returncode = proc.wait()
+    if at_eof and returncode:
+        raise IOError("{} failed on {}".format(cmd[0], filename))
+
+
+def _vasprun_float(f):
+    """
+    Large numbers are often represented as ********* in the vasprun.
+    This function parses these values as np.nan
+    """
+    try:
+        return float(f)
+    except ValueError as e:
+        f = f.strip()
+        if f == '*' * len(f):
+            warnings.warn('Float overflow (*******) encountered in vasprun')
+            return np.nan
+        raise e
+
+
+def _parse_parameter(val_type, val):
+    if val_type == "logical":
+        return val == "T"
+    elif val_type == "int":
+        return int(val)
+    elif val_type == "string":
+        return val.strip()
+    return _vasprun_float(val)
+
+
+def _parse_v_parameter(val_type, val):
+    if val_type == "logical":
+        return [i == "T" for i in val.split()]
+    elif val_type == "int":
+        return [int(i) for i in val.split()]
+    elif val_type == "string":
+        return val.split()
+    return [_vasprun_float(i) for i in val.split()]
+
+
+def _parse_params(elem):
+    params = {}
+    for c in elem:
+        name = c.attrib.get("name")
+        if c.tag not in ("i", "v"):
+            p = _parse_params(c)
+            if name == "response functions":
+                # Delete duplicate fields from "response functions",
+                # which overrides the values in the root params.
+                p = {k: v for k, v in p.items() if k not in params}
+            params.update(p)
+        else:
+            ptype = c.attrib.get("type")
+            val = c.text.strip() if c.text else ""
+            if c.tag == "i":
+                params[name] = _parse_parameter(ptype, val)
+            else:
+                params[name] = _parse_v_parameter(ptype, val)
+    return params
+
+
+def _parse_varray(elem):
+    if elem.get("type", None) == "logical":
+        return [[i == "T" for i in v.text.split()] for v in elem]
+    return [[_vasprun_float(i) for i in v.text.split()] for v in elem]
+
+
+class SelectiveVasprun(MSONable):
+    """
+    Streaming, field-selective reader of vasprun.xml files.
+
+    The file is read with iterparse and every element that is not needed
+    for the requested fields (eigenvalues, DOS, projections, forces, ...)
+    is discarded as soon as it is read, so memory use does not grow with
+    the size of the file. Reading stops as soon as all requested fields
+    are known (e.g. after the initial structure if only "incar" and
+    "initial_structure" are requested).
+
+    The attributes carry the same names as in pymatgen's Vasprun, so this
+    object can be used in place of a Vasprun wherever only these fields
+    are needed:
+
+    .. attribute:: incar
+
+        Incar object of the parameters set in the INCAR
+
+    .. attribute:: parameters
+
+        Dict of the NELM, NSW, IBRION and EDIFF(G) parameters of the run
+
+    .. attribute:: initial_structure
+
+    .. attribute:: final_structure
+
+    .. attribute:: final_energy
+
+        Final energy (e_wo_entrp of the last ionic step)
+
+    .. attribute:: nionic_steps
+
+    .. attribute:: epsilon_static
+
+        Static dielectric tensor of DFPT runs (including local field effects)
+
+    .. attribute:: epsilon_ionic
+
+        Ionic contribution to the static dielectric tensor of DFPT runs
+
+    Fields which were not requested are None.
+    """
+
+    def __init__(self, filename, fields=None):
+        """
+        Args:
+            filename (str): path to the vasprun.xml file (can be gzipped)
+            fields (list): fields to read out of VASPRUN_FIELDS.
+                Default is to read all of them.
+        """
+        self.filename = filename
+        self.fields = set(fields if fields is not None else VASPRUN_FIELDS)
+        unknown = self.fields - set(VASPRUN_FIELDS)
+        if unknown:
+            raise ValueError("Unknown vasprun fields {}".format(unknown))
+        if "converged" in self.fields:
+            self.fields.update(["incar", "parameters"])
+
+        self.incar = None
+        self.parameters = None
+        self.initial_structure = None
+        self.final_structure = None
+        self.final_energy = None
+        self.nionic_steps = 0
+        self.epsilon_static = None
+        self.epsilon_ionic = None
+        self._final_esteps = []
+        self.atomic_symbols = None
+
+        with open_output_file(filename, "rt") as f:
+            self._parse(f)
+
+    def _needs_calculations(self):
+        return bool(self.fields & set(["final_energy", "converged"]))
+
+    def _epsilon_field(self, elem):
+        """
+        Requested dielectric tensor field of a varray element, if any
+        """
+        field = _EPSILON_VARRAYS.get(elem.attrib.get("name"))
+        return field if field in self.fields else None
+
+    def _is_complete(self, tags_read):
+        needed = set(["atominfo"]) if self.fields & set(
+            ["initial_structure", "final_structure"]) else set()
+        for field in self.fields:
+            if field == "incar":
+                needed.add("incar")
+            elif field == "parameters":
+                needed.add("parameters")
+            elif field == "initial_structure":
+                needed.add("initialpos")
+            elif field in ["final_structure", "final_energy", "converged",
+                           "epsilon_static", "epsilon_ionic"]:
+                # only known at the end of the run
+                return False
+        return needed <= tags_read
+
+    def _parse(self, stream):
+        tags_read = set()
+        path = []
+        scstep_keys = []
+        energy = {}
+        for event, elem in iterparse(stream, events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag)
+                if len(path) == 2 and elem.tag == "calculation":
+                    scstep_keys = []
+                    energy = {}
+                continue
+
+            path.pop()
+            depth = len(path)
+            if depth >= 2 and path[1] == "calculation":
+                # inside an ionic step: only scstep, energy and the
+                # dielectric tensors are needed
+                if depth == 2 and elem.tag == "varray" and \
+                        self._epsilon_field(elem):
+                    setattr(self, self._epsilon_field(elem), _parse_varray(elem))
+                    elem.clear()
+                elif depth > 2 and path[2] == "varray" and \
+                        self.fields & set(_EPSILON_VARRAYS.values()):
+                    # rows of a varray, cleared with the varray
+                    pass
+                elif not self._needs_calculations():
+                    elem.clear()
+                elif depth == 2 and elem.tag == "scstep":
+                    scstep_energy = elem.find("energy")
+                    scstep_keys.append(frozenset(
+                        i.attrib["name"] for i in scstep_energy.findall("i"))
+                        if scstep_energy is not None else frozenset())
+                    elem.clear()
+                elif depth == 2 and elem.tag == "energy":
+                    energy = {i.attrib["name"]: _vasprun_float(i.text)
+                              for i in elem.findall("i")}
+                    elem.clear()
+                elif depth == 2 or path[2] not in ["scstep", "energy"]:
+                    elem.clear()
+                continue
+
+            if depth != 1:
+                continue
+
+            tag = elem.tag
+            if tag == "incar":
+                self.incar = Incar(_parse_params(elem))
+                tags_read.add("incar")
+            elif tag == "parameters":
+                params = _parse_params(elem)
+                self.parameters = {k: params[k] for k in [
+                    "NELM", "NSW", "IBRION", "EDIFF", "EDIFFG"]
+                                   if k in params}
+                tags_read.add("parameters")
+            elif tag == "atominfo":
+                self.atomic_symbols = self._parse_atominfo(elem)
+                tags_read.add("atominfo")
+            elif tag == "structure":
+                name = elem.attrib.get("name")
+                if name == "initialpos" and \
+                        "initial_structure" in self.fields:
+                    self.initial_structure = self._parse_structure(elem)
+                elif name == "finalpos" and "final_structure" in self.fields:
+                    self.final_structure = self._parse_structure(elem)
+                if name:
+                    tags_read.add(name)
+            elif tag == "varray" and self._epsilon_field(elem):
+                setattr(self, self._epsilon_field(elem), _parse_varray(elem))
+            elif tag == "calculation":
+                self.nionic_steps += 1
+                self._final_esteps = scstep_keys
+                if "e_wo_entrp" in energy:
+                    self.final_energy = energy["e_wo_entrp"]
+            elem.clear()
+
+            if self._is_complete(tags_read):
+                break
+
+        if "final_energy" in self.fields and self.final_energy is None:
+            warnings.warn("Calculation does not have a total energy. "
+                          "Possibly a GW or similar kind of run. A value "
+                          "of infinity is returned.")
+            self.final_energy = float('inf')
+
+    @staticmethod
+    def _parse_atominfo(elem):
+        atomic_symbols = []
+        for a in elem.findall("array"):
+            if a.attrib["name"] == "atoms":
+                atomic_symbols = [rc.find("c").text.strip()
+                                  for rc in a.find("set")]
+        # vasprun.xml uses X instead of Xe for xenon and r for Zr
+        return ["Xe" if s == "X" else "Zr" if s == "r" else s
+                for s in atomic_symbols]
+
+    def _parse_structure(self, elem):
+        latt = _parse_varray(elem.find("crystal").find("varray"))
+        pos = _parse_varray(elem.find("varray"))
+        struct = Structure(latt, self.atomic_symbols, pos)
+        sdyn = elem.find("varray/[@name='selective']")
+        if sdyn is not None:
+            struct.add_site_property('selective_dynamics',
+                                     _parse_varray(sdyn))
+        return struct
+
+    def as_dict(self):
+        return {"@module": self.__class__.__module__,
+                "@class": self.__class__.__name__,
+                "filename": self.filename,
+                "fields": sorted(self.fields),
+                "incar": self.incar.as_dict() if self.incar else None,
+                "parameters": self.parameters,
+                "initial_structure": self.initial_structure.as_dict()
+                if self.initial_structure else None,
+                "final_structure": self.final_structure.as_dict()
+                if self.final_structure else None,
+                "final_energy": self.final_energy,
+                "nionic_steps": self.nionic_steps,
+                "epsilon_static": self.epsilon_static,
+                "epsilon_ionic": self.epsilon_ionic,
+                "final_esteps": [sorted(keys) for keys in self._final_esteps],
+                "atomic_symbols": self.atomic_symbols}
+
+    @classmethod
+    def from_dict(cls, d):
+        # rebuild without reparsing the file
+        svr = cls.__new__(cls)
+        svr.filename = d["filename"]
+        svr.fields = set(d["fields"])
+        svr.incar = Incar.from_dict(d["incar"]) if d["incar"] else None
+        svr.parameters = d["parameters"]
+        svr.initial_structure = Structure.from_dict(d["initial_structure"]) \
+            if d["initial_structure"] else None
+        svr.final_structure = Structure.from_dict(d["final_structure"]) \
+            if d["final_structure"] else None
+        svr.final_energy = d["final_energy"]
+        svr.nionic_steps = d["nionic_steps"]
+        svr.epsilon_static = d.get("epsilon_static")
+        svr.epsilon_ionic = d.get("epsilon_ionic")
+        svr._final_esteps = [frozenset(keys) for keys in d["final_esteps"]]
+        svr.atomic_symbols = d["atomic_symbols"]
+        return svr
+
+    @property
+    def converged_electronic(self):
+        """
+        Checks that electronic step convergence has been reached in the
+        final ionic step (same criterion as Vasprun.converged_electronic)
+        """
+        final_esteps = self._final_esteps
+        if "LEPSILON" in self.incar and self.incar["LEPSILON"]:
+            i = 1
+            to_check = set(['e_wo_entrp', 'e_fr_energy', 'e_0_energy'])
+            while i < len(final_esteps) and final_esteps[i] == to_check:
+                i += 1
+            return i + 1 != self.parameters["NELM"]
+        return len(final_esteps) < self.parameters["NELM"]
+
+    @property
+    def converged_ionic(self):
+        """
+        Checks that ionic step convergence has been reached, i.e. that
+        vasp exited before reaching the max ionic steps for a relaxation
+        run (same criterion as Vasprun.converged_ionic)
+        """
+        nsw = self.parameters.get("NSW", 0)
+        return nsw <= 1 or self.nionic_steps < nsw
+
+    @property
+    def converged(self):
+        """
+        Returns true if a relaxation run is converged.
+        """
+        return self.converged_electronic and self.converged_ionic
+
+
+class VasprunSummary(object):
+    """
+    Data of a full pymatgen Vasprun needed for the defect metadata (run
+    settings, structures, energy, eigenvalues, computed entry), without
+    the ionic steps, DOS and projections of the Vasprun, so it can be kept
+    in memory for the session. The attributes carry the same names as in
+    Vasprun, and include all the VASPRUN_FIELDS of SelectiveVasprun, so a
+    summary can be used wherever a SelectiveVasprun is.
+
+    .. attribute:: computed_entry
+
+        ComputedStructureEntry of the run (Vasprun.get_computed_entry())
+    """
+
+    # attributes of the summary
+    FIELDS = VASPRUN_FIELDS + (
+        "kpoints", "potcar_spec", "run_type", "eigenvalues",
+        "actual_kpoints_weights", "eigenvalue_band_properties",
+        "computed_entry")
+
+    def __init__(self, **fields):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError("Unknown vasprun fields: {}".format(
+                ", ".join(sorted(unknown))))
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_vasprun(cls, vr):
+        """
+        Summary of a Vasprun object
+        """
+        fields = dict((field, getattr(vr, field)) for field in cls.FIELDS
+                      if field != "computed_entry")
+        fields["computed_entry"] = vr.get_computed_entry()
+        return cls(**fields)
+
+
+def _read_locpot_header(f):
+    """
+    Read the structure and grid dimensions at the top of an open LOCPOT,
+    leaving f at the first line of grid values
+    """
+    poscar_lines = []
+    for line in f:
+        line = line.strip()
+        if not line and poscar_lines:
+            break
+        poscar_lines.append(line)
+    structure = Poscar.from_string("\n".join(poscar_lines)).structure
+
+    line = f.readline().strip()
+    while not line:
+        line = f.readline().strip()
+    return structure, [int(n) for n in line.split()]
+
+
+def _iter_locpot_grid(f, dim, chunk_size=100000):
+    """
+    Yield the (total) potential values of an open LOCPOT positioned after
+    the header, as flat arrays in file (Fortran) order of about chunk_size
+    values each. Raises ValueError if the grid is incomplete.
+    """
+    ngrid_pts = dim[0] * dim[1] * dim[2]
+    nread = 0
+    chunk = []
+    nchunk = 0
+    for line in f:
+        chunk.append(line)
+        nchunk += 1
+        # VASP writes 5 values per line
+        if nchunk * 5 < chunk_size:
+            continue
+        values = np.array(" ".join(chunk).split()[:ngrid_pts - nread],
+                          dtype=float)
+        nread += len(values)
+        yield values
+        chunk, nchunk = [], 0
+        if nread >= ngrid_pts:
+            return
+    values = np.array(" ".join(chunk).split()[:ngrid_pts - nread],
+                      dtype=float)
+    nread += len(values)
+    if nread < ngrid_pts:
+        raise ValueError("LOCPOT grid is incomplete: {} of {} "
+                         "grid points".format(nread, ngrid_pts))
+    yield values
+
+
+def get_locpot_sidecar_paths(locpot_file):
+    """
+    Paths of the binary grid (.npy) and metadata (.json) sidecar files of
+    a LOCPOT
+    """
+    return (locpot_file + LOCPOT_SIDECAR_SUFFIX + ".npy",
+            locpot_file + LOCPOT_SIDECAR_SUFFIX + ".json")
+
+
+def _is_sidecar_valid(locpot_file, metadata):
+    stat = os.stat(locpot_file)
+    return metadata.get("source_size") == stat.st_size and \
+        metadata.get("source_mtime") == stat.st_mtime
+
+
+def write_locpot_sidecar(locpot_file, chunk_size=100000, overwrite=False):
+    """
+    Convert the (total) potential grid of a LOCPOT to a binary .npy
+    sidecar next to it, with the structure, grid dimensions and the size
+    and modification time of the LOCPOT in a json metadata file. The grid
+    is written in chunks, so the LOCPOT is never fully loaded in memory.
+
+    Args:
+        locpot_file (str): path to the LOCPOT file (can be gzipped)
+        chunk_size (int): approximate number of grid values converted at
+            once
+        overwrite (bool): Rewrite the sidecar even if it is up to date
+    Returns:
+        Path of the .npy sidecar
+    """
+    npy_file, meta_file = get_locpot_sidecar_paths(locpot_file)
+    if not overwrite and load_locpot_sidecar(locpot_file) is not None:
+        return npy_file
+
+    # remove stale metadata first so that an interrupted conversion is
+    # never taken as valid
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    with open_output_file(locpot_file, "rt") as f:
+        structure, dim = _read_locpot_header(f)
+        grid = np.lib.format.open_memmap(npy_file, mode="w+",
+                                         dtype=np.float64, shape=tuple(dim),
+                                         fortran_order=True)
+        flat_grid = grid.reshape(-1, order="F")
+        nread = 0
+        for values in _iter_locpot_grid(f, dim, chunk_size):
+            flat_grid[nread:nread + len(values)] = values
+            nread += len(values)
+        grid.flush()
+        del flat_grid, grid
+
+    stat = os.stat(locpot_file)
+    dumpfn({"structure": structure, "dim": dim,
+            "source_size": stat.st_size, "source_mtime": stat.st_mtime},
+           meta_file, cls=MontyEncoder)
+    return npy_file
+
+
+def load_locpot_sidecar(locpot_file):
+    """
+    Memory-mapped grid of the binary sidecar of a LOCPOT.
+
+    Args:
+        locpot_file (str): path to the LOCPOT file
+    Returns:
+        (structure, grid) with grid a read-only memory-mapped array of
+        shape (NGX, NGY, NGZ). None if there is no sidecar or if it is
+        out of date with respect to the LOCPOT.
+    """
+    npy_file, meta_file = get_locpot_sidecar_paths(locpot_file)
+    if not os.path.exists(meta_file) or not os.path.exists(npy_file):
+        return None
+    try:
+        metadata = loadfn(meta_file, cls=MontyDecoder)
+        if os.path.exists(locpot_file) and \
+                not _is_sidecar_valid(locpot_file, metadata):
+            return None
+        grid = np.load(npy_file, mmap_mode="r")
+    except (ValueError, OSError, KeyError):
+        return None
+    if list(grid.shape) != list(metadata["dim"]):
+        return None
+    return metadata["structure"], grid
+
+
+def read_locpot(locpot_file):
+    """
+    Locpot of a LOCPOT file. The potential is memory-mapped from the
+    binary sidecar if an up-to-date one exists, else the LOCPOT is parsed.
+    """
+    sidecar = load_locpot_sidecar(locpot_file)
+    if sidecar is None:
+        return Locpot.from_file(locpot_file)
+    structure, grid = sidecar
+    return Locpot(Poscar(structure), {"total": grid})
+
+
+def get_eigenvalue_sidecar_path(vasprun_file):
+    """
+    Path of the eigenvalue sidecar of a vasprun.xml file
+    """
+    return vasprun_file + EIGENVALUE_SIDECAR_SUFFIX
+
+
+def write_eigenvalue_sidecar(filename, eigenvalues, kpoint_weights):
+    """
+    Store eigenvalues and occupations as float32 arrays in a .npz file,
+    much more compact than the nested lists of the json serialization.
+
+    Args:
+        filename (str): path of the .npz file
+        eigenvalues (dict): {spin: array of shape (nkpoints, nbands, 2)}
+            of eigenvalues and occupations, as Vasprun.eigenvalues (spins
+            can be Spin or their integer values)
+        kpoint_weights (list): weights of the k-points
+    Returns:
+        filename
+    """
+    arrays = dict(("spin_{}".format(int(getattr(spin, "value", spin))),
+                   np.asarray(eigs, dtype=np.float32))
+                  for spin, eigs in eigenvalues.items())
+    arrays["kpoint_weights"] = np.asarray(kpoint_weights, dtype=np.float32)
+    # write under a temporary name so that an interrupted write is never
+    # read back (np.savez appends .npz to names without that extension)
+    tmp_file = "{}.tmp{}.npz".format(filename, os.getpid())
+    np.savez(tmp_file, **arrays)
+    os.rename(tmp_file, filename)
+    return filename
+
+
+def load_eigenvalue_sidecar(filename):
+    """
+    Eigenvalues and k-point weights stored with write_eigenvalue_sidecar.
+
+    Returns:
+        (eigenvalues, kpoint_weights) with eigenvalues a dict {spin value
+        (int): float32 array of shape (nkpoints, nbands, 2)}
+    """
+    with np.load(filename) as data:
+        eigenvalues = dict((int(key[len("spin_"):]), data[key])
+                           for key in data.files if key.startswith("spin_"))
+        kpoint_weights = data["kpoint_weights"].tolist()
+    return eigenvalues, kpoint_weights
+
+
+class LocpotAverages(MSONable):
+    """
+    Planar averages of the potential of a LOCPOT file along the three
+    lattice vectors, with the get_axis_grid and get_average_along_axis
+    methods of pymatgen's Locpot, so it can be used in place of a Locpot
+    for the Freysoldt correction.
+
+    from_file accumulates the averages while reading the grid in chunks,
+    so the full 3D grid is never held in memory.
+    """
+
+    def __init__(self, structure, dim, planar_averages):
+        """
+        Args:
+            structure (Structure): structure of the LOCPOT
+            dim ([int]): grid dimensions (NGX, NGY, NGZ)
+            planar_averages ([array]): planar averages of the potential
+                along each lattice vector
+        """
+        self.structure = structure
+        self.dim = [int(n) for n in dim]
+        self.planar_averages = [np.array(avg) for avg in planar_averages]
+
+    @classmethod
+    def from_grid(cls, structure, grid):
+        """
+        Planar averages of a 3D potential grid (e.g. memory-mapped)
+        """
+        planar_averages = [np.mean(grid, axis=axes)
+                           for axes in [(1, 2), (0, 2), (0, 1)]]
+        return cls(structure, grid.shape, planar_averages)
+
+    @classmethod
+    def from_file(cls, filename, chunk_size=100000):
+        """
+        Read the planar averages of the (total) potential of a LOCPOT.
+        An up-to-date binary sidecar (see write_locpot_sidecar) is used
+        if present.
+
+        Args:
+            filename (str): path to the LOCPOT file (can be gzipped)
+            chunk_size (int): approximate number of grid values parsed at
+                once
+        """
+        sidecar = load_locpot_sidecar(filename)
+        if sidecar is not None:
+            return cls.from_grid(*sidecar)
+
+        with open_output_file(filename, "rt") as f:
+            structure, dim = _read_locpot_header(f)
+            nx, ny, nz = dim
+            sums = [np.zeros(nx), np.zeros(ny), np.zeros(nz)]
+            nread = 0
+            for values in _iter_locpot_grid(f, dim, chunk_size):
+                idx = np.arange(nread, nread + len(values))
+                sums[0] += np.bincount(idx % nx, weights=values, minlength=nx)
+                sums[1] += np.bincount((idx // nx) % ny, weights=values,
+                                       minlength=ny)
+                sums[2] += np.bincount(idx // (nx * ny), weights=values,
+                                       minlength=nz)
+                nread += len(values)
+
+        planar_averages = [sums[0] / (ny * nz), sums[1] / (nx * nz),
+                           sums[2] / (nx * ny)]
+        return cls(structure, dim, planar_averages)
+
+    def get_axis_grid(self, ind):
+        """
+        Returns the grid for a particular axis (same as Locpot.get_axis_grid)
+
+        Args:
+            ind (int): Axis index.
+        """
+        num_pts = self.dim[ind]
+        lengths = self.structure.lattice.abc
+        return [i / num_pts * lengths[ind] for i in range(num_pts)]
+
+    def get_average_along_axis(self, ind):
+        """
+        Planar average of the potential along an axis
+
+        Args:
+            ind (int): Index of axis.
+        """
+        return self.planar_averages[ind]
+
+    def as_dict(self):
+        return {"@module": self.__class__.__module__,
+                "@class": self.__class__.__name__,
+                "structure": self.structure.as_dict(),
+                "dim": self.dim,
+                "planar_averages": [avg.tolist()
+                                    for avg in self.planar_averages]}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(Structure.from_dict(d["structure"]), d["dim"],
+                   d["planar_averages"])
+
+
+def _parse_outcar_potential_block(lines):
+    """
+    Site potentials of an "average (electrostatic) potential at core"
+    block of an OUTCAR, given the lines following its marker line. Returns
+    None if the block is incomplete (e.g. OUTCAR of a running job).
+    """
+    table = None
+    for line in lines:
+        if table is None:
+            if _OUTCAR_POTENTIAL_NORM in line:
+                table = []
+            continue
+        if not line.strip():
+            # same values as the regex of pymatgen's Outcar
+            pots = re.findall(br"\s+\d+\s*([\.\-\d]+)+", b" " + b" ".join(table))
+            return [float(f) for f in pots]
+        table.append(line.rstrip(b"\r\n"))
+    return None
+
+
+def read_outcar_electrostatic_potential(filename, chunk_size=2 ** 20):
+    """
+    Site-averaged electrostatic potentials of the last "average
+    (electrostatic) potential at core" block of an OUTCAR, i.e. the
+    electrostatic_potential attribute of pymatgen's Outcar. The file is
+    read backward from its end until the block is found, so the cost does
+    not grow with the length of the OUTCAR. Compressed OUTCARs can not be
+    read backward and are stream-decompressed and scanned forward.
+
+    Args:
+        filename (str): path to the OUTCAR file
+        chunk_size (int): size in bytes of the first read from the end of
+            the file, doubled until the block is found
+    Returns:
+        list of the site potentials
+    """
+    if is_compressed(filename):
+        pots = None
+        with open_output_file(filename, "rb") as f:
+            lines = iter(f)
+            for line in lines:
+                if _OUTCAR_POTENTIAL_MARKER in line:
+                    block_pots = _parse_outcar_potential_block(lines)
+                    if block_pots is not None:
+                        pots = block_pots
+        if pots is None:
+            raise ValueError("No electrostatic potential block in "
+                             "{}".format(filename))
+        return pots
+
+    pots = _read_last_outcar_block(filename, _OUTCAR_POTENTIAL_MARKER,
+                                   _parse_outcar_potential_block, chunk_size)
+    if pots is None:
+        raise ValueError("No electrostatic potential block in "
+                         "{}".format(filename))
+    return pots
+
+
+def _read_last_outcar_block(filename, marker, parse_block, chunk_size=2 ** 20):
+    """
+    Last complete block of an (uncompressed) OUTCAR starting with a marker
+    line, read backward from the end of the file in chunks of doubling size.
+
+    Args:
+        filename (str): path to the OUTCAR file
+        marker (bytes): marker of the first line of the block
+        parse_block (function): parses the lines following the marker
+            line, returns None if the block is incomplete
+        chunk_size (int): size in bytes of the first read
+    Returns:
+        Output of parse_block for the last complete block, None if there
+        is none
+    """
+    file_size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        read_size = min(chunk_size, file_size)
+        while True:
+            f.seek(file_size - read_size)
+            data = f.read(read_size)
+            end = len(data)
+            while True:
+                start = data.rfind(marker, 0, end)
+                if start < 0:
+                    break
+                block = parse_block(data[start:].splitlines(True)[1:])
+                if block is not None:
+                    return block
+                end = start
+            if read_size == file_size:
+                return None
+            read_size = min(2 * read_size, file_size)
+
+
+def _read_vasprun_int_parameters(filename, names, chunk_size=2 ** 16,
+                                 max_size=2 ** 24):
+    """
+    Integer parameters of the <parameters> block of a vasprun.xml, read
+    from the start of the file only up to the end of that block.
+
+    Returns:
+        dict {name: value} of the parameters found, None if the end of
+        the block is not within the first max_size bytes
+    """
+    data = b""
+    with open(filename, "rb") as f:
+        while b"</parameters>" not in data:
+            chunk = f.read(chunk_size)
+            if not chunk or len(data) > max_size:
+                return None
+            data += chunk
+    data = data[data.find(b"<parameters>"):data.find(b"</parameters>")]
+    values = {}
+    for name in names:
+        match = re.search(_VASPRUN_INT_PARAMETER.replace(b"{}", name.encode()), data)
+        if match:
+            values[name] = int(match.group(1))
+    return values
+
+
+def _read_last_outcar_iteration(filename, chunk_size=2 ** 16):
+    """
+    (ionic step, electronic step) of the last "Iteration" line of an
+    OUTCAR, read backward from the end of the file. None if there is none.
+    """
+    file_size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        read_size = min(chunk_size, file_size)
+        while True:
+            f.seek(file_size - read_size)
+            matches = _OUTCAR_ITERATION.findall(f.read(read_size))
+            if matches:
+                return int(matches[-1][0]), int(matches[-1][1])
+            if read_size == file_size:
+                return None
+            read_size = min(2 * read_size, file_size)
+
+
+def probe_calculation(fldr, tail_size=4096):
+    """
+    Cheap check of whether the VASP run of a folder finished and converged,
+    reading only the end of vasprun.xml and OUTCAR (and the <parameters>
+    block at the start of vasprun.xml), to skip failed or running jobs
+    before parsing their outputs.
+
+    The run is finished if vasprun.xml is closed. It is converged
+    electronically if the last ionic step took fewer than NELM electronic
+    steps, and ionically if NSW <= 1 or it stopped before NSW ionic steps,
+    as for pymatgen's Vasprun.converged.
+
+    Args:
+        fldr (str): folder of the VASP run
+        tail_size (int): number of bytes read at the end of vasprun.xml
+    Returns:
+        dict with "finished", "converged_electronic", "converged_ionic",
+        "converged" and "has_locpot". The convergence values are None
+        when they could not be probed (e.g. no OUTCAR). None if vasprun.xml
+        is missing or compressed (compressed files can not be read from
+        their end).
+    """
+    vr_file = resolve_output_path(os.path.join(fldr, "vasprun.xml"))
+    if not os.path.exists(vr_file) or is_compressed(vr_file):
+        return None
+
+    with open(vr_file, "rb") as f:
+        f.seek(max(os.path.getsize(vr_file) - tail_size, 0))
+        finished = f.read().rstrip().endswith(_VASPRUN_END)
+    probe = {"finished": finished, "converged_electronic": None,
+             "converged_ionic": None, "converged": None,
+             "has_locpot": os.path.exists(resolve_output_path(
+                 os.path.join(fldr, "LOCPOT")))}
+
+    outcar_file = resolve_output_path(os.path.join(fldr, "OUTCAR"))
+    if not finished or not os.path.exists(outcar_file) or \
+            is_compressed(outcar_file):
+        return probe
+    params = _read_vasprun_int_parameters(vr_file, ["NELM", "NSW"])
+    iteration = _read_last_outcar_iteration(outcar_file)
+    if not params or iteration is None:
+        return probe
+
+    nionic, nelectronic = iteration
+    if "NELM" in params:
+        probe["converged_electronic"] = nelectronic < params["NELM"]
+    nsw = params.get("NSW", 0)
+    probe["converged_ionic"] = nsw <= 1 or nionic < nsw
+    if False in (probe["converged_electronic"], probe["converged_ionic"]):
+        probe["converged"] = False
+    elif probe["converged_electronic"] is not None:
+        probe["converged"] = True
+    return probe
+
+
+def _parse_outcar_tensor_block(lines):
+    """
+    3x3 tensor following a dielectric tensor header of an OUTCAR (a line
+    of dashes, then the three rows). None if the block is incomplete.
+    """
+    rows = []
+    for line in lines[1:4]:
+        try:
+            rows.append([float(x) for x in line.split()[:3]])
+        except ValueError:
+            return None
+    if len(rows) != 3 or any(len(row) != 3 for row in rows):
+        return None
+    return rows
+
+
+def read_dielectric_tensors(fldr):
+    """
+    Static and ionic dielectric tensors of a DFPT (LEPSILON) run, the
+    epsilon_static and epsilon_ionic attributes of pymatgen's Vasprun.
+    The vasprun.xml is streamed keeping only the two tensors; if it is
+    missing or holds no tensors, the last tensor blocks of the OUTCAR are
+    read backward from the end of the file.
+
+    Args:
+        fldr (str): folder of the dielectric calculation
+    Returns:
+        dict with "epsilon_static", "epsilon_ionic" (3x3 lists) and
+        "source", the path of the file they were read from
+    """
+    vr_file = resolve_output_path(os.path.join(fldr, "vasprun.xml"))
+    if os.path.exists(vr_file):
+        try:
+            vr = SelectiveVasprun(vr_file, fields=["epsilon_static", "epsilon_ionic"])
+        except Exception:
+            vr = None
+        if vr is not None and vr.epsilon_static is not None and \
+                vr.epsilon_ionic is not None:
+            return {"epsilon_static": vr.epsilon_static,
+                    "epsilon_ionic": vr.epsilon_ionic,
+                    "source": vr_file}
+
+    outcar_file = resolve_output_path(os.path.join(fldr, "OUTCAR"))
+    if os.path.exists(outcar_file):
+        tensors = {}
+        if is_compressed(outcar_file):
+            # streamed forward, keeping the lines of the last blocks only
+            blocks = {}
+            with open_output_file(outcar_file, "rb") as f:
+                for line in f:
+                    for field in list(blocks):
+                        blocks[field].append(line)
+                        if len(blocks[field]) == 4:
+                            tensors[field] = _parse_outcar_tensor_block(
+                                blocks.pop(field))
+                    for field, marker in _OUTCAR_EPSILON_MARKERS.items():
+                        if marker in line:
+                            blocks[field] = []
+        else:
+            for field, marker in _OUTCAR_EPSILON_MARKERS.items():
+                tensors[field] = _read_last_outcar_block(
+                    outcar_file, marker, _parse_outcar_tensor_block)
+        if tensors.get("epsilon_static") is not None and \
+                tensors.get("epsilon_ionic") is not None:
+            tensors["source"] = outcar_file
+            return tensors
+
+    raise ValueError("No dielectric tensors found in {}".format(fldr))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+"""
+On-disk cache of data extracted from VASP output files, so that repeated
+parsing of a defect calculation folder only reparses new or changed
+outputs, and in-memory registry of the data extracted from the outputs
+during the session, so that each output file is parsed once while its
+data are registered (or again to extract more data from it).
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+from monty.json import MontyEncoder, MontyDecoder
+
+# Version of the data extracted by the pycdt parsers. Bump it whenever the
+# content of the cached data changes, to invalidate older cache entries.
+PARSER_VERSION = "3"
+CACHE_FILENAME = ".pycdt_parse_cache.sqlite"
+
+
+class ParseCache(object):
+    """
+    SQLite cache of parsed output data. Entries are keyed by the absolute
+    path of the output file and a kind label (what was extracted from the
+    file), and are valid only while the size and modification time of the
+    file and the parser version are unchanged.
+
+    The data are stored as json (MontyEncoder), so any MSONable object,
+    numpy array or basic python type can be cached.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): path of the SQLite database file
+        """
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS parse_cache ("
+                    "path TEXT, kind TEXT, size INTEGER, mtime REAL, "
+                    "version TEXT, data TEXT, PRIMARY KEY (path, kind))")
+
+    @staticmethod
+    def from_root_fldr(root_fldr):
+        """
+        Cache stored in the root folder of the defect calculations
+        """
+        return ParseCache(os.path.join(root_fldr, CACHE_FILENAME))
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=60)
+
+    @staticmethod
+    def _file_key(filename):
+        stat = os.stat(filename)
+        return os.path.abspath(filename), stat.st_size, stat.st_mtime
+
+    def get(self, filename, kind):
+        """
+        Cached data for filename, or None if there is no valid entry.
+        """
+        try:
+            path, size, mtime = self._file_key(filename)
+        except OSError:
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT size, mtime, version, data FROM parse_cache "
+                "WHERE path = ? AND kind = ?", (path, kind)).fetchone()
+        if row is None or tuple(row[:3]) != (size, mtime, PARSER_VERSION):
+            return None
+        return json.loads(row[3], cls=MontyDecoder)
+
+    def set(self, filename, kind, data):
+        """
+        Store data parsed from filename
+        """
+        path, size, mtime = self._file_key(filename)
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache VALUES "
+                    "(?, ?, ?, ?, ?, ?)",
+                    (path, kind, size, mtime, PARSER_VERSION,
+                     json.dumps(data, cls=MontyEncoder)))
+
+    def get_or_parse(self, filename, kind, parse_func):
+        """
+        Cached data for filename if valid, otherwise parse_func() which is
+        then stored in the cache.
+        """
+        data = self.get(filename, kind)
+        if data is None:
+            data = parse_func()
+            try:
+                self.set(filename, kind, data)
+            except sqlite3.Error:
+                logging.getLogger(__name__).warning(
+                    "Could not write parse cache {}".format(self.db_path))
+        return data
+
+
+def kind_covers(registered_kind, kind):
+    """
+    Whether data of registered_kind can serve a request for data of kind.
+    Kinds are labels, optionally followed by the fields the data hold
+    ("label:field1,field2,..."); data of a kind serve the requests for the
+    same label and a subset of their fields.
+    """
+    if registered_kind == kind:
+        return True
+    label, _, fields = registered_kind.partition(":")
+    kind_label, _, kind_fields = kind.partition(":")
+    if label != kind_label or not fields or not kind_fields:
+        return False
+    return set(kind_fields.split(",")) <= set(fields.split(","))
+
+
+class OutputRegistry(object):
+    """
+    In-memory registry of the data parsed from outputs during the session.
+    Entries are keyed by the absolute path of the output file, one entry
+    per file, and are valid only while the size and modification time of
+    the file are unchanged. An entry serves all the kinds of data it
+    covers (see kind_covers), so a file is parsed again only to get data
+    the registered parse does not hold, the more complete parse then
+    replacing the entry. The registered objects are shared by all the
+    callers, which must not modify them.
+
+    Only the extracted data needed by the parsers (structures, energies,
+    eigenvalue arrays, ...) should be registered, not full output objects
+    such as Vasprun, which would be kept alive for the whole session. An
+    output is parsed again if its entry was dropped from the registry.
+    """
+
+    def __init__(self, max_entries=128):
+        """
+        Args:
+            max_entries (int): Number of parsed outputs kept, the least
+                recently used being dropped first. None for no limit.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        # [lock, number of users] of the outputs being parsed, so that
+        # concurrent requests for the same output wait for a single parse;
+        # dropped once no parse of the output is pending
+        self._parse_locks = {}
+
+    def _valid_entry(self, filename):
+        """
+        (path, kind, data) registered for filename if still valid, or None
+        """
+        try:
+            path, size, mtime = ParseCache._file_key(filename)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[:2] != (size, mtime):
+                return None
+            self._entries[path] = self._entries.pop(path)
+            return path, entry[2], entry[3]
+
+    def get(self, filename, kind):
+        """
+        Registered data of filename covering kind, or None
+        """
+        entry = self._valid_entry(filename)
+        if entry is None or not kind_covers(entry[1], kind):
+            return None
+        return entry[2]
+
+    def get_kind(self, filename):
+        """
+        Kind of the data registered for filename, or None
+        """
+        entry = self._valid_entry(filename)
+        return entry[1] if entry is not None else None
+
+    def set(self, filename, kind, data):
+        """
+        Register the data of the given kind parsed from filename. A valid
+        entry already covering kind is kept.
+        """
+        try:
+            path, size, mtime = ParseCache._file_key(filename)
+        except OSError:
+            return
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (size, mtime) and \
+                    kind_covers(entry[2], kind):
+                return
+            self._entries.pop(path, None)
+            self._entries[path] = (size, mtime, kind, data)
+            while self.max_entries is not None and \
+                    len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_parse(self, filename, kind, parse_func):
+        """
+        Registered data of filename covering kind if valid, otherwise
+        parse_func() which is then registered. Threads requesting an
+        output being parsed wait for that parse.
+        """
+        key = os.path.abspath(filename)
+        with self._lock:
+            parse_lock = self._parse_locks.setdefault(key, [threading.Lock(), 0])
+            parse_lock[1] += 1
+        try:
+            with parse_lock[0]:
+                data = self.get(filename, kind)
+                if data is None:
+                    data = parse_func()
+                    self.set(filename, kind, data)
+        finally:
+            with self._lock:
+                parse_lock[1] -= 1
+                if not parse_lock[1]:
+                    del self._parse_locks[key]
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_output_registry = OutputRegistry()
+
+
+def get_output_registry():
+    """
+    Registry of the outputs parsed during the session
+    """
+    return _output_registry
+
+
+def cached_parse(parse_cache, filename, kind, parse_func):
+    """
+    parse_func() for filename unless its result is registered for the
+    session (see OutputRegistry), through parse_cache if a cache is given
+    (may be None)
+    """
+    def parse():
+        if parse_cache is None:
+            return parse_func()
+        return parse_cache.get_or_parse(filename, kind, parse_func)
+    return _output_registry.get_or_parse(filename, kind, parse)
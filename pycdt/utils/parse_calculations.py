@@ -14,25 +14,42 @@ __date__  = "Sep 14, 2014"
 
 import os
 import glob
+import time
 import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 from monty.serialization import loadfn, dumpfn
 from monty.json import MontyEncoder, MontyDecoder
 
 from pymatgen.core import PeriodicSite, Structure
-from pymatgen.ext.matproj import MPRester
-from pymatgen.io.vasp.outputs import Vasprun, Locpot, Outcar, Poscar
+from pymatgen.io.vasp.outputs import Vasprun, Poscar
 from pymatgen.io.vasp.inputs import Potcar
 from pymatgen.entries.computed_entries import ComputedStructureEntry
+from pymatgen.ext.matproj import MPRestError
 from pymatgen.analysis.defects.core import Vacancy, Substitution, Interstitial, DefectEntry
 from pymatgen.analysis.defects.defect_compatibility import DefectCompatibility
 from pymatgen.analysis.structure_matcher import StructureMatcher
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
 from pycdt.core.chemical_potentials import MPChemPotAnalyzer
-
-
-def convert_cd_to_de( cd, b_cse):
+from pycdt.corrections.finite_size_charge_correction import \
+    get_batch_freysoldt_correction, get_correction_freysoldt, get_correction_kumagai
+from pycdt.utils.manifest import load_job_manifest, get_output_path
+from pycdt.utils.mp_provider import get_mp_provider, MPDataUnavailable
+from pycdt.utils.output_readers import VASPRUN_FIELDS, SelectiveVasprun, \
+    VasprunSummary, LocpotAverages, read_outcar_electrostatic_potential, \
+    resolve_output_path, \
+    get_locpot_sidecar_paths, get_eigenvalue_sidecar_path, \
+    write_eigenvalue_sidecar, load_eigenvalue_sidecar, probe_calculation, \
+    read_dielectric_tensors
+from pycdt.utils.parse_cache import cached_parse, get_output_registry
+from pycdt.utils.prefetch import ReadAheadPrefetcher, DEFAULT_PREFETCH_DEPTH
+from pycdt.utils.site_matching import match_defect_sites, structures_match_by_index
+
+
+def convert_cd_to_de( cd, b_cse, structure_interner=None):
     """
     As of pymatgen v2.0, ComputedDefect objects were deprecated in favor
     of DefectEntry objects in pymatgen.analysis.defects.core
@@ -43,6 +60,8 @@ def convert_cd_to_de( cd, b_cse):
     :param cd (dict or ComputedDefect object): ComputedDefect as an object or as a dictionary
     :params b_cse (dict or ComputedStructureEntry object): ComputedStructureEntry of bulk entry
         associated with the ComputedDefect.
+    :param structure_interner (StructureInterner): if given, the bulk supercell structure
+        is built once and shared among the DefectEntry objects converted with this interner
     :return: de (DefectEntry): Resulting DefectEntry object
     """
     if type(cd) != dict:
@@ -50,7 +69,10 @@ def convert_cd_to_de( cd, b_cse):
     if type(b_cse) != dict:
         b_cse = b_cse.as_dict()
 
-    bulk_sc_structure = Structure.from_dict(b_cse["structure"])
+    if structure_interner is not None:
+        bulk_sc_structure = structure_interner.intern(b_cse["structure"])
+    else:
+        bulk_sc_structure = Structure.from_dict(b_cse["structure"])
 
     #modify defect_site as required for Defect object, confirming site exists in bulk structure
     site_cls = cd["site"]
@@ -90,10 +112,248 @@ def convert_cd_to_de( cd, b_cse):
 
     return de
 
+def _output_file(*path_parts):
+    """
+    Path of an output file, or of its compressed variant if only that
+    exists (see resolve_output_path)
+    """
+    return resolve_output_path(os.path.join(*path_parts))
+
+
+def _vasprun_kind(fields):
+    return "vasprun:" + ",".join(sorted(fields))
+
+
+# registry kinds of the VasprunSummary of vasprun.xml files parsed without
+# and with the POTCARs (the potcar_spec then holding the POTCAR hashes); a
+# summary serves the requests of all the SelectiveVasprun fields
+_SUMMARY_KIND = _vasprun_kind(VasprunSummary.FIELDS)
+_SUMMARY_POTCAR_KIND = _vasprun_kind(
+    VasprunSummary.FIELDS + ("potcar_hashes",))
+
+
+def _load_vasprun(vr_file, parse_potcar_file=True):
+    """
+    VasprunSummary of the full Vasprun of vr_file, registered for the
+    session. The Vasprun itself is not kept. A summary parsed with the
+    POTCARs also serves the requests without them.
+    """
+    kind = _SUMMARY_POTCAR_KIND if parse_potcar_file else _SUMMARY_KIND
+    return get_output_registry().get_or_parse(
+        vr_file, kind, lambda: VasprunSummary.from_vasprun(
+            Vasprun(vr_file, parse_potcar_file=parse_potcar_file)))
+
+
+def _load_poscar_structure(poscar_file):
+    """
+    Structure of poscar_file, registered for the session
+    """
+    return get_output_registry().get_or_parse(
+        poscar_file, "poscar", lambda: Poscar.from_file(poscar_file).structure)
+
+
+def _is_parsed(filename, kind, parse_cache=None):
+    """
+    Whether data of the given kind parsed from filename are available in
+    the session registry or in parse_cache (if given)
+    """
+    if get_output_registry().get(filename, kind) is not None:
+        return True
+    return parse_cache is not None and parse_cache.get(filename, kind) is not None
+
+
+def _load_selective_vasprun(vr_file, fields, parse_cache=None):
+    """
+    SelectiveVasprun of vr_file with the requested fields, read through
+    parse_cache if given. The data registered for vr_file during the
+    session (e.g. a VasprunSummary) are returned instead if they hold the
+    fields; otherwise the fields already registered are read along with
+    the requested ones, the new parse replacing the registered one.
+    """
+    registry = get_output_registry()
+    kind = _vasprun_kind(fields)
+    vr = registry.get(vr_file, kind)
+    if vr is not None:
+        return vr
+    registered_kind = registry.get_kind(vr_file)
+    if registered_kind is not None and registered_kind.startswith("vasprun:"):
+        fields = set(fields) | set(registered_kind.split(":", 1)[1].split(","))
+        fields = sorted(fields & set(VASPRUN_FIELDS))
+        kind = _vasprun_kind(fields)
+    return cached_parse(parse_cache, vr_file, kind,
+                        lambda: SelectiveVasprun(vr_file, fields=fields))
+
+
+def _load_electrostatic_potential(outcar_file, parse_cache=None):
+    """
+    Site-averaged electrostatic potentials of outcar_file, read through
+    parse_cache if given
+    """
+    return cached_parse(parse_cache, outcar_file, "outcar_electrostatic_potential",
+                        lambda: read_outcar_electrostatic_potential(outcar_file))
+
+
+# defect structures validated against their defect object during this
+# session, by fingerprint of the files they were parsed from (see
+# _validate_defect_structure)
+_validated_defect_structures = set()
+
+
+def _file_fingerprint(filename):
+    """
+    Path, size and modification time of filename (None if missing)
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime
+
+
+def _validate_defect_structure(test_defect_structure, defect_structure,
+                               source_files=()):
+    """
+    Check that the defect structure generated from the defect object
+    matches the parsed defect structure. The direct site by site
+    comparison is tried first and the StructureMatcher fit only if it
+    fails. Checks passed are memoized by fingerprint of source_files,
+    the files both structures were obtained from.
+
+    Raises:
+        ValueError if the structures do not match
+    """
+    key = tuple(_file_fingerprint(f) for f in source_files)
+    if source_files and key in _validated_defect_structures:
+        return
+    if not structures_match_by_index(test_defect_structure, defect_structure) and \
+            not StructureMatcher(primitive_cell=False, scale=False, attempt_supercell=False,
+                                 allow_subset=False).fit(test_defect_structure,
+                                                         defect_structure):
+        # NOTE: this does not insure that cartesian coordinates or indexing are identical
+        raise ValueError("Error in defect object matching!")
+    if source_files:
+        _validated_defect_structures.add(key)
+
+
+# mp-ids resolved for bulk structures during this session, by structure
+# fingerprint (see resolve_bulk_mpid)
+_resolved_mpids = {}
+
+
+def _structure_fingerprint(structure):
+    """
+    Hashable fingerprint of a structure (composition, lattice and sites)
+    """
+    lattice = tuple(np.round(structure.lattice.matrix, 4).flatten())
+    sites = tuple(sorted((str(site.specie),) + tuple(np.round(np.mod(site.frac_coords, 1), 4))
+                         for site in structure))
+    return structure.composition.formula, lattice, sites
+
+
+def _get_spacegroup_number(structure, symprec=0.1):
+    try:
+        return SpacegroupAnalyzer(structure, symprec=symprec).get_space_group_number()
+    except Exception:
+        return None
+
+
+def resolve_bulk_mpid(bulk_structure, mp_provider=None, ltol=0.2):
+    """
+    Find the Materials Project id of a bulk (supercell) structure. The
+    structures of all MP entries with the same reduced composition are
+    fetched in one batched query, and cheaply pre-filtered by volume per
+    atom (within the lattice tolerance of the structure matching) and by
+    space group before the StructureMatcher fits. Resolved mp-ids are
+    memoized by structure fingerprint for the session.
+
+    Args:
+        bulk_structure (Structure): bulk supercell structure
+        mp_provider (MPDataProvider): provider of MP data. Default is
+            get_mp_provider()
+        ltol (float): fractional length tolerance of the structure matching
+    Returns:
+        mp-id (lowest number if several MP structures match), or None if
+        no MP structure matches or if the MP data are unavailable (e.g.
+        offline cache miss).
+    """
+    logger = logging.getLogger(__name__)
+    fingerprint = _structure_fingerprint(bulk_structure)
+    if fingerprint in _resolved_mpids:
+        return _resolved_mpids[fingerprint]
+
+    mp = mp_provider or get_mp_provider()
+    redcomp = bulk_structure.composition.reduced_composition
+    try:
+        mp_entries = mp.get_entries_in_chemsys(list(bulk_structure.symbol_set))
+        mplist = sorted(set(ment.entry_id for ment in mp_entries
+                            if ment.composition.reduced_composition == redcomp))
+        mp_structures = mp.get_structures_by_material_ids(mplist) if mplist else {}
+    except MPDataUnavailable:
+        logger.warning("No MP data available for {}".format(
+            bulk_structure.composition.reduced_formula))
+        return None
+    except MPRestError:
+        raise ValueError("Error with querying MPRester for {}"
+                         "".format( bulk_structure.composition.reduced_formula))
+
+    # volume per atom within the range allowed by the length tolerance
+    vol_per_atom = bulk_structure.volume / len(bulk_structure)
+    candidates = [mpid for mpid, mpstruct in mp_structures.items()
+                  if (1 - ltol) ** 3 <= (mpstruct.volume / len(mpstruct)) / vol_per_atom
+                  <= (1 + ltol) ** 3]
+
+    # candidates with the same space group are tried first; the others are
+    # only tried if none of those fit, since the supercell symmetry may be
+    # slightly broken
+    bulk_sg = _get_spacegroup_number(bulk_structure)
+    same_sg = [mpid for mpid in candidates
+               if _get_spacegroup_number(mp_structures[mpid]) == bulk_sg]
+    matcher = StructureMatcher(primitive_cell=True, scale=False, attempt_supercell=True,
+                               allow_subset=False, ltol=ltol)
+    mpid_fit_list = []
+    for trial_list in [same_sg, [mpid for mpid in candidates if mpid not in same_sg]]:
+        mpid_fit_list = [trial_mpid for trial_mpid in trial_list
+                         if matcher.fit(bulk_structure, mp_structures[trial_mpid])]
+        if mpid_fit_list:
+            break
+
+    if len(mpid_fit_list) == 1:
+        mpid = mpid_fit_list[0]
+        logger.info("Single mp-id found for bulk structure: {}.".format( mpid))
+    elif len(mpid_fit_list) > 1:
+        mpid = sorted(mpid_fit_list, key=lambda x: int(x.split("-")[1]))[0]
+        logger.info("Multiple mp-ids found for bulk structure:{}\nWill use lowest number mpid "
+                    "for bulk band structure = {}.".format(str(mpid_fit_list), mpid))
+    else:
+        logger.warning("Could not find bulk structure in MP database after tying the "
+                       "following list:\n{}".format( mplist))
+        mpid = None
+
+    _resolved_mpids[fingerprint] = mpid
+    return mpid
+
+
+def _has_double_counting(site_matching_indices):
+    """
+    True if a bulk or defect site appears in more than one matched pair
+    """
+    bulk_indices = set(inds[0] for inds in site_matching_indices)
+    defect_indices = set(inds[1] for inds in site_matching_indices)
+    return len(bulk_indices) != len(defect_indices)
+
+
+def _load_locpot_averages(locpot_file, parse_cache=None):
+    """
+    LocpotAverages of locpot_file, read through parse_cache if given
+    """
+    return cached_parse(parse_cache, locpot_file, "locpot_planar_averages",
+                        lambda: LocpotAverages.from_file(locpot_file))
+
+
 class SingleDefectParser(object):
 
     def __init__(self, defect_entry, compatibility=DefectCompatibility(),
-                 defect_vr = None, bulk_vr = None):
+                 defect_vr = None, bulk_vr = None, parse_cache = None):
         """
         Parse a defect object using features that resemble that of a standard
         DefectBuilder object (emmet), but without the requirement of atomate.
@@ -104,18 +364,22 @@ class SingleDefectParser(object):
             must exist within the defect_entry parameters class.
         :param compatibility (DefectCompatibility): Compatibility class instance for
             performing compatibility analysis on defect entry.
-        :param defect_vr (Vasprun):
-        :param bulk_vr (Vasprun):
+        :param defect_vr (Vasprun, VasprunSummary or SelectiveVasprun):
+        :param bulk_vr (Vasprun, VasprunSummary or SelectiveVasprun):
+        :param parse_cache (ParseCache): cache of parsed output data, used by
+            the loaders to skip reparsing of unchanged output files.
 
         """
         self.defect_entry = defect_entry
         self.compatibility = compatibility
         self.defect_vr = defect_vr
         self.bulk_vr = bulk_vr
+        self.parse_cache = parse_cache
 
     @staticmethod
     def from_paths(path_to_defect, path_to_bulk, dielectric, defect_charge, mpid = None,
-                   compatibility=DefectCompatibility()):
+                   compatibility=DefectCompatibility(), full_vasprun=False,
+                   parse_cache=None):
         """
         Identify defect object based on file paths. Minimal parsing performing for
         instantiating the SingleDefectParser class.
@@ -127,6 +391,11 @@ class SingleDefectParser(object):
         :param mpid (str):
         :param compatibility (DefectCompatibility): Compatibility class instance for
             performing compatibility analysis on defect entry.
+        :param full_vasprun (bool): If True, parse the full Vasprun objects
+            (of which a VasprunSummary is kept). By default only the final energy and initial structure are read
+            with a SelectiveVasprun; the full Vasprun objects are then
+            parsed when needed (get_stdrd_metadata).
+        :param parse_cache (ParseCache): cache of parsed output data.
 
         Return:
             Instance of the SingleDefectParser class.
@@ -134,13 +403,20 @@ class SingleDefectParser(object):
         parameters = {"bulk_path": path_to_bulk, "defect_path": path_to_defect,
                       "dielectric": dielectric, "mpid": mpid}
 
+        def load_vasprun(path):
+            vr_file = _output_file(path, "vasprun.xml")
+            if full_vasprun:
+                return _load_vasprun(vr_file)
+            return _load_selective_vasprun(vr_file, ["final_energy", "initial_structure"],
+                                           parse_cache=parse_cache)
+
         # add bulk simple properties
-        bulk_vr = Vasprun(os.path.join(path_to_bulk, "vasprun.xml"))
+        bulk_vr = load_vasprun(path_to_bulk)
         bulk_energy = bulk_vr.final_energy
         bulk_sc_structure = bulk_vr.initial_structure.copy()
 
         # add defect simple properties
-        defect_vr = Vasprun(os.path.join(path_to_defect, "vasprun.xml"))
+        defect_vr = load_vasprun(path_to_defect)
         defect_energy = defect_vr.final_energy
         initial_defect_structure = defect_vr.initial_structure.copy()
 
@@ -182,44 +458,16 @@ class SingleDefectParser(object):
         # WARNING: this can cause issues if intial_defect_structure is slightly different than
         # bulk_sc_structure (as a result of multiple relaxation steps, for example)
         if defect_index_sc_coords is None:
-            bulksites = [site.frac_coords for site in bulk_sc_structure]
-            initsites = [site.frac_coords for site in initial_defect_structure]
-            distmatrix = initial_defect_structure.lattice.get_all_distances(bulksites,
-                                                                            initsites)
-            min_dist_with_index = [[min(distmatrix[bulk_index]), int(bulk_index),
-                                    int(distmatrix[bulk_index].argmin())] for bulk_index in
-                                   range(len(distmatrix))]  # list of [min dist, bulk ind, defect ind]
-
-            site_matching_indices = []
-            poss_defect = []
-            if defect_type in ["Vacancy", "Interstitial"]:
-                for mindist, bulk_index, defect_index in min_dist_with_index:
-                    if mindist < 0.1:
-                        site_matching_indices.append([bulk_index, defect_index])
-                    elif defect_type == "Vacancy":
-                        poss_defect.append([bulk_index, bulksites[bulk_index][:]])
-
-                if defect_type == "Interstitial":
-                    poss_defect = [[ind, fc[:]] for ind, fc in enumerate(initsites) \
-                                   if ind not in np.array(site_matching_indices)[:, 1]]
-
-            elif defect_type == "Substitution":
-                for mindist, bulk_index, defect_index in min_dist_with_index:
-                    species_match = bulk_sc_structure[bulk_index].specie == \
-                                    initial_defect_structure[defect_index].specie
-                    if mindist < 0.1 and species_match:
-                        site_matching_indices.append([bulk_index, defect_index])
-
-                    elif not species_match:
-                        poss_defect.append([defect_index, initsites[defect_index][:]])
-
-            if len(poss_defect) != 1:
+            site_matching_indices, poss_defect = match_defect_sites(
+                    bulk_sc_structure, initial_defect_structure, defect_type)
+
+            if len(poss_defect) == 1:
                 defect_index_sc_coords = poss_defect[0][0]
             else:
                 raise ValueError("Found {} possible defect sites when matching bulk and "
                                  "defect structure".format(len(poss_defect)))
 
-            if len(set(np.array(site_matching_indices)[:, 0])) != len(set(np.array(site_matching_indices)[:, 1])):
+            if _has_double_counting(site_matching_indices):
                 raise ValueError("Error occured in site_matching routine. Double counting of site matching "
                                   "occured:{}\nAbandoning structure parsing.".format(site_matching_indices))
 
@@ -236,18 +484,19 @@ class SingleDefectParser(object):
                             "defect_site": defect_site}
         defect = MontyDecoder().process_decoded(for_monty_defect)
         test_defect_structure = defect.generate_defect_structure()
-        if not StructureMatcher(primitive_cell=False, scale=False, attempt_supercell=False,
-                                allow_subset=False).fit(test_defect_structure,
-                                                        defect_vr.initial_structure):
-            # NOTE: this does not insure that cartesian coordinates or indexing are identical
-            raise ValueError("Error in defect object matching!")
+        _validate_defect_structure(
+                test_defect_structure, defect_vr.initial_structure,
+                source_files=[_output_file(path_to_bulk, "vasprun.xml"),
+                              _output_file(path_to_defect, "vasprun.xml"),
+                              transformation_path])
 
 
         defect_entry = DefectEntry(defect, defect_energy - bulk_energy,
                                    corrections={}, parameters=parameters)
 
         return SingleDefectParser(defect_entry, compatibility=compatibility,
-                                  defect_vr=defect_vr, bulk_vr=bulk_vr)
+                                  defect_vr=defect_vr, bulk_vr=bulk_vr,
+                                  parse_cache=parse_cache)
 
 
     def freysoldt_loader(self, bulk_locpot=None):
@@ -256,34 +505,34 @@ class SingleDefectParser(object):
         parameters dict.
 
         Args:
-            bulk_locpot (Locpot): Add bulk Locpot object for expedited parsing.
-                If None, will load from file path variable bulk_path
+            bulk_locpot (Locpot or LocpotAverages): Add bulk Locpot object
+                for expedited parsing. If None, the planar averages are
+                streamed from the LOCPOT in bulk_path
         Return:
-            bulk_locpot object for reuse by another defect entry (for expedited parsing)
+            bulk_locpot object (LocpotAverages if read from file) for reuse
+            by another defect entry (for expedited parsing).
         """
         if not self.defect_entry.charge:
             #dont need to load locpots if charge is zero
             return None
 
         if not bulk_locpot:
-            bulk_locpot_path = os.path.join(self.defect_entry.parameters["bulk_path"],
-                                            "LOCPOT")
-            bulk_locpot = Locpot.from_file(bulk_locpot_path)
+            bulk_locpot = _load_locpot_averages(
+                _output_file(self.defect_entry.parameters["bulk_path"], "LOCPOT"),
+                self.parse_cache)
 
-        def_locpot_path = os.path.join(self.defect_entry.parameters["defect_path"],
-                                       "LOCPOT")
-
-        def_locpot = Locpot.from_file( def_locpot_path)
+        def_locpot = _load_locpot_averages(
+            _output_file(self.defect_entry.parameters["defect_path"], "LOCPOT"),
+            self.parse_cache)
 
         axis_grid = [def_locpot.get_axis_grid(i) for i in range(3)]
-        blk_planar_averages = [bulk_locpot.get_average_along_axis(i) for i in range(3)]
+        bulk_planar_averages = [bulk_locpot.get_average_along_axis(i) for i in range(3)]
         defect_planar_averages = [def_locpot.get_average_along_axis(i) for i in range(3)]
-
         defect_frac_sc_coords = self.defect_entry.site.frac_coords
 
         self.defect_entry.parameters.update({
             "axis_grid": axis_grid,
-            "bulk_planar_averages": blk_planar_averages,
+            "bulk_planar_averages": bulk_planar_averages,
             "defect_planar_averages": defect_planar_averages,
             "initial_defect_structure": def_locpot.structure,
             "defect_frac_sc_coords": defect_frac_sc_coords
@@ -298,70 +547,48 @@ class SingleDefectParser(object):
 
         Args:
             bulk_outcar (Outcar): Add bulk Outcar object for expedited parsing.
-                If None, will load from file path variable bulk_path
+                If None, the site potentials are read from the OUTCAR in
+                bulk_path
         Return:
-            bulk_outcar object for reuse by another defect entry for 
-            expedited parsing
+            bulk_outcar object (only holding the electrostatic_potential
+            if read from file) for reuse by another defect entry for
+            expedited parsing.
         """
         if not self.defect_entry.charge:
             # dont need to load outcars if charge is zero
             return None
 
         if not bulk_outcar:
-            bulk_outcar_path = os.path.join(
-                    self.defect_entry.parameters["bulk_path"], "OUTCAR")
-            bulk_outcar = Outcar( bulk_outcar_path)
-
-        def_outcar_path = os.path.join(
-                self.defect_entry.parameters["defect_path"], "OUTCAR")
-        def_outcar = Outcar(def_outcar_path)
-
+            bulk_outcar = _BulkSitePotentials(_load_electrostatic_potential(
+                _output_file(self.defect_entry.parameters["bulk_path"], "OUTCAR"),
+                self.parse_cache))
         bulk_atomic_site_averages = bulk_outcar.electrostatic_potential
-        defect_atomic_site_averages = def_outcar.electrostatic_potential
 
-        bulk_sc_structure = Poscar.from_file(
-                os.path.join(self.defect_entry.parameters["bulk_path"],
-                                                          "POSCAR")).structure
+        defect_atomic_site_averages = _load_electrostatic_potential(
+            _output_file(self.defect_entry.parameters["defect_path"], "OUTCAR"),
+            self.parse_cache)
+
+        bulk_sc_structure = _load_poscar_structure(
+                _output_file(self.defect_entry.parameters["bulk_path"], "POSCAR"))
 
-        if os.path.exists(os.path.join(self.defect_entry.parameters["defect_path"], "POSCAR")):
-            initial_defect_structure = Poscar.from_file(os.path.join(self.defect_entry.parameters["defect_path"],
-                                                                     "POSCAR")).structure
+        if os.path.exists(_output_file(self.defect_entry.parameters["defect_path"], "POSCAR")):
+            initial_defect_structure = _load_poscar_structure(
+                    _output_file(self.defect_entry.parameters["defect_path"], "POSCAR"))
         elif self.defect_vr:
             initial_defect_structure = self.defect_vr.initial_structure
         else:
-            initial_defect_structure = Vasprun(os.path.join(self.defect_entry.parameters["defect_path"],
-                                                                       "vasprun.xml")).initial_structure
-
-        bulksites = [site.frac_coords for site in bulk_sc_structure]
-        initsites = [site.frac_coords for site in initial_defect_structure]
-        distmatrix = initial_defect_structure.lattice.get_all_distances(bulksites,
-                                                                        initsites)  # first index of this list is bulk index
-        min_dist_with_index = [[min(distmatrix[bulk_index]), int(bulk_index),
-                                int(distmatrix[bulk_index].argmin())] for bulk_index in
-                               range(len(distmatrix))]  # list of [min dist, bulk ind, defect ind]
-
-        site_matching_indices = []
-        poss_defect = []
-        if isinstance(self.defect_entry.defect, (Vacancy, Interstitial)):
-            for mindist, bulk_index, defect_index in min_dist_with_index:
-                if mindist < 0.1:
-                    site_matching_indices.append([bulk_index, defect_index])
-                elif isinstance(self.defect_entry.defect, Vacancy):
-                    poss_defect.append([bulk_index, bulksites[bulk_index][:]])
-
-            if isinstance(self.defect_entry.defect, Interstitial):
-                poss_defect = [[ind, fc[:]] for ind, fc in enumerate(initsites) \
-                               if ind not in np.array(site_matching_indices)[:, 1]]
-
-        elif isinstance(self.defect_entry.defect, Substitution):
-            for mindist, bulk_index, defect_index in min_dist_with_index:
-                species_match = bulk_sc_structure[bulk_index].specie == \
-                                initial_defect_structure[defect_index].specie
-                if mindist < 0.1 and species_match:
-                    site_matching_indices.append([bulk_index, defect_index])
-
-                elif not species_match:
-                    poss_defect.append([defect_index, initsites[defect_index][:]])
+            initial_defect_structure = _load_selective_vasprun(
+                    _output_file(self.defect_entry.parameters["defect_path"], "vasprun.xml"),
+                    ["initial_structure"], parse_cache=self.parse_cache).initial_structure
+
+        for defect_type in [Vacancy, Interstitial, Substitution]:
+            if isinstance(self.defect_entry.defect, defect_type):
+                site_matching_indices, poss_defect = match_defect_sites(
+                        bulk_sc_structure, initial_defect_structure,
+                        defect_type.__name__)
+                break
+        else:
+            site_matching_indices, poss_defect = [], []
 
         if len(poss_defect) == 1:
             defect_index_sc_coords = poss_defect[0][0]
@@ -370,7 +597,7 @@ class SingleDefectParser(object):
             raise ValueError("Found {} possible defect sites when matching bulk and "
                               "defect structure".format(len(poss_defect)))
 
-        if len(set(np.array(site_matching_indices)[:, 0])) != len(set(np.array(site_matching_indices)[:, 1])):
+        if _has_double_counting(site_matching_indices):
             raise ValueError("Error occured in site_matching routine. Double counting of site matching "
                               "occured:{}\nAdvising against Kumagai parsing.".format(site_matching_indices))
 
@@ -392,15 +619,33 @@ class SingleDefectParser(object):
 
         return bulk_outcar
 
-    def get_stdrd_metadata(self):
+    def get_stdrd_metadata(self, eigenvalue_sidecar=True):
+        """
+        Load the standard metadata of the bulk and defect runs (energies,
+        structures, run settings) and the defect eigenvalues needed for band
+        filling and localization analysis.
 
-        if not self.bulk_vr:
+        By default the parameters then hold no "eigenvalues" and
+        "kpoint_weights" keys: use load_defect_eigenvalues(parameters),
+        which reads them from the parameters or from the "eigenvalues_file"
+        they reference, to access them.
+
+        Args:
+            eigenvalue_sidecar (bool): Store the eigenvalues and k-point
+                weights as float32 arrays in a .npz file next to the defect
+                vasprun.xml, referenced by the "eigenvalues_file" parameter,
+                instead of in the parameters (see load_defect_eigenvalues).
+                Falls back to the parameters if the file can not be written.
+        """
+
+        # full parsing is required for eigenvalues, kpoints and potcar data
+        if not isinstance(self.bulk_vr, (Vasprun, VasprunSummary)):
             path_to_bulk = self.defect_entry.parameters["bulk_path"]
-            self.bulk_vr = Vasprun( os.path.join(path_to_bulk, "vasprun.xml"))
+            self.bulk_vr = _load_vasprun(_output_file(path_to_bulk, "vasprun.xml"))
 
-        if not self.defect_vr:
+        if not isinstance(self.defect_vr, (Vasprun, VasprunSummary)):
             path_to_defect = self.defect_entry.parameters["defect_path"]
-            self.defect_vr = Vasprun( os.path.join(path_to_defect, "vasprun.xml"))
+            self.defect_vr = _load_vasprun(_output_file(path_to_defect, "vasprun.xml"))
 
         # standard bulk metadata
         bulk_energy = self.bulk_vr.final_energy
@@ -429,6 +674,21 @@ class SingleDefectParser(object):
                                              "defect_energy": self.defect_vr.final_energy})
 
         # grab defect energy and eigenvalue information for band filling and localization analysis
+        if eigenvalue_sidecar:
+            eig_file = get_eigenvalue_sidecar_path(
+                _output_file(self.defect_entry.parameters["defect_path"], "vasprun.xml"))
+            try:
+                write_eigenvalue_sidecar(eig_file, self.defect_vr.eigenvalues,
+                                         self.defect_vr.actual_kpoints_weights)
+                self.defect_entry.parameters.pop("eigenvalues", None)
+                self.defect_entry.parameters.pop("kpoint_weights", None)
+                self.defect_entry.parameters["eigenvalues_file"] = eig_file
+                return
+            except (IOError, OSError):
+                logging.getLogger(__name__).warning(
+                    "Could not write {}, storing eigenvalues in the defect entry "
+                    "parameters".format(eig_file))
+
         eigenvalues =  {spincls.value: eigdict.copy() for spincls, eigdict in self.defect_vr.eigenvalues.items()}
         kpoint_weights = self.defect_vr.actual_kpoints_weights[:]
         self.defect_entry.parameters.update({"eigenvalues": eigenvalues,
@@ -440,42 +700,15 @@ class SingleDefectParser(object):
 
         if not self.bulk_vr:
             path_to_bulk = self.defect_entry.parameters["bulk_path"]
-            self.bulk_vr = Vasprun( os.path.join(path_to_bulk, "vasprun.xml"))
+            self.bulk_vr = _load_selective_vasprun(_output_file(path_to_bulk, "vasprun.xml"),
+                                                   ["initial_structure"],
+                                                   parse_cache=self.parse_cache)
 
         bulk_sc_structure = self.bulk_vr.initial_structure
         mpid = self.defect_entry.parameters["mpid"]
 
         if not mpid:
-            try:
-                with MPRester() as mp:
-                    tmp_mplist = mp.get_entries_in_chemsys(list(bulk_sc_structure.symbol_set))
-                mplist = [ment.entry_id for ment in tmp_mplist if ment.composition.reduced_composition == \
-                          bulk_sc_structure.composition.reduced_composition]
-            except:
-                raise ValueError("Error with querying MPRester for {}"
-                                 "".format( bulk_sc_structure.composition.reduced_formula))
-
-            mpid_fit_list = []
-            for trial_mpid in mplist:
-                with MPRester() as mp:
-                    mpstruct = mp.get_structure_by_material_id(trial_mpid)
-                if StructureMatcher(primitive_cell=True, scale=False, attempt_supercell=True,
-                                    allow_subset=False).fit(bulk_sc_structure, mpstruct):
-                    mpid_fit_list.append( trial_mpid)
-
-            if len(mpid_fit_list) == 1:
-                mpid = mpid_fit_list[0]
-                print("Single mp-id found for bulk structure: {}.".format( mpid))
-            elif len(mpid_fit_list) > 1:
-                num_mpid_list = [int(mp.split(""-"")[1]) for mp in mpid_fit_list]
-                num_mpid_list.sort()
-                mpid  = "mp-"+str(num_mpid_list[0])
-                print("Multiple mp-ids found for bulk structure:{}\nWill use lowest number mpid "
-                      "for bulk band structure = {}.".format(str(mpid_fit_list), mpid))
-            else:
-                print("Could not find bulk structure in MP database after tying the "
-                                  "following list:\n{}".format( mplist))
-                mpid = None
+            mpid = resolve_bulk_mpid(bulk_sc_structure)
         else:
             print("Manually fed mpid = {}".format( mpid))
 
@@ -483,8 +716,10 @@ class SingleDefectParser(object):
         gap_parameters = {}
         if mpid is not None:
             #TODO: NEED to be smarter about use of +U or HSE etc in MP gga band structure calculations...
-            with MPRester() as mp:
-                bs = mp.get_bandstructure_by_material_id( mpid)
+            try:
+                bs = get_mp_provider().get_bandstructure_by_material_id( mpid)
+            except MPDataUnavailable:
+                bs = None
             if bs:
                 cbm = bs.get_cbm()["energy"]
                 vbm = bs.get_vbm()["energy"]
@@ -502,6 +737,9 @@ class SingleDefectParser(object):
                   "perform real band structure calculation...")
 
             gap_parameters.update( {"MP_gga_BScalc_data": None}) #to signal no MP BS is used
+            if not isinstance(self.bulk_vr, (Vasprun, VasprunSummary)):
+                path_to_bulk = self.defect_entry.parameters["bulk_path"]
+                self.bulk_vr = _load_vasprun(_output_file(path_to_bulk, "vasprun.xml"))
             bandgap, cbm, vbm, _ = self.bulk_vr.eigenvalue_band_properties
 
         gap_parameters.update( {"mpid": mpid, "cbm": cbm, "vbm": vbm, "gap": bandgap} )
@@ -510,12 +748,380 @@ class SingleDefectParser(object):
         return
 
     def run_compatibility(self):
-        self.defect_entry = self.compatibility.process_entry(self.defect_entry)
+        # eigenvalues stored in a sidecar are only loaded for the analysis
+        parameters = self.defect_entry.parameters
+        lazy_eigenvalues = "eigenvalues" not in parameters and "eigenvalues_file" in parameters
+        if lazy_eigenvalues:
+            parameters["eigenvalues"], parameters["kpoint_weights"] = \
+                load_defect_eigenvalues(parameters)
+        try:
+            self.defect_entry = self.compatibility.process_entry(self.defect_entry)
+        finally:
+            if lazy_eigenvalues:
+                parameters.pop("eigenvalues", None)
+                parameters.pop("kpoint_weights", None)
         return
 
 
+def load_defect_eigenvalues(parameters):
+    """
+    Eigenvalues and k-point weights of a defect run, from the DefectEntry
+    parameters or from the .npz file they reference (see
+    SingleDefectParser.get_stdrd_metadata). This is the supported accessor
+    of the eigenvalues of parsed defect entries.
+
+    Args:
+        parameters (dict): DefectEntry parameters
+    Returns:
+        (eigenvalues, kpoint_weights) with eigenvalues a dict {spin value:
+        array of shape (nkpoints, nbands, 2)}
+    """
+    if "eigenvalues" in parameters:
+        return parameters["eigenvalues"], parameters["kpoint_weights"]
+    return get_output_registry().get_or_parse(
+        parameters["eigenvalues_file"], "eigenvalues",
+        lambda: load_eigenvalue_sidecar(parameters["eigenvalues_file"]))
+
+
+# vasprun.xml fields read to check and parse the bulk and defect calculations
+_CALCULATION_FIELDS = ["incar", "final_energy", "final_structure", "converged"]
+
+
+def get_correction_input_files(defect_entry, correction_method, parse_cache=None):
+    """
+    Defect output files read by the loader of a charge correction (see
+    SingleDefectParser.freysoldt_loader) that are not already parsed. The
+    OUTCAR potentials of the Kumagai correction are read from the end of
+    the OUTCAR, so no file is returned for that method.
+
+    Args:
+        defect_entry (DefectEntry): entry with "defect_path" in its parameters
+        correction_method (str): "freysoldt" or "kumagai"
+        parse_cache (ParseCache): cache of parsed outputs (optional)
+    Returns:
+        list of paths
+    """
+    if correction_method != "freysoldt" or not defect_entry.charge:
+        return []
+    locpot_file = _output_file(defect_entry.parameters["defect_path"], "LOCPOT")
+    if _is_parsed(locpot_file, "locpot_planar_averages", parse_cache):
+        return []
+    npy_file, meta_file = get_locpot_sidecar_paths(locpot_file)
+    if os.path.exists(meta_file):
+        return [npy_file]
+    return [locpot_file]
+
+
+def _get_vr_and_check_locpot(fldr, parse_cache=None):
+    logger = logging.getLogger(__name__)
+    vr_file = _output_file(fldr,"vasprun.xml")
+    if not os.path.exists(vr_file):
+        logger.warning("{} doesn't exit".format(vr_file))
+        error_msg = ": Failure, vasprun.xml doesn't exist."
+        return (None, error_msg) #Further processing is not useful
+
+    # cheap pre-filter of unfinished and unconverged runs before parsing
+    probe = probe_calculation(fldr)
+    if probe is not None:
+        if not probe["finished"]:
+            logger.warning(
+                "Vasp calculation at {} not finished".format(fldr))
+            error_msg = ": Failure, Vasp calculation not finished."
+            return (None, error_msg)
+        if probe["converged"] is False:
+            logger.warning(
+                "Vasp calculation at {} not converged".format(fldr))
+            error_msg = ": Failure, Vasp calculation not converged."
+            return (None, error_msg)
+        if not probe["has_locpot"]:
+            logger.warning("{} doesn't exit".format(_output_file(fldr, "LOCPOT")))
+            error_msg = ": Failure, LOCPOT doesn't exist"
+            return (None, error_msg)
+
+    try:
+        vr = _load_selective_vasprun(vr_file, _CALCULATION_FIELDS,
+                                     parse_cache=parse_cache)
+    except:
+        logger.warning("Couldn't parse {}".format(vr_file))
+        error_msg = ": Failure, couldn't parse vaprun.xml file."
+        return (None, error_msg)
+
+    if not vr.converged:
+        logger.warning(
+            "Vasp calculation at {} not converged".format(fldr))
+        error_msg = ": Failure, Vasp calculation not converged."
+        return (None, error_msg) # Further processing is not useful
+
+    # Check if locpot exists
+    locpot_file = _output_file(fldr, "LOCPOT")
+    if not os.path.exists(locpot_file):
+        logger.warning("{} doesn't exit".format(locpot_file))
+        error_msg = ": Failure, LOCPOT doesn't exist"
+        return (None, error_msg) #Further processing is not useful
+
+    return (vr, None)
+
+
+def _get_encut_from_potcar(fldr):
+    logger = logging.getLogger(__name__)
+    potcar_file = _output_file(fldr,"POTCAR")
+    if not os.path.exists(potcar_file):
+        logger.warning("Not POTCAR in {} to parse ENCUT".format(fldr))
+        error_msg = ": Failure, No POTCAR file."
+        return (None, error_msg) #Further processing is not useful
+
+    try:
+        potcar = Potcar.from_file(potcar_file)
+    except:
+        logger.warning("Couldn't parse {}".format(potcar_file))
+        error_msg = ": Failure, couldn't read POTCAR file."
+        return (None, error_msg)
+
+    encut = max(ptcr_sngl.enmax for ptcr_sngl in potcar)
+    return (encut, None)
+
+
+def _defect_folder_files(fldr_task):
+    """
+    Files read when parsing a charge folder (see _parse_defect_folder)
+    that are not already parsed, for read-ahead
+    """
+    chrg_fldr, out_fldr, parse_cache = fldr_task
+    files = [os.path.join(chrg_fldr, "transformation.json")]
+    vr_file = _output_file(out_fldr, "vasprun.xml")
+    if not _is_parsed(vr_file, _vasprun_kind(_CALCULATION_FIELDS), parse_cache):
+        files.append(vr_file)
+    return files
+
+
+def _defect_folder_fingerprint(fldr_task):
+    """
+    Fingerprints of all the files read when parsing a charge folder (see
+    _parse_defect_folder): transformation.json, vasprun.xml, and the
+    OUTCAR (convergence probe), LOCPOT and POTCAR (ENCUT) of the outputs.
+    A folder that could not be parsed gives another result only once one
+    of them changed, appeared or was removed.
+    """
+    chrg_fldr, out_fldr, parse_cache = fldr_task
+    return (_file_fingerprint(os.path.join(chrg_fldr, "transformation.json")),) + \
+        tuple(_file_fingerprint(_output_file(out_fldr, filename))
+              for filename in ["vasprun.xml", "OUTCAR", "LOCPOT", "POTCAR"])
+
+
+def _parse_defect_folder(fldr_task):
+    """
+    Parse one charge folder of a defect calculation. Runs in the worker
+    processes of PostProcess.parse_defect_calculations, so only the small
+    extracted payload is sent back to the parent process.
+
+    Args:
+        fldr_task (tuple): (charge folder, folder with the outputs to
+            parse as resolved from the job manifest, ParseCache or None)
+    Returns:
+        dict with "trans_dict", "energy", "encut" and "final_structure",
+        or None if the calculation could not be parsed
+    """
+    logger = logging.getLogger(__name__)
+    chrg_fldr, out_fldr, parse_cache = fldr_task
+    fldr_name = os.path.split(os.path.split(chrg_fldr)[0])[1]
+    logger.debug("Parsing folder {}".format(chrg_fldr))
+    try:
+        trans_dict = loadfn(
+                os.path.join(chrg_fldr, "transformation.json"),
+                cls=MontyDecoder)
+        trans_dict["charge"]
+    except:
+        logger.warning("Unable to parse transformation.jon" +
+                       " in {}. ".format(chrg_fldr) +
+                       "Parsing rest of calculations")
+        return None
+
+    vr, error_msg = _get_vr_and_check_locpot(out_fldr, parse_cache=parse_cache)
+    if error_msg:
+        logger.warning("Parsing the rest of the calculations")
+        return None
+
+    try:
+        encut = vr.incar["ENCUT"]
+    except: # ENCUT not specified in INCAR. Read from POTCAR
+        encut, error_msg = _get_encut_from_potcar(out_fldr)
+        if error_msg:
+            logger.warning("Not able to determine ENCUT "
+                           "in {}".format(fldr_name))
+            logger.warning("Parsing the rest of the "
+                           "calculations")
+            return None
+
+    return {"trans_dict": trans_dict, "energy": vr.final_energy,
+            "encut": encut, "final_structure": vr.final_structure}
+
+
+class BulkReferencePotential(object):
+    """
+    Bulk reference potential of the charge corrections, loaded once by the
+    parent process and shared with correction worker processes, so that
+    the bulk LOCPOT is not reparsed by every worker.
+
+    publish() reads the bulk planar averages of the LOCPOT (Freysoldt
+    correction) or the bulk atomic site potentials of the OUTCAR (Kumagai
+    correction), which are small and carried by the pickled object, so the
+    workers do not read or reduce the bulk grid.
+    """
+
+    def __init__(self, bulk_path, correction_method, parse_cache=None):
+        """
+        Args:
+            bulk_path (str): path of the bulk calculation
+            correction_method (str): "freysoldt" or "kumagai"
+            parse_cache (ParseCache): cache of parsed outputs (optional)
+        """
+        if correction_method not in ["freysoldt", "kumagai"]:
+            raise ValueError("Invalid correction method: {}".format(
+                correction_method))
+        self.bulk_path = bulk_path
+        self.correction_method = correction_method
+        self.parse_cache = parse_cache
+        self.electrostatic_potential = None
+        self.locpot_averages = None
+
+    @property
+    def locpot_path(self):
+        return _output_file(self.bulk_path, "LOCPOT")
+
+    def publish(self):
+        """
+        Load the bulk reference potential in the parent process
+        """
+        if self.correction_method == "freysoldt":
+            self.locpot_averages = _load_locpot_averages(
+                self.locpot_path, self.parse_cache)
+        else:
+            self.electrostatic_potential = _load_electrostatic_potential(
+                _output_file(self.bulk_path, "OUTCAR"), self.parse_cache)
+        return self
+
+    def attach(self):
+        """
+        Bulk object to be passed to the loader of SingleDefectParser
+        (freysoldt_loader or kumagai_loader) in a worker process
+        """
+        if self.locpot_averages is None and self.electrostatic_potential is None:
+            self.publish()
+        if self.correction_method == "kumagai":
+            return _BulkSitePotentials(self.electrostatic_potential)
+        return self.locpot_averages
+
+
+class _BulkSitePotentials(object):
+    """
+    Stand-in for the bulk Outcar in kumagai_loader
+    """
+    def __init__(self, electrostatic_potential):
+        self.electrostatic_potential = electrostatic_potential
+
+
+# Bulk object (planar averages or site potentials) of a correction worker
+# process, attached to the published BulkReferencePotential, and Freysoldt
+# corrections shared by the entries corrected in the process
+_worker_bulk_obj = None
+_worker_freysoldt_corrections = {}
+
+
+def _init_correction_worker(bulk_reference):
+    global _worker_bulk_obj
+    _worker_bulk_obj = bulk_reference.attach() if bulk_reference else None
+    _worker_freysoldt_corrections.clear()
+
+
+def _compute_charge_correction(args):
+    defect_entry, epsilon, correction_method, title, parse_cache = args
+    def_ent_loader = SingleDefectParser(defect_entry, parse_cache=parse_cache)
+    if correction_method == "freysoldt":
+        def_ent_loader.freysoldt_loader(bulk_locpot=_worker_bulk_obj)
+        corr_class = get_batch_freysoldt_correction(
+            def_ent_loader.defect_entry, epsilon,
+            corrections=_worker_freysoldt_corrections)
+        correction = get_correction_freysoldt(def_ent_loader.defect_entry,
+                                              epsilon, title=title,
+                                              corr_class=corr_class)
+    else:
+        def_ent_loader.kumagai_loader(bulk_outcar=_worker_bulk_obj)
+        correction = get_correction_kumagai(def_ent_loader.defect_entry,
+                                            epsilon, title=title)
+    return {"charge_correction": correction}
+
+
+def get_charge_corrections(defect_entries, epsilon, correction_method="freysoldt",
+                           nprocs=1, parse_cache=None, plot_results=False,
+                           prefetch_depth=DEFAULT_PREFETCH_DEPTH):
+    """
+    Compute the charge corrections of defect entries sharing the same bulk
+    calculation, with nprocs worker processes. The bulk reference potential
+    is loaded once and shared with the workers (see BulkReferencePotential),
+    and the Freysoldt point charge sums are computed once per worker (see
+    BatchFreysoldtCorrection in pycdt.corrections.finite_size_charge_correction).
+
+    Args:
+        defect_entries ([DefectEntry]): defect entries with "bulk_path" and
+            "defect_path" in their parameters
+        epsilon (float or 3x3 matrix): dielectric constant
+        correction_method (str): "freysoldt" or "kumagai"
+        nprocs (int): Number of worker processes
+        parse_cache (ParseCache): cache of parsed outputs (optional)
+        plot_results (bool): Plot the corrections in the defect folders
+        prefetch_depth (int): Number of defect entries whose potential
+            files are read ahead, in a background thread, of those being
+            corrected. 0 disables the read-ahead.
+    Returns:
+        dict of {defect_path: {"charge_correction": correction}}
+    """
+    bulk_reference = None
+    if any(entry.charge for entry in defect_entries):
+        bulk_reference = BulkReferencePotential(
+            defect_entries[0].parameters["bulk_path"], correction_method,
+            parse_cache=parse_cache).publish()
+
+    tasks = []
+    for entry in defect_entries:
+        title = None
+        if plot_results:
+            title = os.path.join(entry.parameters["defect_path"],
+                                 "{}_chg_{}".format(entry.name, entry.charge))
+        tasks.append((entry, epsilon, correction_method, title, parse_cache))
+
+    nprocs = min(nprocs, len(tasks))
+    # the pool is forked before the read-ahead thread starts
+    pool = None
+    if nprocs > 1:
+        pool = multiprocessing.Pool(processes=nprocs,
+                                    initializer=_init_correction_worker,
+                                    initargs=(bulk_reference,))
+    prefetcher = ReadAheadPrefetcher(
+            tasks, lambda task: get_correction_input_files(
+                task[0], task[2], parse_cache=parse_cache),
+            depth=prefetch_depth, in_flight=max(nprocs, 1))
+    results = []
+    if pool is not None:
+        try:
+            for result in pool.imap(_compute_charge_correction, prefetcher):
+                results.append(result)
+                prefetcher.task_done()
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init_correction_worker(bulk_reference)
+        for task in prefetcher:
+            results.append(_compute_charge_correction(task))
+            prefetcher.task_done()
+
+    return {entry.parameters["defect_path"]: result
+            for entry, result in zip(defect_entries, results)}
+
+
 class PostProcess(object):
-    def __init__(self, root_fldr, mpid=None, mapi_key=None):
+    def __init__(self, root_fldr, mpid=None, mapi_key=None, nprocs=1,
+                 parse_cache=None, prefetch_depth=DEFAULT_PREFETCH_DEPTH):
         """
         Post processing object for charged point-defect calculations.
 
@@ -526,88 +1132,84 @@ class PostProcess(object):
             mpid (str): Materials Project ID of bulk structure;
                 format "mp-X", where X is an integer;
             mapi_key (str): Materials API key to access database.
+            nprocs (int): number of processes used to parse the defect
+                calculations. Default is serial parsing.
+            parse_cache (ParseCache): cache of parsed output data. Only
+                new or changed outputs are reparsed when given (e.g.
+                ParseCache.from_root_fldr(root_fldr)).
+            prefetch_depth (int): number of charge folders whose output
+                files are read ahead, in a background thread, of those
+                being parsed. 0 disables the read-ahead.
 
         """
         self._root_fldr = root_fldr
         self._mpid = mpid
         self._mapi_key = mapi_key
+        self._nprocs = nprocs
+        self._parse_cache = parse_cache
+        self._prefetch_depth = prefetch_depth
         self._substitution_species = set()
+        self.dielectric_source = None
+        self.stage_timings = {}
+        # process pool of compile_all, forked before its stage threads start
+        self._pool = None
 
     def parse_defect_calculations(self):
         """
         Parses the defect calculations as DefectEntry objects,
         from a PyCDT root_fldr file structure.
         Charge correction is missing in the first run.
+        With nprocs > 1, the charge folders are parsed in a process pool.
         """
         logger = logging.getLogger(__name__)
-        parsed_defects = []
-        subfolders = glob.glob(os.path.join(self._root_fldr, "vac_*"))
-        subfolders += glob.glob(os.path.join(self._root_fldr, "as_*"))
-        subfolders += glob.glob(os.path.join(self._root_fldr, "sub_*"))
-        subfolders += glob.glob(os.path.join(self._root_fldr, "inter_*"))
-
-        def get_vr_and_check_locpot(fldr):
-            vr_file = os.path.join(fldr,"vasprun.xml")
-            if not os.path.exists(vr_file):
-                logger.warning("{} doesn't exit".format(vr_file))
-                error_msg = ": Failure, vasprun.xml doesn't exist."
-                return (None, error_msg) #Further processing is not useful
 
-            try:
-                vr = Vasprun(vr_file, parse_potcar_file=False)
-            except:
-                logger.warning("Couldn't parse {}".format(vr_file))
-                error_msg = ": Failure, couldn't parse vaprun.xml file."
-                return (None, error_msg)
+        # get bulk entry information first
+        bulk_entry = self._parse_bulk_calculation()
+        if bulk_entry is None:
+            logger.error("Abandoning parsing of the calculations")
+            return {}
 
-            if not vr.converged:
-                logger.warning(
-                    "Vasp calculation at {} not converged".format(fldr))
-                error_msg = ": Failure, Vasp calculation not converged."
-                return (None, error_msg) # Further processing is not useful
-
-            # Check if locpot exists
-            locpot_file = os.path.join(fldr, "LOCPOT")
-            if not os.path.exists(locpot_file):
-                logger.warning("{} doesn't exit".format(locpot_file))
-                error_msg = ": Failure, LOCPOT doesn't exist"
-                return (None, error_msg) #Further processing is not useful
-
-            return (vr, None)
-
-        def get_encut_from_potcar(fldr):
-            potcar_file = os.path.join(fldr,"POTCAR")
-            if not os.path.exists(potcar_file):
-                logger.warning("Not POTCAR in {} to parse ENCUT".format(fldr))
-                error_msg = ": Failure, No POTCAR file."
-                return (None, error_msg) #Further processing is not useful
+        # get defect entry information
+        parsed = self._parse_defect_folders(self._get_defect_folder_tasks(),
+                                            bulk_entry)
+        parsed_defects = [entry for _, entry in parsed if entry is not None]
 
-            try:
-                potcar = Potcar.from_file(potcar_file)
-            except:
-                logger.warning("Couldn't parse {}".format(potcar_file))
-                error_msg = ": Failure, couldn't read POTCAR file."
-                return (None, error_msg)
+        try:
+            parsed_defects_data = {}
+            parsed_defects_data["bulk_entry"] = bulk_entry
+            parsed_defects_data["defects"] = parsed_defects
+            return parsed_defects_data
+        except:
+            return {} # Return Null dict due to failure
 
-            encut = max(ptcr_sngl.enmax for ptcr_sngl in potcar)
-            return (encut, None)
+    def _load_bulk_vasprun(self):
+        """
+        VasprunSummary of the bulk vasprun.xml (parsed without the POTCARs),
+        registered for the session. It holds the computed entry, band edges
+        and structures read by the defect, band edge and chemical potential
+        stages.
+        """
+        return _load_vasprun(_output_file(self._root_fldr, "bulk", "vasprun.xml"),
+                             parse_potcar_file=False)
 
-        # get bulk entry information first
+    def _parse_bulk_calculation(self):
+        """
+        ComputedStructureEntry of the bulk calculation, or None if it could
+        not be parsed
+        """
         fldr = os.path.join(self._root_fldr, "bulk")
-        vr, error_msg = get_vr_and_check_locpot(fldr)
+        vr, error_msg = _get_vr_and_check_locpot(fldr, parse_cache=self._parse_cache)
         if error_msg:
-            logger.error("Abandoning parsing of the calculations")
-            return {}
+            return None
 
         bulk_energy = vr.final_energy
         bulk_sc_struct = vr.final_structure
         try:
             encut = vr.incar["ENCUT"]
         except:  # ENCUT not specified in INCAR. Read from POTCAR
-            encut, error_msg = get_encut_from_potcar(fldr)
+            encut, error_msg = _get_encut_from_potcar(fldr)
             if error_msg:
-                logger.error("Abandoning parsing of the calculations")
-                return {}
+                return None
 
         trans_dict = loadfn(
             os.path.join(fldr, "transformation.json"),
@@ -615,93 +1217,209 @@ class PostProcess(object):
         supercell_size = trans_dict["supercell"]
 
         bulk_file_path = fldr
-        bulk_entry = ComputedStructureEntry(
+        return ComputedStructureEntry(
             bulk_sc_struct, bulk_energy,
             data={"bulk_path": bulk_file_path,
                   "encut": encut,
                   "supercell_size": supercell_size})
 
-        # get defect entry information
+    def _get_defect_folder_tasks(self):
+        """
+        (charge folder, output folder, parse cache) of all the charge
+        folders of the defect calculations
+        """
+        subfolders = glob.glob(os.path.join(self._root_fldr, "vac_*"))
+        subfolders += glob.glob(os.path.join(self._root_fldr, "as_*"))
+        subfolders += glob.glob(os.path.join(self._root_fldr, "sub_*"))
+        subfolders += glob.glob(os.path.join(self._root_fldr, "inter_*"))
+
+        # stage layout of the jobs, if generated with a job manifest
+        manifest = load_job_manifest(self._root_fldr)
+
+        fldr_tasks = []
         for fldr in subfolders:
-            fldr_name = os.path.split(fldr)[1]
-            chrg_fldrs = glob.glob(os.path.join(fldr,"charge*"))
-            for chrg_fldr in chrg_fldrs:
-                logger.debug("Parsing folder {}".format(chrg_fldr))
-                try:
-                    trans_dict = loadfn(
-                            os.path.join(chrg_fldr, "transformation.json"),
-                            cls=MontyDecoder)
-                    chrg = trans_dict["charge"]
-                except:
-                    logger.warning("Unable to parse transformation.jon" +
-                                   " in {}. ".format(chrg_fldr) + 
-                                   "Parsing rest of calculations")
+            for chrg_fldr in glob.glob(os.path.join(fldr,"charge*")):
+                out_fldr = get_output_path(self._root_fldr, chrg_fldr,
+                                           manifest=manifest)
+                fldr_tasks.append((chrg_fldr, out_fldr, self._parse_cache))
+        return fldr_tasks
+
+    def _parse_defect_folders(self, fldr_tasks, bulk_entry):
+        """
+        Parse charge folders of defect calculations.
+
+        Args:
+            fldr_tasks (list): charge folder tasks (see
+                _get_defect_folder_tasks)
+            bulk_entry (ComputedStructureEntry): bulk entry (see
+                _parse_bulk_calculation)
+        Returns:
+            list of (task, DefectEntry), the DefectEntry being None for
+            calculations that could not be parsed
+        """
+        nprocs = min(self._nprocs, len(fldr_tasks))
+        # the pool is forked before the read-ahead thread starts, so that no
+        # lock held by another thread is copied locked into the workers
+        pool = None
+        if nprocs > 1:
+            pool = self._pool or multiprocessing.Pool(nprocs)
+        # the files of the next folders are read ahead while parsing
+        prefetcher = ReadAheadPrefetcher(fldr_tasks, _defect_folder_files,
+                                         depth=self._prefetch_depth,
+                                         in_flight=max(nprocs, 1))
+        payloads = []
+        if pool is not None:
+            try:
+                for payload in pool.imap(_parse_defect_folder, prefetcher):
+                    payloads.append(payload)
+                    prefetcher.task_done()
+            finally:
+                if pool is not self._pool:
+                    pool.close()
+                    pool.join()
+        else:
+            for task in prefetcher:
+                payloads.append(_parse_defect_folder(task))
+                prefetcher.task_done()
+
+        bulk_sc_struct = bulk_entry.structure
+        bulk_energy = bulk_entry.energy
+        bulk_file_path = bulk_entry.data["bulk_path"]
+        supercell_size = bulk_entry.data["supercell_size"]
+
+        parsed = []
+        for task, payload in zip(fldr_tasks, payloads):
+            if payload is None:
+                parsed.append((task, None))
+                continue
+            chrg_fldr, out_fldr, _ = task
+            fldr_name = os.path.split(os.path.split(chrg_fldr)[0])[1]
+            trans_dict = payload["trans_dict"]
+            chrg = trans_dict["charge"]
+            if "substitution_specie" in trans_dict and \
+                    trans_dict["substitution_specie"] not in bulk_sc_struct.symbol_set:
+                self._substitution_species.add(
+                        trans_dict["substitution_specie"])
+            elif "inter" in trans_dict["defect_type"] and \
+                    trans_dict["defect_site"].specie.symbol not in bulk_sc_struct.symbol_set:
+                # added because extrinsic interstitials don't have
+                # "substitution_specie" character...
+                trans_dict["substitution_specie"] = trans_dict["defect_site"].specie.symbol
+                self._substitution_species.add(
+                        trans_dict["defect_site"].specie.symbol)
+
+            defect_type = trans_dict.get("defect_type", None)
+            energy = payload["energy"]
+            encut = payload["encut"]
+
+            comp_data = {"bulk_path": bulk_file_path,
+                         "defect_path": out_fldr, "encut": encut,
+                         "fldr_name": fldr_name, "supercell_size": supercell_size}
+            if "substitution_specie" in trans_dict:
+                comp_data["substitution_specie"] = \
+                        trans_dict["substitution_specie"]
+
+            # create Defect Object as dict, then load to DefectEntry object
+            defect_dict = {"structure": bulk_sc_struct, "charge": chrg,
+                           "@module": "pymatgen.analysis.defects.core"
+                           }
+            defect_site = trans_dict["defect_supercell_site"]
+            if "vac_" in defect_type:
+                defect_dict["@class"] = "Vacancy"
+            elif "as_" in defect_type or "sub_" in defect_type:
+                defect_dict["@class"] = "Substitution"
+                substitution_specie = trans_dict["substitution_specie"]
+                defect_site = PeriodicSite( substitution_specie, defect_site.frac_coords,
+                                            defect_site.lattice, coords_are_cartesian=False)
+            elif "inter_" in defect_type:
+                defect_dict["@class"] = "Interstitial"
+            else:
+                raise ValueError("defect type {} not recognized...".format(defect_type))
+
+            defect_dict.update( {"defect_site": defect_site})
+            defect = MontyDecoder().process_decoded( defect_dict)
+            parsed.append((task, DefectEntry( defect, energy - bulk_energy,
+                                              parameters=comp_data)))
+        return parsed
+
+    def watch(self, defect_data=None, poll_interval=600, max_polls=None):
+        """
+        Watch root_fldr for defect calculations finishing over time, and
+        ingest them incrementally. The charge folders are polled every
+        poll_interval seconds; only the folders not yet in defect_data are
+        parsed, and those that could not be parsed (running or unconverged
+        jobs, missing LOCPOT, unreadable transformation.json) are only
+        retried once one of the files read by the parser changed, appeared
+        or was removed.
+
+        Args:
+            defect_data (dict): defect data of the calculations ingested so
+                far (output of compile_all). If None, compile_all is run
+                first and its output yielded.
+            poll_interval (float): time between two polls, in seconds
+            max_polls (int): stop after this number of polls. Default is
+                to watch forever.
+        Yields:
+            (defect_data, new_entries) each time calculations are ingested,
+            with defect_data updated in place and new_entries the list of
+            the new DefectEntry objects
+        """
+        logger = logging.getLogger(__name__)
+        if defect_data is None:
+            defect_data = self.compile_all()
+            yield defect_data, list(defect_data.get("defects", []))
+        if "bulk_entry" not in defect_data:
+            raise ValueError("No bulk entry in the defect data to watch")
+
+        bulk_entry = defect_data["bulk_entry"]
+        for entry in defect_data["defects"]:
+            if "substitution_specie" in entry.parameters:
+                self._substitution_species.add(entry.parameters["substitution_specie"])
+        parsed_paths = set(entry.parameters["defect_path"]
+                           for entry in defect_data["defects"])
+        # fingerprints of the files read by the parser (see
+        # _defect_folder_fingerprint) for the folders that could not be parsed
+        failed = {}
+
+        npolls = 0
+        while max_polls is None or npolls < max_polls:
+            time.sleep(poll_interval)
+            npolls += 1
+
+            tasks = []
+            for task in self._get_defect_folder_tasks():
+                out_fldr = task[1]
+                if out_fldr in parsed_paths:
                     continue
-                vr, error_msg = get_vr_and_check_locpot(chrg_fldr)
-                if error_msg:
-                    logger.warning("Parsing the rest of the calculations")
+                if not os.path.exists(_output_file(out_fldr, "vasprun.xml")):
                     continue
-                if "substitution_specie" in trans_dict and \
-                        trans_dict["substitution_specie"] not in bulk_sc_struct.symbol_set:
-                    self._substitution_species.add(
-                            trans_dict["substitution_specie"])
-                elif "inter" in trans_dict["defect_type"] and \
-                        trans_dict["defect_site"].specie.symbol not in bulk_sc_struct.symbol_set:
-                    # added because extrinsic interstitials don't have
-                    # "substitution_specie" character...
-                    trans_dict["substitution_specie"] = trans_dict["defect_site"].specie.symbol
-                    self._substitution_species.add(
-                            trans_dict["defect_site"].specie.symbol)
-
-                defect_type = trans_dict.get("defect_type", None)
-                energy = vr.final_energy
-                try:
-                    encut = vr.incar["ENCUT"]
-                except: # ENCUT not specified in INCAR. Read from POTCAR
-                    encut, error_msg = get_encut_from_potcar(chrg_fldr)
-                    if error_msg:
-                        logger.warning("Not able to determine ENCUT "
-                                       "in {}".format(fldr_name))
-                        logger.warning("Parsing the rest of the "
-                                       "calculations")
-                        continue
-
-                comp_data = {"bulk_path": bulk_file_path,
-                             "defect_path": chrg_fldr, "encut": encut,
-                             "fldr_name": fldr_name, "supercell_size": supercell_size}
-                if "substitution_specie" in trans_dict:
-                    comp_data["substitution_specie"] = \
-                            trans_dict["substitution_specie"]
-
-                # create Defect Object as dict, then load to DefectEntry object
-                defect_dict = {"structure": bulk_sc_struct, "charge": chrg,
-                               "@module": "pymatgen.analysis.defects.core"
-                               }
-                defect_site = trans_dict["defect_supercell_site"]
-                if "vac_" in defect_type:
-                    defect_dict["@class"] = "Vacancy"
-                elif "as_" in defect_type or "sub_" in defect_type:
-                    defect_dict["@class"] = "Substitution"
-                    substitution_specie = trans_dict["substitution_specie"]
-                    defect_site = PeriodicSite( substitution_specie, defect_site.frac_coords,
-                                                defect_site.lattice, coords_are_cartesian=False)
-                elif "inter_" in defect_type:
-                    defect_dict["@class"] = "Interstitial"
-                else:
-                    raise ValueError("defect type {} not recognized...".format(defect_type))
-
-                defect_dict.update( {"defect_site": defect_site})
-                defect = MontyDecoder().process_decoded( defect_dict)
-                parsed_defects.append( DefectEntry( defect, energy - bulk_energy,
-                                                    parameters=comp_data))
-
-        try:
-            parsed_defects_data = {}
-            parsed_defects_data["bulk_entry"] = bulk_entry
-            parsed_defects_data["defects"] = parsed_defects
-            return parsed_defects_data
-        except:
-            return {} # Return Null dict due to failure
+                fingerprint = _defect_folder_fingerprint(task)
+                if failed.get(out_fldr) == fingerprint:
+                    continue
+                tasks.append((task, fingerprint))
+            if not tasks:
+                continue
+
+            logger.info("Parsing {} new or updated charge folders".format(len(tasks)))
+            substitution_species = set(self._substitution_species)
+            fingerprints = dict((task[1], fingerprint) for task, fingerprint in tasks)
+            new_entries = []
+            for task, entry in self._parse_defect_folders(
+                    [task for task, _ in tasks], bulk_entry):
+                if entry is None:
+                    failed[task[1]] = fingerprints[task[1]]
+                    continue
+                failed.pop(task[1], None)
+                parsed_paths.add(task[1])
+                new_entries.append(entry)
+            if not new_entries:
+                continue
+
+            defect_data["defects"].extend(new_entries)
+            if self._substitution_species != substitution_species:
+                # chemical potentials of the new substituting species
+                defect_data["mu_range"] = self.get_chempot_limits()
+            yield defect_data, new_entries
 
     def get_vbm_bandgap(self):
         """
@@ -716,8 +1434,10 @@ class PostProcess(object):
         vbm, bandgap = None, None
 
         if self._mpid is not None:
-            with MPRester(api_key=self._mapi_key) as mp:
-                bs = mp.get_bandstructure_by_material_id(self._mpid)
+            try:
+                bs = get_mp_provider(self._mapi_key).get_bandstructure_by_material_id(self._mpid)
+            except MPDataUnavailable:
+                bs = None
             if bs:
                 vbm = bs.get_vbm()["energy"]
                 bandgap = bs.get_band_gap()["energy"]
@@ -732,8 +1452,7 @@ class PostProcess(object):
                     "bulk calculation.")
             logger.warning("Note that it would be better to "
                            "perform real band structure calculation...")
-            vr = Vasprun(os.path.join(self._root_fldr, "bulk",
-                                      "vasprun.xml"), parse_potcar_file=False)
+            vr = self._load_bulk_vasprun()
             bandgap = vr.eigenvalue_band_properties[0]
             vbm = vr.eigenvalue_band_properties[2]
 
@@ -756,14 +1475,13 @@ class PostProcess(object):
                                     sub_species=self._substitution_species,
                                     mapi_key=self._mapi_key)
         else:
-            bulk_vr_path = os.path.join(self._root_fldr, "bulk", "vasprun.xml")
-            bulkvr = Vasprun(bulk_vr_path, parse_potcar_file=False)
-            if not bulkvr:
+            bulkvr = self._load_bulk_vasprun()
+            if not bulkvr.computed_entry:
                 msg = "In {}\n".format(os.path.join(self._root_fldr, "bulk"))
                 msg += "Could not fetch computed entry for atomic chempots!"
                 logger.warning(msg)
                 raise ValueError(msg)
-            cpa = MPChemPotAnalyzer(bulk_ce=bulkvr.get_computed_entry(),
+            cpa = MPChemPotAnalyzer(bulk_ce=bulkvr.computed_entry,
                                     sub_species=self._substitution_species,
                                     mapi_key=self._mapi_key)
 
@@ -773,9 +1491,12 @@ class PostProcess(object):
 
     def parse_dielectric_calculation(self):
         """
-        Parses the "vasprun.xml" file in subdirectory "dielectric" of
-        root directory root_fldr and returns the average of the trace
-        of the dielectric tensor.
+        Parses the dielectric tensors of the DFPT calculation in
+        subdirectory "dielectric" of root directory root_fldr and returns
+        the total (ionic + static) dielectric tensor. Only the two tensors
+        are read, streamed from the "vasprun.xml" file (or read from the
+        "OUTCAR" file if the vasprun.xml has none); the file they were read
+        from is recorded in the dielectric_source attribute.
 
         Args:
             root_fldr (str):
@@ -784,18 +1505,22 @@ class PostProcess(object):
             eps (float):
                 average of the trace of the dielectric tensor
         """
-
+        fldr = os.path.join(self._root_fldr, "dielectric")
+        vr_file = _output_file(fldr, "vasprun.xml")
+        source_file = vr_file if os.path.exists(vr_file) else _output_file(fldr, "OUTCAR")
         try:
-            vr = Vasprun(
-                    os.path.join(self._root_fldr, "dielectric", "vasprun.xml"),
-                    parse_potcar_file=False)
+            tensors = cached_parse(self._parse_cache, source_file, "dielectric",
+                                   lambda: read_dielectric_tensors(fldr))
         except:
             logging.getLogger(__name__).warning(
                 "Parsing Dielectric calculation failed")
             return None
 
-        eps_ion = vr.epsilon_ionic
-        eps_stat = vr.epsilon_static
+        self.dielectric_source = tensors["source"]
+        logging.getLogger(__name__).info(
+            "Dielectric tensors read from {}".format(self.dielectric_source))
+        eps_ion = tensors["epsilon_ionic"]
+        eps_stat = tensors["epsilon_static"]
 
         eps = []
         for i in range(len(eps_ion)):
@@ -803,19 +1528,74 @@ class PostProcess(object):
 
         return eps
 
+    def _timed_stage(self, name, func):
+        start = time.time()
+        try:
+            return func()
+        finally:
+            self.stage_timings[name] = time.time() - start
+            logging.getLogger(__name__).info(
+                "compile_all stage {} took {:.2f} s".format(
+                    name, self.stage_timings[name]))
+
     def compile_all(self):
         """
         Run to get all post processing objects as dictionary
 
+        The stages (defect calculations, dielectric calculation, band
+        edges and chemical potential limits) are dominated by file reads
+        and MP queries and run concurrently in threads; the chemical
+        potential limits are computed once the defect calculations, which
+        give the substituting species, are parsed. Outputs read by several
+        stages (e.g. the bulk vasprun.xml for the band edges and the
+        chemical potentials) are parsed once and shared: the bulk
+        vasprun.xml is parsed into a registered summary (see
+        _load_bulk_vasprun) before the stages start, and the bulk entry,
+        band edges and computed entry of the stages are read from it. The
+        wall time of each stage is logged and kept in the stage_timings
+        attribute. With nprocs > 1, the process pool parsing the defect
+        calculations is created before the stage threads are started.
+
         note: still need to implement
             1) ability for substitutional atomic chempots
             2) incorporated charge corrections for defects
         """
-        output = self.parse_defect_calculations()
-        output["epsilon"] = self.parse_dielectric_calculation()
-        output["mu_range"] = self.get_chempot_limits()
-        vbm,gap = self.get_vbm_bandgap()
+        logger = logging.getLogger(__name__)
+        self.stage_timings = {}
+        start = time.time()
+        if os.path.exists(_output_file(self._root_fldr, "bulk", "vasprun.xml")):
+            try:
+                self._load_bulk_vasprun()
+            except Exception:
+                # the stages reading the bulk calculation report the failure
+                logger.debug("Couldn't parse the bulk vasprun.xml")
+        # forking once threads run could copy their locks (e.g. of the
+        # output registry) held into the workers, which then hang
+        if self._nprocs > 1:
+            self._pool = multiprocessing.Pool(self._nprocs)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                defects = executor.submit(self._timed_stage, "parse_defect_calculations",
+                                          self.parse_defect_calculations)
+                epsilon = executor.submit(self._timed_stage, "parse_dielectric_calculation",
+                                          self.parse_dielectric_calculation)
+                vbm_bandgap = executor.submit(self._timed_stage, "get_vbm_bandgap",
+                                              self.get_vbm_bandgap)
+
+                output = defects.result()
+                mu_range = executor.submit(self._timed_stage, "get_chempot_limits",
+                                           self.get_chempot_limits)
+                output["epsilon"] = epsilon.result()
+                output["epsilon_source"] = self.dielectric_source
+                output["mu_range"] = mu_range.result()
+                vbm,gap = vbm_bandgap.result()
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
         output["vbm"] = vbm
         output["gap"] = gap
+        self.stage_timings["compile_all"] = time.time() - start
 
         return output
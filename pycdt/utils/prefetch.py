@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""
+Read-ahead of VASP output files. While the current calculations are parsed
+(in the main process or in worker processes), a background thread reads
+the files of the next calculations so that they are in the page cache
+when their parsing starts, overlapping the (network) file system reads
+with the parsing.
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import logging
+import threading
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+DEFAULT_PREFETCH_DEPTH = 2
+
+
+def warm_file(filename, chunk_size=2 ** 20):
+    """
+    Read a file through a fixed size buffer, discarding the data, so that
+    it is in the page cache for the next reads.
+
+    Args:
+        filename (str): path to the file. Missing files are ignored.
+        chunk_size (int): size of the read buffer in bytes
+    Returns:
+        Number of bytes read
+    """
+    buf = bytearray(chunk_size)
+    nread = 0
+    try:
+        with open(filename, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                nread += n
+    except (IOError, OSError):
+        pass
+    return nread
+
+
+class ReadAheadPrefetcher(object):
+    """
+    Iterates over tasks (e.g. calculation folders) in order, reading the
+    files of the next tasks ahead in a background thread. Each task is
+    yielded once its files have been read.
+
+    At most depth + in_flight tasks are read ahead of the consumer, which
+    calls task_done() when a task is fully processed, so the read-ahead
+    never runs far beyond the parsing. Files are read through a fixed size
+    buffer and only kept in the page cache, so the memory used does not
+    depend on the size of the files.
+    """
+
+    def __init__(self, tasks, get_files, depth=DEFAULT_PREFETCH_DEPTH,
+                 in_flight=1, chunk_size=2 ** 20):
+        """
+        Args:
+            tasks (list): tasks to iterate over
+            get_files (function): returns the paths of the files of a task
+            depth (int): number of tasks read ahead of those being
+                processed. 0 disables the read-ahead.
+            in_flight (int): number of tasks processed at the same time
+                (e.g. number of worker processes)
+            chunk_size (int): size of the read buffer in bytes
+        """
+        self.tasks = list(tasks)
+        self.get_files = get_files
+        self.depth = depth
+        self.chunk_size = chunk_size
+        self._slots = threading.Semaphore(max(depth, 0) + max(in_flight, 1))
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+
+    def _read_ahead(self):
+        for task in self.tasks:
+            self._slots.acquire()
+            if self._stop.is_set():
+                return
+            try:
+                for filename in self.get_files(task):
+                    warm_file(filename, self.chunk_size)
+            except Exception:
+                logging.getLogger(__name__).debug(
+                    "Could not read ahead the files of {}".format(task))
+            self._ready.put(task)
+
+    def __iter__(self):
+        if self.depth <= 0:
+            for task in self.tasks:
+                yield task
+            return
+
+        thread = threading.Thread(target=self._read_ahead)
+        thread.daemon = True
+        thread.start()
+        try:
+            for _ in range(len(self.tasks)):
+                yield self._ready.get()
+        finally:
+            self._stop.set()
+            self._slots.release()
+
+    def task_done(self):
+        """
+        Signal that a task yielded by the prefetcher was processed
+        """
+        self._slots.release()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Json serialization of collections of objects sharing structures (e.g. the
+DefectEntry objects of a defect calculation folder, which all hold the same
+bulk supercell structure). Each distinct structure is written once, keyed
+by a digest of its content, and is rebuilt once on load, the object being
+shared among all the objects referencing it.
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import json
+import hashlib
+
+from monty.io import zopen
+from monty.json import MontyEncoder, MontyDecoder
+
+from pymatgen.core.structure import Structure
+
+INTERNED_FORMAT = "pycdt_interned_structures"
+INTERNED_FORMAT_VERSION = 1
+
+
+def _is_structure_dict(d):
+    return isinstance(d, dict) and d.get("@class") in ["Structure", "IStructure"] \
+        and str(d.get("@module", "")).startswith("pymatgen.core.structure")
+
+
+def structure_digest(structure):
+    """
+    Digest of the content of a structure (Structure or its dict
+    representation); equal structures have the same digest.
+    """
+    d = structure if isinstance(structure, dict) else structure.as_dict()
+    s = json.dumps(d, sort_keys=True, cls=MontyEncoder)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+class StructureInterner(object):
+    """
+    Shares one Structure object among equal structures
+    """
+
+    def __init__(self):
+        self._structures = {}
+
+    def __len__(self):
+        return len(self._structures)
+
+    def intern(self, structure):
+        """
+        Shared Structure equal to structure (Structure or its dict
+        representation). The structure is only built from the dict the
+        first time it is seen.
+        """
+        digest = structure_digest(structure)
+        if digest not in self._structures:
+            if isinstance(structure, dict):
+                structure = MontyDecoder().process_decoded(structure)
+            self._structures[digest] = structure
+        return self._structures[digest]
+
+
+def intern_structures(obj):
+    """
+    Json representation of obj (any object MontyEncoder can encode) in
+    which each distinct structure is stored once:
+        {"@format": INTERNED_FORMAT, "@version": ...,
+         "structures": {digest: structure dict},
+         "data": json of obj, with the structures replaced by
+             {"@structure": digest}}
+    """
+    structures = {}
+
+    def replace(d):
+        if _is_structure_dict(d):
+            digest = structure_digest(d)
+            structures.setdefault(digest, d)
+            return {"@structure": digest}
+        if isinstance(d, dict):
+            return dict((k, replace(v)) for k, v in d.items())
+        if isinstance(d, list):
+            return [replace(v) for v in d]
+        return d
+
+    data = replace(json.loads(json.dumps(obj, cls=MontyEncoder)))
+    return {"@format": INTERNED_FORMAT, "@version": INTERNED_FORMAT_VERSION,
+            "structures": structures, "data": data}
+
+
+def is_interned(d):
+    """
+    Whether d is a json representation returned by intern_structures
+    """
+    return isinstance(d, dict) and d.get("@format") == INTERNED_FORMAT
+
+
+def uninterned_structures(d, interner=None):
+    """
+    Object of a json representation returned by intern_structures. Each
+    structure is built once and shared among the objects referencing it.
+
+    Args:
+        d (dict): json representation returned by intern_structures
+        interner (StructureInterner): interner of the structures, e.g. to
+            share them with other loaded objects
+    """
+    if d.get("@version") != INTERNED_FORMAT_VERSION:
+        raise ValueError("Unsupported version {} of interned structures".format(
+            d.get("@version")))
+    interner = interner or StructureInterner()
+    structures = dict((digest, interner.intern(sd))
+                      for digest, sd in d["structures"].items())
+
+    def replace(obj):
+        if isinstance(obj, dict):
+            if len(obj) == 1 and "@structure" in obj:
+                return structures[obj["@structure"]]
+            return dict((k, replace(v)) for k, v in obj.items())
+        if isinstance(obj, list):
+            return [replace(v) for v in obj]
+        return obj
+
+    # the decoder keeps the Structure objects as they are
+    return MontyDecoder().process_decoded(replace(d["data"]))
+
+
+def dumpfn_interned(obj, filename, indent=None):
+    """
+    Write obj in a json file (gzipped if filename ends with .gz), each
+    distinct structure being written once.
+    """
+    with zopen(filename, "wt") as f:
+        json.dump(intern_structures(obj), f, indent=indent)
+
+
+def loadfn_interned(filename, interner=None):
+    """
+    Read a json file written with dumpfn_interned, sharing the structures
+    among the objects. Json files of MontyEncoder (without interned
+    structures) are read as with monty.serialization.loadfn.
+    """
+    with zopen(filename, "rt") as f:
+        d = json.load(f)
+    if is_interned(d):
+        return uninterned_structures(d, interner)
+    return MontyDecoder().process_decoded(d)
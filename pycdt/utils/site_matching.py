@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""
+Matching of the sites of a defect supercell to the sites of the bulk
+supercell, used to locate the defect when parsing defect calculations.
+The nearest periodic neighbors are found with a KD-tree over the periodic
+images, so the matching scales near-linearly with the number of sites
+instead of building the full bulk x defect distance matrix.
+
+structures_match_by_index is a cheap check of the identity of two
+structures, used before the full StructureMatcher fit.
+"""
+
+__author__ = "Bharat Medasani, Danny Broberg"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import itertools
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Periodic images of the unit cell searched for the nearest neighbors
+_IMAGES = np.array(list(itertools.product([-1, 0, 1], repeat=3)))
+
+
+def get_nearest_periodic_neighbors(lattice, frac_coords, ref_frac_coords):
+    """
+    Nearest reference site of each site, accounting for periodic boundary
+    conditions. Same distances as the row minima of
+    lattice.get_all_distances(frac_coords, ref_frac_coords).
+
+    Args:
+        lattice (Lattice): lattice of the supercell
+        frac_coords (Nx3 array): fractional coordinates of the query sites
+        ref_frac_coords (Mx3 array): fractional coordinates of the
+            reference sites
+    Returns:
+        (distances, indices): distance to and index of the nearest
+        reference site for each query site
+    """
+    frac_coords = np.mod(np.array(frac_coords, dtype=float).reshape(-1, 3), 1)
+    ref_frac_coords = np.mod(
+        np.array(ref_frac_coords, dtype=float).reshape(-1, 3), 1)
+    nref = len(ref_frac_coords)
+
+    image_coords = (_IMAGES[:, None, :] + ref_frac_coords[None, :, :]).reshape(-1, 3)
+    tree = cKDTree(lattice.get_cartesian_coords(image_coords))
+    distances, indices = tree.query(lattice.get_cartesian_coords(frac_coords), k=1)
+    return distances, indices % nref
+
+
+def match_defect_sites(bulk_structure, defect_structure, defect_type, tol=0.1):
+    """
+    Match the sites of a defect supercell to those of the bulk supercell
+    and find the candidate defect sites.
+
+    Args:
+        bulk_structure (Structure): bulk supercell
+        defect_structure (Structure): defect supercell (same lattice)
+        defect_type (str): "Vacancy", "Interstitial" or "Substitution"
+        tol (float): Distance (in Angstrom) below which a bulk site and a
+            defect site are considered the same site
+    Returns:
+        (site_matching_indices, poss_defect) where site_matching_indices is
+        a list of [bulk index, defect index] of matched sites and
+        poss_defect a list of [index, frac_coords] of the candidate defect
+        sites (bulk index for vacancies, defect structure index otherwise)
+    """
+    if defect_type not in ["Vacancy", "Interstitial", "Substitution"]:
+        raise ValueError("Unknown defect type {}".format(defect_type))
+
+    bulk_frac_coords = bulk_structure.frac_coords
+    defect_frac_coords = defect_structure.frac_coords
+    distances, nearest = get_nearest_periodic_neighbors(
+        defect_structure.lattice, bulk_frac_coords, defect_frac_coords)
+    close = distances < tol
+
+    if defect_type == "Substitution":
+        bulk_species = np.array([site.specie for site in bulk_structure],
+                                dtype=object)
+        defect_species = np.array([site.specie for site in defect_structure],
+                                  dtype=object)
+        species_match = bulk_species == defect_species[nearest]
+        matched = np.where(close & species_match)[0]
+        poss_defect = [[int(nearest[ind]), defect_frac_coords[nearest[ind]]]
+                       for ind in np.where(~species_match)[0]]
+    else:
+        matched = np.where(close)[0]
+        if defect_type == "Vacancy":
+            poss_defect = [[int(ind), bulk_frac_coords[ind]]
+                           for ind in np.where(~close)[0]]
+        else:
+            unmatched = np.ones(len(defect_structure), dtype=bool)
+            unmatched[nearest[matched]] = False
+            poss_defect = [[int(ind), defect_frac_coords[ind]]
+                           for ind in np.where(unmatched)[0]]
+
+    site_matching_indices = [[int(ind), int(nearest[ind])] for ind in matched]
+    return site_matching_indices, poss_defect
+
+
+def _periodic_site_distances(lattice, frac_coords1, frac_coords2):
+    """
+    Distances between the sites of two arrays of fractional coordinates,
+    pairwise by index, with the minimum image convention
+    """
+    diff = np.array(frac_coords1) - np.array(frac_coords2)
+    diff -= np.round(diff)
+    return np.linalg.norm(lattice.get_cartesian_coords(diff), axis=-1)
+
+
+def structures_match_by_index(struct1, struct2, site_tol=0.01, lattice_tol=1e-4):
+    """
+    Cheap check that two structures are identical: same lattice, same
+    species counts and each site of struct1 matching a site of struct2
+    either with the same index or with the same rank once the sites are
+    sorted by species and fractional coordinates. No symmetry operations
+    or lattice reductions are tried, so a False does not mean the
+    structures differ (use StructureMatcher then), but a True means they
+    match.
+
+    Args:
+        struct1, struct2 (Structure): structures to compare
+        site_tol (float): Maximum distance (in Angstrom) between matched sites
+        lattice_tol (float): Maximum difference (in Angstrom) between the
+            lattice vectors
+    Returns:
+        bool
+    """
+    if len(struct1) != len(struct2) or struct1.composition != struct2.composition:
+        return False
+    if not np.allclose(struct1.lattice.matrix, struct2.lattice.matrix,
+                       rtol=0, atol=lattice_tol):
+        return False
+
+    lattice = struct1.lattice
+    species1 = np.array([str(site.specie) for site in struct1])
+    species2 = np.array([str(site.specie) for site in struct2])
+    frac_coords1 = np.mod(struct1.frac_coords, 1)
+    frac_coords2 = np.mod(struct2.frac_coords, 1)
+
+    def matches(order1, order2):
+        return np.all(species1[order1] == species2[order2]) and np.all(
+            _periodic_site_distances(lattice, frac_coords1[order1],
+                                     frac_coords2[order2]) < site_tol)
+
+    def sort_order(species, frac_coords):
+        keys = np.mod(np.round(frac_coords, 3), 1)
+        return np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0], species))
+
+    direct = np.arange(len(struct1))
+    return bool(matches(direct, direct) or matches(
+        sort_order(species1, frac_coords1), sort_order(species2, frac_coords2)))
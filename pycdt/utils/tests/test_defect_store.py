@@ -0,0 +1,114 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import unittest
+
+import numpy as np
+
+from monty.tempfile import ScratchDir
+
+from pymatgen.core import Structure, Lattice, PeriodicSite
+from pymatgen.analysis.defects.core import Vacancy, Interstitial, DefectEntry
+from pymatgen.util.testing import PymatgenTest
+
+from pycdt.utils.defect_store import DefectStore, write_defect_store, \
+        dump_defect_data, load_defect_data
+
+
+class DefectStoreTest(PymatgenTest):
+    def setUp(self):
+        self.bulk = Structure(Lattice.cubic(5.65), ["Ga", "As"],
+                              [[0, 0, 0], [0.25, 0.25, 0.25]])
+        self.entries = []
+        for charge in [-1, 0, 1]:
+            site = PeriodicSite("Ga", [0, 0, 0], self.bulk.lattice)
+            vac = Vacancy(self.bulk, site, charge=charge, multiplicity=1)
+            self.entries.append(DefectEntry(
+                vac, 1.5 + charge, corrections={"charge_correction": 0.1 * charge},
+                parameters={"defect_path": "vac_1_Ga/charge_{}".format(charge),
+                            "vbm": 1.2, "is_compatible": True,
+                            "planar_avg": np.linspace(0, 1, 5) + charge}))
+        site = PeriodicSite("Ga", [0.5, 0.5, 0.5], self.bulk.lattice)
+        inter = Interstitial(self.bulk, site, charge=2, site_name="Td",
+                             multiplicity=1)
+        self.entries.append(DefectEntry(
+            inter, 3.1, parameters={"defect_path": "inter_1_Ga/charge_2",
+                                    "vbm": 1.2, "is_compatible": False,
+                                    "final_defect_structure": self.bulk}))
+        self.defect_data = {"defects": self.entries, "vbm": 1.2, "gap": 1.5,
+                            "epsilon": [[12., 0, 0], [0, 12., 0], [0, 0, 12.]],
+                            "mu_range": {"Ga-rich": {"Ga": 0.0, "As": -0.7}}}
+
+    def test_round_trip(self):
+        with ScratchDir("."):
+            write_defect_store(self.defect_data, "defect_data")
+            # bulk structure stored once
+            self.assertEqual(len(os.listdir(os.path.join("defect_data",
+                                                         "structures"))), 1)
+            defect_data = load_defect_data("defect_data")
+            self.assertEqual(defect_data["gap"], 1.5)
+            self.assertEqual(defect_data["mu_range"], self.defect_data["mu_range"])
+            loaded = defect_data["defects"]
+            self.assertEqual(len(loaded), 4)
+            for entry, new_entry in zip(self.entries, loaded):
+                self.assertEqual(type(new_entry.defect), type(entry.defect))
+                self.assertEqual(new_entry.charge, entry.charge)
+                self.assertEqual(new_entry.multiplicity, entry.multiplicity)
+                self.assertEqual(new_entry.defect.bulk_structure, self.bulk)
+                self.assertArrayAlmostEqual(new_entry.site.frac_coords,
+                                            entry.site.frac_coords)
+                self.assertAlmostEqual(new_entry.uncorrected_energy,
+                                       entry.uncorrected_energy)
+                self.assertEqual(new_entry.corrections, entry.corrections)
+                self.assertEqual(sorted(new_entry.parameters),
+                                 sorted(entry.parameters))
+            self.assertIs(loaded[0].bulk_structure, loaded[3].bulk_structure)
+            self.assertArrayAlmostEqual(loaded[2].parameters["planar_avg"],
+                                        np.linspace(1, 2, 5))
+            self.assertEqual(loaded[3].defect.site_name, "Td")
+            self.assertEqual(loaded[3].parameters["final_defect_structure"],
+                             self.bulk)
+
+            # existing store is replaced
+            self.defect_data["defects"] = self.entries[:2]
+            write_defect_store(self.defect_data, "defect_data")
+            self.assertEqual(len(load_defect_data("defect_data")["defects"]), 2)
+
+    def test_lazy_columns(self):
+        with ScratchDir("."):
+            write_defect_store(self.defect_data, "defect_data")
+            store = DefectStore("defect_data")
+            self.assertEqual(len(store), 4)
+            self.assertIn("parameters.planar_avg", store.columns)
+            self.assertArrayEqual(store.column("charge"), [-1, 0, 1, 2])
+            self.assertIsNone(store.column("parameters.final_defect_structure")[0])
+
+            entries = store.defect_entries(parameter_keys=["defect_path", "vbm"])
+            self.assertEqual(entries[1].parameters,
+                             {"defect_path": "vac_1_Ga/charge_0", "vbm": 1.2})
+            self.assertNotIn("parameters.planar_avg", store._column_data)
+
+    def test_json_file(self):
+        with ScratchDir("."):
+            dump_defect_data(self.defect_data, "defect_data.json")
+            self.assertTrue(os.path.isfile("defect_data.json"))
+            defect_data = load_defect_data("defect_data.json")
+            self.assertEqual(len(defect_data["defects"]), 4)
+            self.assertIs(defect_data["defects"][0].bulk_structure,
+                          defect_data["defects"][3].bulk_structure)
+            self.assertRaises(ValueError, write_defect_store, self.defect_data,
+                              "defect_data.json")
+
+
+if __name__ == "__main__":
+    unittest.main()
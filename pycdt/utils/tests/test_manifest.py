@@ -0,0 +1,63 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import unittest
+
+from monty.tempfile import ScratchDir
+
+from pycdt.utils.manifest import load_job_manifest, write_job_manifest, \
+        get_job_key, get_output_path
+
+
+class JobManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.jobs = {
+            "vac_1_O/charge_0": {
+                "defect_type": "vac_1_O", "charge": 0,
+                "stages": [{"name": "prerelax", "directory": "prerelax"},
+                           {"name": "production", "directory": "."}],
+                "output_stage": "production"},
+            "vac_1_O/charge_1": {
+                "defect_type": "vac_1_O", "charge": 1,
+                "stages": [{"name": "relax", "directory": "relax"}],
+                "output_stage": "relax"}}
+
+    def test_load_write(self):
+        with ScratchDir("."):
+            self.assertEqual(load_job_manifest("GaAs"), {})
+            write_job_manifest("GaAs", self.jobs)
+            write_job_manifest("GaAs", {"bulk": {"charge": 0}})
+            manifest = load_job_manifest("GaAs")
+            self.assertEqual(sorted(manifest.keys()),
+                             ["bulk", "vac_1_O/charge_0", "vac_1_O/charge_1"])
+            self.assertEqual(manifest["vac_1_O/charge_1"]["output_stage"],
+                             "relax")
+
+    def test_get_job_key(self):
+        self.assertEqual(get_job_key(".", "./vac_1_O/charge_0"),
+                         "vac_1_O/charge_0")
+
+    def test_get_output_path(self):
+        self.assertEqual(get_output_path(".", "./vac_1_O/charge_0",
+                                         manifest=self.jobs),
+                         "./vac_1_O/charge_0")
+        self.assertEqual(get_output_path(".", "./vac_1_O/charge_1",
+                                         manifest=self.jobs),
+                         os.path.join("./vac_1_O/charge_1", "relax"))
+        self.assertEqual(get_output_path(".", "./sub_1_Sb_on_O/charge_0",
+                                         manifest=self.jobs),
+                         "./sub_1_Sb_on_O/charge_0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import unittest
+
+from monty.tempfile import ScratchDir
+
+from pymatgen.core import Structure, Lattice
+from pymatgen.entries.computed_entries import ComputedStructureEntry
+from pymatgen.util.testing import PymatgenTest
+
+from pycdt.utils.mp_provider import MPDataProvider, MPSnapshotProvider, \
+        CachedMPProvider, MPDataUnavailable, get_mp_provider, set_mp_provider
+
+
+def _entry(species, energy, entry_id):
+    struct = Structure(Lattice.cubic(5.65), species,
+                       [[0, 0, 0], [0.25, 0.25, 0.25]][:len(species)])
+    return ComputedStructureEntry(struct, energy, entry_id=entry_id)
+
+
+class CountingProvider(MPDataProvider):
+    """
+    Stand-in for the MP database counting the queries
+    """
+    def __init__(self, entries):
+        self.entries = entries
+        self.nqueries = 0
+
+    def get_entries_in_chemsys(self, elements):
+        self.nqueries += 1
+        return [e for e in self.entries
+                if set(el.symbol for el in e.composition.elements) <= set(elements)]
+
+    def get_entry_by_material_id(self, material_id):
+        self.nqueries += 1
+        return [e for e in self.entries if e.entry_id == material_id][0]
+
+    def get_structure_by_material_id(self, material_id):
+        self.nqueries += 1
+        return [e for e in self.entries if e.entry_id == material_id][0].structure
+
+    def get_bandstructure_by_material_id(self, material_id):
+        self.nqueries += 1
+        raise MPDataUnavailable("No band structure for {}".format(material_id))
+
+
+class MPProviderTest(PymatgenTest):
+    def test_abstract_provider(self):
+        class PartialProvider(MPDataProvider):
+            def get_entries_in_chemsys(self, elements):
+                return []
+        self.assertRaises(TypeError, PartialProvider)
+
+    def setUp(self):
+        self.entries = [_entry(["Ga"], -3.0, "mp-142"), _entry(["As"], -4.6, "mp-11"),
+                        _entry(["Ga", "As"], -8.6, "mp-2534"),
+                        _entry(["Sb"], -4.1, "mp-104")]
+
+    def test_cached_provider(self):
+        with ScratchDir("."):
+            remote = CountingProvider(self.entries)
+            provider = CachedMPProvider("mp_cache", [remote])
+            entries = provider.get_entries_in_chemsys(["As", "Ga"])
+            self.assertEqual(sorted(e.entry_id for e in entries),
+                             ["mp-11", "mp-142", "mp-2534"])
+            # same query in another order is answered from memory
+            provider.get_entries_in_chemsys(["Ga", "As", "Ga"])
+            self.assertEqual(remote.nqueries, 1)
+
+            # a new session replays the on-disk cache offline
+            replay = CachedMPProvider("mp_cache", [], offline=True)
+            entries = replay.get_entries_in_chemsys(["Ga", "As"])
+            self.assertEqual(len(entries), 3)
+            self.assertIsInstance(entries[0], ComputedStructureEntry)
+            self.assertRaises(MPDataUnavailable, replay.get_structure_by_material_id,
+                              "mp-2534")
+            self.assertEqual(remote.nqueries, 1)
+
+    def test_snapshot_provider(self):
+        with ScratchDir("."):
+            MPSnapshotProvider([["Ga", "As", "Sb"]], self.entries).to_file("snapshot.json")
+            snapshot = MPSnapshotProvider.from_file("snapshot.json")
+            remote = CountingProvider(self.entries)
+            provider = CachedMPProvider(None, [snapshot, remote])
+
+            self.assertEqual(len(provider.get_entries_in_chemsys(["Ga", "Sb"])), 2)
+            self.assertEqual(provider.get_structure_by_material_id("mp-2534"),
+                             self.entries[2].structure)
+            self.assertEqual(remote.nqueries, 0)
+            # chemical system outside of the snapshot goes to the remote provider
+            provider.get_entries_in_chemsys(["Ga", "N"])
+            self.assertEqual(remote.nqueries, 1)
+            self.assertRaises(MPDataUnavailable,
+                              snapshot.get_bandstructure_by_material_id, "mp-2534")
+
+    def test_set_mp_provider(self):
+        provider = CachedMPProvider(None, [CountingProvider(self.entries)])
+        set_mp_provider(provider)
+        try:
+            self.assertIs(get_mp_provider("some_key"), provider)
+        finally:
+            set_mp_provider(None)
+        self.assertIsNot(get_mp_provider(), provider)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,287 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import bz2
+import gzip
+import lzma
+import shutil
+import unittest
+import tarfile
+from shutil import copyfile
+
+import numpy as np
+
+from monty.tempfile import ScratchDir
+
+from pymatgen import __file__ as initfilep
+from pymatgen.core import Structure, Lattice
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.io.vasp import Vasprun, Locpot, Outcar
+from pymatgen.util.testing import PymatgenTest
+
+from pycdt.utils.output_readers import SelectiveVasprun, LocpotAverages, \
+        write_locpot_sidecar, load_locpot_sidecar, read_locpot, \
+        read_outcar_electrostatic_potential, resolve_output_path, open_output_file, \
+        write_eigenvalue_sidecar, load_eigenvalue_sidecar, probe_calculation, \
+        read_dielectric_tensors
+
+pmgtestfiles_loc = os.path.join(
+        os.path.split(os.path.split(initfilep)[0])[0], "test_files")
+file_loc = os.path.abspath(
+        os.path.join(__file__, "..", "..", "..", "..", "test_files"))
+
+
+class SelectiveVasprunTest(PymatgenTest):
+    def test_against_vasprun(self):
+        with ScratchDir("."):
+            with tarfile.open(os.path.join(file_loc, "test_path_files.tar.gz")) as tar:
+                tar.extractall()
+            for path in ["test_path_files/bulk/vasprun.xml",
+                         "test_path_files/sub_1_Sb_on_Ga/charge_2/vasprun.xml"]:
+                vr = Vasprun(path, parse_potcar_file=False)
+                svr = SelectiveVasprun(path)
+                self.assertAlmostEqual(svr.final_energy, vr.final_energy)
+                self.assertEqual(svr.converged, vr.converged)
+                self.assertEqual(svr.nionic_steps, len(vr.ionic_steps))
+                self.assertEqual(svr.incar, vr.incar)
+                self.assertEqual(svr.initial_structure, vr.initial_structure)
+                self.assertEqual(svr.final_structure, vr.final_structure)
+
+    def test_selected_fields(self):
+        with ScratchDir("."):
+            with tarfile.open(os.path.join(file_loc, "test_path_files.tar.gz")) as tar:
+                tar.extractall()
+            svr = SelectiveVasprun("test_path_files/bulk/vasprun.xml",
+                                   fields=["initial_structure"])
+            self.assertEqual(len(svr.initial_structure), 64)
+            self.assertIsNone(svr.final_structure)
+            self.assertIsNone(svr.final_energy)
+            self.assertIsNone(svr.incar)
+            self.assertRaises(ValueError, SelectiveVasprun,
+                              "test_path_files/bulk/vasprun.xml",
+                              fields=["eigenvalues"])
+
+
+class LocpotAveragesTest(PymatgenTest):
+    def test_against_locpot(self):
+        struct = Structure(Lattice.orthorhombic(4., 5., 6.), ["Ga", "As"],
+                           [[0, 0, 0], [0.25, 0.25, 0.25]])
+        data = np.random.RandomState(0).uniform(-5, 5, (6, 7, 8))
+        with ScratchDir("."):
+            Locpot(struct, {"total": data}).write_file("LOCPOT")
+            locpot = Locpot.from_file("LOCPOT")
+            # small chunks to exercise the accumulation across chunks
+            for chunk_size in [7, 100000]:
+                la = LocpotAverages.from_file("LOCPOT", chunk_size=chunk_size)
+                self.assertEqual(la.dim, [6, 7, 8])
+                for i in range(3):
+                    self.assertArrayAlmostEqual(la.get_axis_grid(i),
+                                                locpot.get_axis_grid(i))
+                    self.assertArrayAlmostEqual(la.get_average_along_axis(i),
+                                                locpot.get_average_along_axis(i))
+            la2 = LocpotAverages.from_dict(la.as_dict())
+            self.assertArrayAlmostEqual(la2.planar_averages[2],
+                                        la.planar_averages[2])
+            self.assertEqual(la2.structure, struct)
+
+
+class LocpotSidecarTest(PymatgenTest):
+    def test_write_and_load(self):
+        struct = Structure(Lattice.orthorhombic(4., 5., 6.), ["Ga", "As"],
+                           [[0, 0, 0], [0.25, 0.25, 0.25]])
+        data = np.random.RandomState(1).uniform(-5, 5, (6, 7, 8))
+        with ScratchDir("."):
+            Locpot(struct, {"total": data}).write_file("LOCPOT")
+            locpot = Locpot.from_file("LOCPOT")
+            self.assertIsNone(load_locpot_sidecar("LOCPOT"))
+
+            npy_file = write_locpot_sidecar("LOCPOT", chunk_size=7)
+            self.assertTrue(os.path.exists(npy_file))
+            sidecar_struct, grid = load_locpot_sidecar("LOCPOT")
+            self.assertIsInstance(grid, np.memmap)
+            self.assertEqual(sidecar_struct, struct)
+            self.assertArrayAlmostEqual(grid, locpot.data["total"])
+
+            mapped = read_locpot("LOCPOT")
+            la = LocpotAverages.from_file("LOCPOT")
+            for i in range(3):
+                self.assertArrayAlmostEqual(mapped.get_average_along_axis(i),
+                                            locpot.get_average_along_axis(i))
+                self.assertArrayAlmostEqual(la.get_average_along_axis(i),
+                                            locpot.get_average_along_axis(i))
+
+            # sidecar is stale once the LOCPOT changes
+            mtime = os.stat("LOCPOT").st_mtime
+            Locpot(struct, {"total": data + 1.}).write_file("LOCPOT")
+            os.utime("LOCPOT", (mtime + 10, mtime + 10))
+            self.assertIsNone(load_locpot_sidecar("LOCPOT"))
+            write_locpot_sidecar("LOCPOT")
+            self.assertArrayAlmostEqual(load_locpot_sidecar("LOCPOT")[1],
+                                        data + 1.)
+
+
+class EigenvalueSidecarTest(PymatgenTest):
+    def test_write_and_load(self):
+        with ScratchDir("."):
+            rng = np.random.RandomState(0)
+            eigenvalues = {Spin.up: rng.uniform(-5, 5, (4, 10, 2)),
+                           Spin.down: rng.uniform(-5, 5, (4, 10, 2))}
+            write_eigenvalue_sidecar("eigenvalues.npz", eigenvalues,
+                                     [0.25] * 4)
+            eigs, kpoint_weights = load_eigenvalue_sidecar("eigenvalues.npz")
+            self.assertEqual(sorted(eigs.keys()), [-1, 1])
+            self.assertEqual(eigs[1].dtype, np.float32)
+            self.assertArrayAlmostEqual(eigs[-1], eigenvalues[Spin.down], decimal=5)
+            self.assertEqual(kpoint_weights, [0.25] * 4)
+
+
+class ProbeCalculationTest(PymatgenTest):
+    def write_run(self, nsw, last_iteration, finished=True):
+        with open("vasprun.xml", "w") as f:
+            f.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<modeling>\n'
+                    ' <parameters>\n'
+                    '  <i type="int" name="NELM">     60</i>\n'
+                    '  <i type="int" name="NSW">{:>7}</i>\n'
+                    ' </parameters>\n <calculation>\n'.format(nsw))
+            if finished:
+                f.write(' </calculation>\n</modeling>\n')
+        with open("OUTCAR", "w") as f:
+            for ionic, electronic in [(1, 20), last_iteration]:
+                f.write("------------------ Iteration {:>4}({:>4})  "
+                        "------------------\n".format(ionic, electronic))
+
+    def test_probe_calculation(self):
+        with ScratchDir("."):
+            self.assertIsNone(probe_calculation("."))
+
+            self.write_run(99, (12, 25))
+            probe = probe_calculation(".")
+            self.assertTrue(probe["finished"])
+            self.assertTrue(probe["converged"])
+            self.assertFalse(probe["has_locpot"])
+
+            # electronic steps reached NELM
+            self.write_run(99, (12, 60))
+            self.assertFalse(probe_calculation(".")["converged_electronic"])
+            self.assertFalse(probe_calculation(".")["converged"])
+            # ionic steps reached NSW
+            self.write_run(12, (12, 25))
+            self.assertFalse(probe_calculation(".")["converged_ionic"])
+            # running job
+            self.write_run(99, (12, 25), finished=False)
+            self.assertFalse(probe_calculation(".")["finished"])
+
+            # undecided without OUTCAR
+            self.write_run(99, (12, 25))
+            os.remove("OUTCAR")
+            open("LOCPOT", "w").close()
+            probe = probe_calculation(".")
+            self.assertIsNone(probe["converged"])
+            self.assertTrue(probe["has_locpot"])
+
+
+class DielectricTensorsTest(PymatgenTest):
+    def test_against_vasprun(self):
+        with ScratchDir("."):
+            os.mkdir("dielectric")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml.dfpt.ionic"),
+                     "dielectric/vasprun.xml")
+            vr = Vasprun("dielectric/vasprun.xml", parse_potcar_file=False)
+            tensors = read_dielectric_tensors("dielectric")
+            self.assertArrayAlmostEqual(tensors["epsilon_static"], vr.epsilon_static)
+            self.assertArrayAlmostEqual(tensors["epsilon_ionic"], vr.epsilon_ionic)
+            self.assertEqual(tensors["source"], os.path.join("dielectric", "vasprun.xml"))
+
+    def test_outcar(self):
+        with ScratchDir("."):
+            with open("OUTCAR", "w") as f:
+                for header, diag in [("(including local field effects in DFT)", 7.283),
+                                     ("IONIC CONTRIBUTION", 2.5)]:
+                    f.write(" MACROSCOPIC STATIC DIELECTRIC TENSOR {}\n".format(header))
+                    f.write(" " + "-" * 54 + "\n")
+                    for i in range(3):
+                        f.write("".join("{:>10.3f}".format(diag if i == j else 0.)
+                                        for j in range(3)) + "\n")
+                    f.write(" " + "-" * 54 + "\n")
+            tensors = read_dielectric_tensors(".")
+            self.assertArrayAlmostEqual(tensors["epsilon_static"], np.eye(3) * 7.283)
+            self.assertArrayAlmostEqual(tensors["epsilon_ionic"], np.eye(3) * 2.5)
+            self.assertEqual(tensors["source"], os.path.join(".", "OUTCAR"))
+            os.remove("OUTCAR")
+            self.assertRaises(ValueError, read_dielectric_tensors, ".")
+
+
+class OutcarElectrostaticPotentialTest(PymatgenTest):
+    def test_against_outcar(self):
+        with ScratchDir("."):
+            with tarfile.open(os.path.join(file_loc, "test_path_files.tar.gz")) as tar:
+                tar.extractall()
+            for path in ["test_path_files/bulk/OUTCAR",
+                         "test_path_files/sub_1_Sb_on_Ga/charge_2/OUTCAR"]:
+                pots = Outcar(path).electrostatic_potential
+                # small chunks to exercise the backward search
+                self.assertEqual(read_outcar_electrostatic_potential(path, chunk_size=100),
+                                 pots)
+                self.assertEqual(read_outcar_electrostatic_potential(path), pots)
+
+            # block of the unfinished last ionic step is skipped
+            with open("test_path_files/sub_1_Sb_on_Ga/charge_2/OUTCAR") as f:
+                text = f.read()
+            marker = "average (electrostatic) potential at core"
+            with open("OUTCAR", "w") as f:
+                f.write(text[:text.rfind(marker) + 300])
+            pots = read_outcar_electrostatic_potential("OUTCAR")
+            self.assertEqual(len(pots), 64)
+
+            with open("OUTCAR", "w") as f:
+                f.write(text[:text.find(marker)])
+            self.assertRaises(ValueError, read_outcar_electrostatic_potential,
+                              "OUTCAR")
+
+
+class CompressedOutputTest(PymatgenTest):
+    def test_compressed_outputs(self):
+        with ScratchDir("."):
+            with tarfile.open(os.path.join(file_loc, "test_path_files.tar.gz")) as tar:
+                tar.extractall()
+            fldr = "test_path_files/sub_1_Sb_on_Ga/charge_2"
+            svr = SelectiveVasprun(os.path.join(fldr, "vasprun.xml"))
+            pots = read_outcar_electrostatic_potential(os.path.join(fldr, "OUTCAR"))
+            self.assertEqual(resolve_output_path("vasprun.xml"), "vasprun.xml")
+
+            for ext, module in [(".gz", gzip), (".xz", lzma), (".bz2", bz2)]:
+                for name in ["vasprun.xml", "OUTCAR"]:
+                    with open(os.path.join(fldr, name), "rb") as f_in, \
+                            module.open(name + ext, "wb") as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+                self.assertEqual(resolve_output_path("vasprun.xml"), "vasprun.xml" + ext)
+                vr_file = resolve_output_path("vasprun.xml")
+                self.assertAlmostEqual(SelectiveVasprun(vr_file).final_energy,
+                                       svr.final_energy)
+                # early stop of the reader before the end of the stream
+                self.assertEqual(SelectiveVasprun(vr_file, fields=["incar"]).incar,
+                                 svr.incar)
+                self.assertEqual(read_outcar_electrostatic_potential(
+                    resolve_output_path("OUTCAR")), pots)
+                for name in ["vasprun.xml", "OUTCAR"]:
+                    os.remove(name + ext)
+
+            with open("bad.gz", "wb") as f:
+                f.write(b"not compressed")
+            with self.assertRaises(IOError):
+                with open_output_file("bad.gz") as f:
+                    f.read()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import time
+import threading
+import unittest
+
+import numpy as np
+
+from monty.tempfile import ScratchDir
+
+from pycdt.utils import parse_cache as pc
+from pycdt.utils.parse_cache import ParseCache, OutputRegistry, cached_parse
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def parse(self):
+        self.calls += 1
+        return {"energy": -10.5, "averages": np.array([1., 2., 3.])}
+
+    def test_get_or_parse(self):
+        with ScratchDir("."):
+            with open("OUTCAR", "w") as f:
+                f.write("some output")
+            cache = ParseCache.from_root_fldr(".")
+            self.assertTrue(os.path.exists(pc.CACHE_FILENAME))
+            self.assertIsNone(cache.get("OUTCAR", "energy"))
+
+            data = cache.get_or_parse("OUTCAR", "energy", self.parse)
+            data = cache.get_or_parse("OUTCAR", "energy", self.parse)
+            self.assertEqual(self.calls, 1)
+            self.assertEqual(data["energy"], -10.5)
+            np.testing.assert_array_equal(data["averages"], [1., 2., 3.])
+
+            # a new cache object on the same database reuses the entry
+            cache = ParseCache.from_root_fldr(".")
+            cache.get_or_parse("OUTCAR", "energy", self.parse)
+            self.assertEqual(self.calls, 1)
+
+            # other kinds of data are cached separately
+            cache.get_or_parse("OUTCAR", "potential", self.parse)
+            self.assertEqual(self.calls, 2)
+
+    def test_invalidation(self):
+        with ScratchDir("."):
+            with open("OUTCAR", "w") as f:
+                f.write("some output")
+            cache = ParseCache.from_root_fldr(".")
+            cache.get_or_parse("OUTCAR", "energy", self.parse)
+
+            # changed file
+            with open("OUTCAR", "a") as f:
+                f.write(" and more")
+            cache.get_or_parse("OUTCAR", "energy", self.parse)
+            self.assertEqual(self.calls, 2)
+
+            # changed parser version
+            version = pc.PARSER_VERSION
+            try:
+                pc.PARSER_VERSION = version + ".test"
+                self.assertIsNone(cache.get("OUTCAR", "energy"))
+            finally:
+                pc.PARSER_VERSION = version
+            self.assertIsNotNone(cache.get("OUTCAR", "energy"))
+
+            # missing file
+            self.assertIsNone(cache.get("LOCPOT", "energy"))
+
+    def test_cached_parse(self):
+        data = cached_parse(None, "OUTCAR", "energy", self.parse)
+        self.assertEqual(data["energy"], -10.5)
+        self.assertEqual(self.calls, 1)
+
+
+class OutputRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def parse(self):
+        self.calls += 1
+        return {"energy": -10.5}
+
+    def test_get_or_parse(self):
+        with ScratchDir("."):
+            for filename in ["OUTCAR", "LOCPOT", "vasprun.xml"]:
+                with open(filename, "w") as f:
+                    f.write("some output")
+            registry = OutputRegistry(max_entries=2)
+            data = registry.get_or_parse("OUTCAR", "energy", self.parse)
+            self.assertIs(registry.get_or_parse("OUTCAR", "energy", self.parse), data)
+            self.assertEqual(self.calls, 1)
+            # parse locks are dropped once the parse is done
+            self.assertEqual(registry._parse_locks, {})
+
+            # least recently used entries are dropped
+            registry.set("LOCPOT", "potential", {})
+            registry.set("vasprun.xml", "structure", {})
+            self.assertIsNone(registry.get("OUTCAR", "energy"))
+
+            # changed file
+            registry.get_or_parse("OUTCAR", "energy", self.parse)
+            with open("OUTCAR", "a") as f:
+                f.write(" and more")
+            registry.get_or_parse("OUTCAR", "energy", self.parse)
+            self.assertEqual(self.calls, 3)
+
+    def test_kind_coverage(self):
+        self.assertTrue(pc.kind_covers("vasprun:a,b", "vasprun:b"))
+        self.assertTrue(pc.kind_covers("energy", "energy"))
+        self.assertFalse(pc.kind_covers("vasprun:b", "vasprun:a,b"))
+        self.assertFalse(pc.kind_covers("vasprun:a,b", "vasprun"))
+        self.assertFalse(pc.kind_covers("outcar:a,b", "vasprun:a"))
+        with ScratchDir("."):
+            with open("vasprun.xml", "w") as f:
+                f.write("some output")
+            registry = OutputRegistry()
+            data = registry.get_or_parse("vasprun.xml", "vasprun:a,b", self.parse)
+            # the registered parse serves the requests for fewer fields
+            self.assertIs(registry.get_or_parse("vasprun.xml", "vasprun:a",
+                                                self.parse), data)
+            registry.set("vasprun.xml", "vasprun:b", {})
+            self.assertIs(registry.get("vasprun.xml", "vasprun:a"), data)
+            self.assertEqual(self.calls, 1)
+
+            # a parse holding more fields replaces the entry of the file
+            more_data = registry.get_or_parse("vasprun.xml", "vasprun:a,b,c",
+                                              self.parse)
+            self.assertEqual(self.calls, 2)
+            self.assertEqual(registry.get_kind("vasprun.xml"), "vasprun:a,b,c")
+            self.assertIs(registry.get("vasprun.xml", "vasprun:a,b"), more_data)
+            self.assertEqual(len(registry._entries), 1)
+
+    def test_concurrent_parse(self):
+        with ScratchDir("."):
+            with open("vasprun.xml", "w") as f:
+                f.write("some output")
+            registry = OutputRegistry()
+            started = threading.Event()
+
+            def slow_parse():
+                started.set()
+                time.sleep(0.2)
+                return self.parse()
+
+            thread = threading.Thread(target=registry.get_or_parse,
+                                      args=("vasprun.xml", "full", slow_parse))
+            thread.start()
+            started.wait()
+            # waits for the parse in progress instead of parsing again
+            registry.get_or_parse("vasprun.xml", "full", self.parse)
+            thread.join()
+            self.assertEqual(self.calls, 1)
+            self.assertEqual(registry._parse_locks, {})
+
+            def failed_parse():
+                raise ValueError("Could not parse")
+
+            self.assertRaises(ValueError, registry.get_or_parse, "vasprun.xml",
+                              "broken", failed_parse)
+            self.assertEqual(registry._parse_locks, {})
+
+    def test_cached_parse_registry(self):
+        with ScratchDir("."):
+            with open("OUTCAR", "w") as f:
+                f.write("some output")
+            cached_parse(None, "OUTCAR", "energy", self.parse)
+            cached_parse(ParseCache.from_root_fldr("."), "OUTCAR", "energy",
+                         self.parse)
+            self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
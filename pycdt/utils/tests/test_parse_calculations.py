@@ -13,7 +13,8 @@ __date__ = "May 6, 2015"
 import os
 import unittest
 import tarfile
-from shutil import copyfile
+import pickle
+from shutil import copyfile, rmtree
 
 import numpy as np
 
@@ -22,14 +23,20 @@ from monty.json import MontyEncoder
 from monty.tempfile import ScratchDir
 
 from pymatgen import __file__ as initfilep
-from pymatgen.core import Element, PeriodicSite
-from pymatgen.io.vasp import Vasprun, Locpot
+from pymatgen.core import Element, PeriodicSite, Structure, Lattice
+from pymatgen.io.vasp import Vasprun, Locpot, Outcar
 from pymatgen.analysis.defects.core import DefectEntry, Vacancy, Substitution
 from pymatgen.entries.computed_entries import ComputedStructureEntry
 from pymatgen.util.testing import PymatgenTest
 
 from pycdt.core.defects_analyzer import ComputedDefect
-from pycdt.utils.parse_calculations import PostProcess, convert_cd_to_de, SingleDefectParser
+from pycdt.utils import parse_calculations
+from pycdt.utils.parse_calculations import PostProcess, convert_cd_to_de, SingleDefectParser, \
+        BulkReferencePotential, resolve_bulk_mpid, load_defect_eigenvalues
+from pycdt.utils.parse_cache import ParseCache, get_output_registry
+from pycdt.utils.serialization import StructureInterner
+from pycdt.utils.mp_provider import MPDataProvider, MPDataUnavailable
+from pycdt.utils.output_readers import LocpotAverages, SelectiveVasprun
 
 pmgtestfiles_loc = os.path.join(
         os.path.split(os.path.split(initfilep)[0])[0], "test_files")
@@ -79,6 +86,13 @@ class LegacyConversionTest(PymatgenTest):
         self.assertIsInstance(de, DefectEntry)
         self.assertEqual(de.site.specie.symbol, "Sb")
 
+        # bulk structure shared among the converted entries
+        interner = StructureInterner()
+        de1 = convert_cd_to_de(cd, b_cse.as_dict(), interner)
+        de2 = convert_cd_to_de(cd, b_cse.as_dict(), interner)
+        self.assertIs(de1.bulk_structure, de2.bulk_structure)
+        self.assertEqual(de1.bulk_structure, struc)
+
 
 class SingleDefectParserTest(PymatgenTest):
     def test_all_methods(self):
@@ -110,10 +124,17 @@ class SingleDefectParserTest(PymatgenTest):
                                "initial_defect_structure", "defect_frac_sc_coords"]:
                 self.assertFalse(param_key in sdp.defect_entry.parameters.keys())
             bl = sdp.freysoldt_loader()
-            self.assertIsInstance(bl, Locpot)
+            self.assertIsInstance(bl, LocpotAverages)
             for param_key in ["axis_grid", "bulk_planar_averages", "defect_planar_averages", \
                                "initial_defect_structure", "defect_frac_sc_coords"]:
                 self.assertTrue(param_key in sdp.defect_entry.parameters.keys())
+            for i in range(3):
+                self.assertArrayAlmostEqual(sdp.defect_entry.parameters["axis_grid"][i],
+                                            dlocpot.get_axis_grid(i))
+                self.assertArrayAlmostEqual(sdp.defect_entry.parameters["bulk_planar_averages"][i],
+                                            blocpot.get_average_along_axis(i))
+                self.assertArrayAlmostEqual(sdp.defect_entry.parameters["defect_planar_averages"][i],
+                                            dlocpot.get_average_along_axis(i))
 
             # test_kumagai_loader
             for param_key in ["bulk_atomic_site_averages", "defect_atomic_site_averages", \
@@ -126,9 +147,14 @@ class SingleDefectParserTest(PymatgenTest):
 
             # test_get_stdrd_metadata
             sdp.get_stdrd_metadata()
-            for param_key in ["eigenvalues", "kpoint_weights", "bulk_energy", \
+            for param_key in ["eigenvalues_file", "bulk_energy", \
                               "final_defect_structure", "defect_energy", "run_metadata"]:
                 self.assertTrue(param_key in sdp.defect_entry.parameters.keys())
+            self.assertFalse("eigenvalues" in sdp.defect_entry.parameters.keys())
+            eigenvalues, kpoint_weights = load_defect_eigenvalues(sdp.defect_entry.parameters)
+            for spin, eigs in sdp.defect_vr.eigenvalues.items():
+                self.assertArrayAlmostEqual(eigenvalues[spin.value], eigs, decimal=4)
+            self.assertArrayAlmostEqual(kpoint_weights, sdp.defect_vr.actual_kpoints_weights)
 
             # test_get_bulk_gap_data
             sdp.get_bulk_gap_data()
@@ -141,6 +167,97 @@ class SingleDefectParserTest(PymatgenTest):
             self.assertTrue('is_compatible' in sdp.defect_entry.parameters)
 
 
+class BulkReferencePotentialTest(PymatgenTest):
+    def test_publish_and_attach(self):
+        with ScratchDir("."):
+            copyfile(os.path.join(file_loc, "test_path_files.tar.gz"), "./test_path_files.tar.gz")
+            tar = tarfile.open("test_path_files.tar.gz")
+            tar.extractall()
+            tar.close()
+            blocpot = Locpot.from_file(os.path.join(file_loc, "bLOCPOT.gz"))
+            blocpot.write_file("test_path_files/bulk/LOCPOT")
+
+            bulk_ref = BulkReferencePotential("test_path_files/bulk", "freysoldt").publish()
+            # workers receive the pickled planar averages, no grid
+            self.assertFalse(os.path.exists("test_path_files/bulk/LOCPOT.pycdt.npy"))
+            bulk_obj = pickle.loads(pickle.dumps(bulk_ref)).attach()
+            self.assertIsInstance(bulk_obj, LocpotAverages)
+            for i in range(3):
+                self.assertArrayAlmostEqual(bulk_obj.get_average_along_axis(i),
+                                            blocpot.get_average_along_axis(i))
+
+            bulk_ref = BulkReferencePotential("test_path_files/bulk", "kumagai").publish()
+            bulk_obj = pickle.loads(pickle.dumps(bulk_ref)).attach()
+            self.assertArrayAlmostEqual(
+                bulk_obj.electrostatic_potential,
+                Outcar("test_path_files/bulk/OUTCAR").electrostatic_potential)
+
+            self.assertRaises(ValueError, BulkReferencePotential,
+                              "test_path_files/bulk", "sxdefect")
+
+
+class ResolveBulkMpidTest(PymatgenTest):
+    def test_resolve_bulk_mpid(self):
+        zb = Structure(Lattice.cubic(5.75), ["Ga", "As"], [[0, 0, 0], [0.25, 0.25, 0.25]])
+        rs = Structure(Lattice.cubic(5.3), ["Ga", "As"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+        structures = {"mp-2534": zb, "mp-8883": rs, "mp-142": Structure(
+            Lattice.cubic(3.0), ["Ga"], [[0, 0, 0]])}
+
+        class FakeMP(MPDataProvider):
+            nqueries = 0
+            def get_entries_in_chemsys(self, elements):
+                FakeMP.nqueries += 1
+                return [ComputedStructureEntry(struct, -1., entry_id=mpid)
+                        for mpid, struct in structures.items()]
+            def get_entry_by_material_id(self, material_id):
+                raise MPDataUnavailable(material_id)
+            def get_structure_by_material_id(self, material_id):
+                return structures[material_id]
+            def get_structures_by_material_ids(self, material_ids):
+                FakeMP.nqueries += 1
+                return {mpid: structures[mpid] for mpid in material_ids}
+            def get_bandstructure_by_material_id(self, material_id):
+                raise MPDataUnavailable(material_id)
+
+        bulk = zb.copy()
+        bulk.make_supercell([[-1, 1, 1], [1, -1, 1], [1, 1, -1]])
+        bulk.make_supercell(2)
+        self.assertEqual(resolve_bulk_mpid(bulk, FakeMP()), "mp-2534")
+        self.assertEqual(FakeMP.nqueries, 2)
+        # memoized for the session
+        self.assertEqual(resolve_bulk_mpid(bulk.copy(), FakeMP()), "mp-2534")
+        self.assertEqual(FakeMP.nqueries, 2)
+
+        # unavailable MP data (e.g. offline cache miss) gives no mp-id
+        class OfflineMP(FakeMP):
+            def get_entries_in_chemsys(self, elements):
+                raise MPDataUnavailable(elements)
+        self.assertIsNone(resolve_bulk_mpid(rs.copy(), OfflineMP()))
+
+
+class SteppedPostProcess(PostProcess):
+    """
+    PostProcess running the given steps (e.g. files appearing) before
+    the polls of watch, and recording the folders parsed at each poll
+    """
+    def __init__(self, root_fldr, steps=None, **kwargs):
+        super(SteppedPostProcess, self).__init__(root_fldr, **kwargs)
+        self.steps = steps or {}
+        self.npolls = 0
+        self.parsed_fldrs = {}
+
+    def _get_defect_folder_tasks(self):
+        self.npolls += 1
+        if self.npolls in self.steps:
+            self.steps[self.npolls]()
+        return super(SteppedPostProcess, self)._get_defect_folder_tasks()
+
+    def _parse_defect_folders(self, fldr_tasks, bulk_entry):
+        self.parsed_fldrs[self.npolls] = [task[1] for task in fldr_tasks]
+        return super(SteppedPostProcess, self)._parse_defect_folders(
+            fldr_tasks, bulk_entry)
+
+
 class PostProcessTest(PymatgenTest):
     def test_parse_defect_calculations_AND_compile_all(self):
         #testing both parse defect_calculatiosn And the compile all methods because they both require a file structure...
@@ -206,11 +323,32 @@ class PostProcessTest(PymatgenTest):
             self.assertEqual( pdd["defects"][1].defect.site.specie.symbol,
                               "Cs")
 
+            #parsing in a process pool gives the same entries
+            pdd_pool = PostProcess(".", nprocs=2).parse_defect_calculations()
+            self.assertEqual(len(pdd_pool["defects"]), 2)
+            for de, de_pool in zip(pdd["defects"], pdd_pool["defects"]):
+                self.assertEqual(de.energy, de_pool.energy)
+                self.assertEqual(de.parameters, de_pool.parameters)
+                self.assertEqual(de.site, de_pool.site)
+
+            #watching ingests only the calculations not parsed yet
+            watched = {"bulk_entry": pdd["bulk_entry"], "defects": pdd["defects"][1:]}
+            ingested = list(PostProcess(".").watch(watched, poll_interval=0, max_polls=2))
+            self.assertEqual(len(ingested), 1)
+            self.assertEqual([de.parameters["defect_path"] for de in ingested[0][1]],
+                             ["./vac_1_As/charge_0"])
+            self.assertEqual(len(watched["defects"]), 2)
+
             #now test compile_all quickly...
             ca = pp.compile_all()
             lk = sorted(list(ca.keys()))
-            self.assertEqual(len(lk), 6)
-            self.assertEqual(lk, sorted(["epsilon", "vbm", "gap", "defects", "bulk_entry", "mu_range"]))
+            self.assertEqual(len(lk), 7)
+            self.assertEqual(lk, sorted(["epsilon", "epsilon_source", "vbm", "gap", "defects",
+                                         "bulk_entry", "mu_range"]))
+            self.assertEqual(ca["epsilon_source"], "./dielectric/vasprun.xml")
+            self.assertEqual(sorted(pp.stage_timings.keys()),
+                             ["compile_all", "get_chempot_limits", "get_vbm_bandgap",
+                              "parse_defect_calculations", "parse_dielectric_calculation"])
             answer = [[521.83587174, -0.00263523, 0.0026437],
                       [-0.00263523, 24.46276268, 5.381848290000001],
                       [0.0026437, 5.381848290000001, 24.42964103]]
@@ -221,6 +359,182 @@ class PostProcessTest(PymatgenTest):
             self.assertEqual(ca["bulk_entry"].energy, vrobj.final_energy)
             #INSERT a simpletest for mu_range...
 
+            #the process pool of compile_all is created and closed by it
+            pp_pool = PostProcess(".", nprocs=2)
+            ca_pool = pp_pool.compile_all()
+            self.assertEqual(len(ca_pool["defects"]), 2)
+            self.assertIsNone(pp_pool._pool)
+
+    def test_watch_retries_failed_folders(self):
+        with ScratchDir("."):
+            os.mkdir("bulk")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"), "bulk/vasprun.xml")
+            os.mkdir("bulk/LOCPOT")
+            dumpfn({"supercell": [3, 3, 3], "defect_type": "bulk"},
+                   "bulk/transformation.json", cls=MontyEncoder)
+            vrobj = Vasprun(os.path.join(pmgtestfiles_loc, "vasprun.xml"))
+            #the charge folder has no LOCPOT yet
+            os.makedirs("vac_1_As/charge_0")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"),
+                     "vac_1_As/charge_0/vasprun.xml")
+            dumpfn({"charge": 0, "supercell": [3, 3, 3], "defect_type": "vac_1_As",
+                    "defect_supercell_site": vrobj.final_structure.sites[0]},
+                   "vac_1_As/charge_0/transformation.json", cls=MontyEncoder)
+
+            pp = SteppedPostProcess(
+                ".", steps={3: lambda: os.mkdir("vac_1_As/charge_0/LOCPOT")})
+            defect_data = {"bulk_entry": pp._parse_bulk_calculation(), "defects": []}
+            ingested = list(pp.watch(defect_data, poll_interval=0, max_polls=3))
+            #the failed folder is not parsed again until its LOCPOT appears
+            self.assertEqual(pp.parsed_fldrs, {1: ["./vac_1_As/charge_0"],
+                                               3: ["./vac_1_As/charge_0"]})
+            self.assertEqual(len(ingested), 1)
+            self.assertEqual([de.parameters["defect_path"] for de in ingested[0][1]],
+                             ["./vac_1_As/charge_0"])
+
+    def test_watch_bookkeeping(self):
+        class ChempotCountingPostProcess(SteppedPostProcess):
+            nchempots = 0
+            def get_chempot_limits(self):
+                self.nchempots += 1
+                return {"sub_species": sorted(self._substitution_species)}
+
+        with ScratchDir("."):
+            os.mkdir("bulk")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"), "bulk/vasprun.xml")
+            os.mkdir("bulk/LOCPOT")
+            dumpfn({"supercell": [3, 3, 3], "defect_type": "bulk"},
+                   "bulk/transformation.json", cls=MontyEncoder)
+            vrobj = Vasprun(os.path.join(pmgtestfiles_loc, "vasprun.xml"))
+            os.makedirs("vac_1_As/charge_0/LOCPOT")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"),
+                     "vac_1_As/charge_0/vasprun.xml")
+            dumpfn({"charge": 0, "supercell": [3, 3, 3], "defect_type": "vac_1_As",
+                    "defect_supercell_site": vrobj.final_structure.sites[0]},
+                   "vac_1_As/charge_0/transformation.json", cls=MontyEncoder)
+            os.makedirs("vac_1_As/charge_-1/LOCPOT")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml.dfpt.unconverged"),
+                     "vac_1_As/charge_-1/vasprun.xml")
+            dumpfn({"charge": -1, "supercell": [3, 3, 3], "defect_type": "vac_1_As",
+                    "defect_supercell_site": vrobj.final_structure.sites[0]},
+                   "vac_1_As/charge_-1/transformation.json", cls=MontyEncoder)
+
+            def add_substitution():
+                os.makedirs("sub_1_Cs_on_As/charge_2/LOCPOT")
+                copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"),
+                         "sub_1_Cs_on_As/charge_2/vasprun.xml")
+                dumpfn({"charge": 2, "supercell": [3, 3, 3],
+                        "defect_type": "sub_1_Cs_on_As",
+                        "defect_supercell_site": vrobj.final_structure.sites[1],
+                        "substitution_specie": "Cs"},
+                       "sub_1_Cs_on_As/charge_2/transformation.json", cls=MontyEncoder)
+
+            def touch_unconverged():
+                mtime = os.stat("vac_1_As/charge_-1/vasprun.xml").st_mtime
+                os.utime("vac_1_As/charge_-1/vasprun.xml", (mtime + 10, mtime + 10))
+
+            pp = ChempotCountingPostProcess(
+                ".", steps={3: add_substitution, 4: touch_unconverged})
+            defect_data = {"bulk_entry": pp._parse_bulk_calculation(),
+                           "defects": [], "mu_range": {}}
+            watcher = pp.watch(defect_data, poll_interval=0, max_polls=5)
+
+            #first poll: the converged folder is ingested, the unconverged one fails
+            data, new_entries = next(watcher)
+            self.assertIs(data, defect_data)
+            self.assertEqual([de.parameters["defect_path"] for de in new_entries],
+                             ["./vac_1_As/charge_0"])
+            self.assertEqual(sorted(pp.parsed_fldrs[1]),
+                             ["./vac_1_As/charge_-1", "./vac_1_As/charge_0"])
+            #no new substituting species, the chemical potentials are kept
+            self.assertEqual(pp.nchempots, 0)
+            self.assertEqual(data["mu_range"], {})
+
+            #third poll: a substitution appears, its species gets chempots
+            data, new_entries = next(watcher)
+            self.assertEqual(pp.npolls, 3)
+            self.assertEqual([de.parameters["defect_path"] for de in new_entries],
+                             ["./sub_1_Cs_on_As/charge_2"])
+            self.assertEqual(pp.nchempots, 1)
+            self.assertEqual(data["mu_range"], {"sub_species": ["Cs"]})
+            self.assertEqual(len(data["defects"]), 2)
+
+            #the failed folder is skipped while unchanged and retried once
+            #its vasprun.xml changed; max_polls then ends the watch
+            self.assertEqual(list(watcher), [])
+            self.assertEqual(pp.npolls, 5)
+            self.assertEqual(sorted(pp.parsed_fldrs.keys()), [1, 3, 4])
+            self.assertEqual(pp.parsed_fldrs[3], ["./sub_1_Cs_on_As/charge_2"])
+            self.assertEqual(pp.parsed_fldrs[4], ["./vac_1_As/charge_-1"])
+            self.assertEqual(pp.nchempots, 1)
+
+            #max_polls exhausted with no new folders yields nothing
+            rmtree("vac_1_As/charge_-1")
+            pp = SteppedPostProcess(".")
+            self.assertEqual(list(pp.watch(defect_data, poll_interval=0, max_polls=2)), [])
+            self.assertEqual(pp.npolls, 2)
+            self.assertEqual(pp.parsed_fldrs, {})
+
+    def test_compile_all_parses_bulk_once(self):
+        parsed = []
+
+        class CountingVasprun(Vasprun):
+            def __init__(self, filename, *args, **kwargs):
+                parsed.append(filename)
+                super(CountingVasprun, self).__init__(filename, *args, **kwargs)
+
+        class CountingSelectiveVasprun(SelectiveVasprun):
+            def __init__(self, filename, *args, **kwargs):
+                parsed.append(filename)
+                super(CountingSelectiveVasprun, self).__init__(filename, *args, **kwargs)
+
+        class FakeChemPotAnalyzer(object):
+            bulk_ces = []
+            def __init__(self, bulk_ce=None, **kwargs):
+                FakeChemPotAnalyzer.bulk_ces.append(bulk_ce)
+            def analyze_GGA_chempots(self):
+                return {}
+
+        with ScratchDir("."):
+            os.mkdir("bulk")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"), "bulk/vasprun.xml")
+            os.mkdir("bulk/LOCPOT")
+            dumpfn({"supercell": [3, 3, 3], "defect_type": "bulk"},
+                   "bulk/transformation.json", cls=MontyEncoder)
+            os.mkdir("dielectric")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml.dfpt.ionic"),
+                     "dielectric/vasprun.xml")
+            vrobj = Vasprun(os.path.join(pmgtestfiles_loc, "vasprun.xml"))
+            os.makedirs("vac_1_As/charge_0/LOCPOT")
+            copyfile(os.path.join(pmgtestfiles_loc, "vasprun.xml"),
+                     "vac_1_As/charge_0/vasprun.xml")
+            dumpfn({"charge": 0, "supercell": [3, 3, 3], "defect_type": "vac_1_As",
+                    "defect_supercell_site": vrobj.final_structure.sites[0]},
+                   "vac_1_As/charge_0/transformation.json", cls=MontyEncoder)
+
+            get_output_registry().clear()
+            patched = {"Vasprun": CountingVasprun,
+                       "SelectiveVasprun": CountingSelectiveVasprun,
+                       "MPChemPotAnalyzer": FakeChemPotAnalyzer}
+            originals = dict((name, getattr(parse_calculations, name)) for name in patched)
+            for name, obj in patched.items():
+                setattr(parse_calculations, name, obj)
+            try:
+                ca = PostProcess(".").compile_all()
+            finally:
+                for name, obj in originals.items():
+                    setattr(parse_calculations, name, obj)
+                get_output_registry().clear()
+
+            # the band edge, chemical potential and defect stages all read
+            # the bulk vasprun.xml parsed once
+            self.assertEqual([f for f in parsed if f.startswith("./bulk")],
+                             ["./bulk/vasprun.xml"])
+            self.assertEqual(ca["bulk_entry"].energy, vrobj.final_energy)
+            self.assertAlmostEqual(ca["vbm"], 1.5516, places=3)
+            self.assertEqual(len(FakeChemPotAnalyzer.bulk_ces), 1)
+            self.assertEqual(FakeChemPotAnalyzer.bulk_ces[0].energy, vrobj.final_energy)
+
     def test_get_vbm_bandgap(self):
         with ScratchDir("."):
             os.mkdir("bulk")
@@ -264,5 +578,13 @@ class PostProcessTest(PymatgenTest):
                       [  0.0026437,    5.38184829, 24.42964103]]
             np.testing.assert_almost_equal(eps, answer, decimal=2)
 
+            # second parse is read from the parse cache
+            pp = PostProcess(".", parse_cache=ParseCache.from_root_fldr("."))
+            pp.parse_dielectric_calculation()
+            self.assertIsNotNone(pp._parse_cache.get("dielectric/vasprun.xml",
+                                                     "dielectric"))
+            np.testing.assert_almost_equal(pp.parse_dielectric_calculation(),
+                                           answer, decimal=2)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import os
+import threading
+import unittest
+
+from monty.tempfile import ScratchDir
+
+from pycdt.utils.prefetch import ReadAheadPrefetcher, warm_file
+
+
+class ReadAheadPrefetcherTest(unittest.TestCase):
+    def test_warm_file(self):
+        with ScratchDir("."):
+            with open("vasprun.xml", "wb") as f:
+                f.write(os.urandom(3000))
+            self.assertEqual(warm_file("vasprun.xml", chunk_size=1024), 3000)
+            self.assertEqual(warm_file("missing.xml"), 0)
+
+    def test_order_and_bound(self):
+        lock = threading.Lock()
+        read = []
+
+        def get_files(task):
+            with lock:
+                read.append(task)
+            return ["missing_{}".format(task)]
+
+        tasks = list(range(10))
+        prefetcher = ReadAheadPrefetcher(tasks, get_files, depth=2, in_flight=1)
+        done = []
+        for task in prefetcher:
+            # never more than depth + in_flight tasks read ahead
+            with lock:
+                self.assertLessEqual(len(read) - len(done), 3)
+            done.append(task)
+            prefetcher.task_done()
+        self.assertEqual(done, tasks)
+        self.assertEqual(read, tasks)
+
+        no_read_ahead = ReadAheadPrefetcher(tasks, get_files, depth=0)
+        self.assertEqual(list(no_read_ahead), tasks)
+        self.assertEqual(len(read), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import unittest
+
+from monty.json import MontyEncoder
+from monty.serialization import dumpfn
+from monty.tempfile import ScratchDir
+
+from pymatgen.core import Structure, Lattice, PeriodicSite
+from pymatgen.analysis.defects.core import Vacancy, DefectEntry
+from pymatgen.util.testing import PymatgenTest
+
+from pycdt.utils.serialization import StructureInterner, structure_digest, \
+        intern_structures, dumpfn_interned, loadfn_interned
+
+
+class SerializationTest(PymatgenTest):
+    def setUp(self):
+        self.bulk = Structure(Lattice.cubic(5.65), ["Ga", "As"],
+                              [[0, 0, 0], [0.25, 0.25, 0.25]])
+        self.entries = []
+        for charge in [-1, 0, 1]:
+            # separate copies of the bulk structure, as after parsing
+            bulk = self.bulk.copy()
+            site = PeriodicSite("Ga", [0, 0, 0], bulk.lattice)
+            self.entries.append(DefectEntry(
+                Vacancy(bulk, site, charge=charge, multiplicity=1), 1.5 + charge,
+                parameters={"defect_path": "vac_1_Ga/charge_{}".format(charge)}))
+
+    def test_structure_interner(self):
+        interner = StructureInterner()
+        s1 = interner.intern(self.bulk.as_dict())
+        s2 = interner.intern(self.bulk.copy())
+        self.assertIs(s1, s2)
+        self.assertEqual(s1, self.bulk)
+        other = self.bulk.copy()
+        other.perturb(0.1)
+        self.assertIsNot(interner.intern(other), s1)
+        self.assertEqual(len(interner), 2)
+        self.assertNotEqual(structure_digest(other), structure_digest(self.bulk))
+
+    def test_intern_structures(self):
+        d = intern_structures({"defects": self.entries})
+        self.assertEqual(len(d["structures"]), 1)
+        self.assertEqual(d["data"]["defects"][0]["defect"]["structure"],
+                         {"@structure": structure_digest(self.bulk)})
+
+    def test_round_trip(self):
+        with ScratchDir("."):
+            dumpfn_interned({"defects": self.entries, "gap": 1.5},
+                            "defect_data.json.gz")
+            d = loadfn_interned("defect_data.json.gz")
+            self.assertEqual(d["gap"], 1.5)
+            loaded = d["defects"]
+            self.assertEqual(len(loaded), 3)
+            for entry, new_entry in zip(self.entries, loaded):
+                self.assertIsInstance(new_entry, DefectEntry)
+                self.assertEqual(new_entry.charge, entry.charge)
+                self.assertEqual(new_entry.parameters, entry.parameters)
+                self.assertIs(new_entry.bulk_structure, loaded[0].bulk_structure)
+            self.assertEqual(loaded[0].bulk_structure, self.bulk)
+
+            # json files without interned structures
+            dumpfn({"defects": self.entries}, "legacy.json", cls=MontyEncoder)
+            loaded = loadfn_interned("legacy.json")["defects"]
+            self.assertEqual(loaded[1].bulk_structure, self.bulk)
+
+
+if __name__ == "__main__":
+    unittest.main()
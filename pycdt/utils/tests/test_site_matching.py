@@ -0,0 +1,89 @@
+# coding: utf-8
+
+from __future__ import division
+
+__author__ = "Bharat Medasani"
+__copyright__ = "Copyright 2014, The Materials Project"
+__version__ = "1.0"
+__maintainer__ = "Bharat Medasani"
+__email__ = "mbkumar@gmail.com"
+__status__ = "Development"
+__date__ = "Oct 18, 2026"
+
+import unittest
+
+import numpy as np
+
+from pymatgen.core import Structure, Lattice
+from pymatgen.util.testing import PymatgenTest
+
+from pycdt.utils.site_matching import get_nearest_periodic_neighbors, \
+        match_defect_sites, structures_match_by_index
+
+
+class SiteMatchingTest(PymatgenTest):
+    def setUp(self):
+        # triclinic cell to exercise the periodic images
+        lattice = Lattice.from_parameters(5.5, 6.0, 6.5, 80, 95, 105)
+        struct = Structure(lattice, ["Ga", "As"],
+                           [[0, 0, 0], [0.25, 0.25, 0.25]])
+        struct.make_supercell([2, 2, 2])
+        self.bulk = struct
+
+    def test_get_nearest_periodic_neighbors(self):
+        rng = np.random.RandomState(0)
+        frac_coords = rng.uniform(-0.5, 1.5, (20, 3))
+        ref_frac_coords = rng.uniform(0, 1, (30, 3))
+        lattice = self.bulk.lattice
+        dists, inds = get_nearest_periodic_neighbors(lattice, frac_coords,
+                                                     ref_frac_coords)
+        distmatrix = lattice.get_all_distances(frac_coords, ref_frac_coords)
+        self.assertArrayAlmostEqual(dists, distmatrix.min(axis=1))
+        self.assertArrayEqual(inds, distmatrix.argmin(axis=1))
+
+    def test_vacancy(self):
+        defect = self.bulk.copy()
+        defect.remove_sites([3])
+        defect.perturb(0.02)
+        matching, poss_defect = match_defect_sites(self.bulk, defect, "Vacancy")
+        self.assertEqual(len(poss_defect), 1)
+        self.assertEqual(poss_defect[0][0], 3)
+        self.assertArrayAlmostEqual(poss_defect[0][1], self.bulk[3].frac_coords)
+        self.assertEqual(len(matching), len(defect))
+
+    def test_substitution(self):
+        defect = self.bulk.copy()
+        defect.replace(5, "Sb")
+        matching, poss_defect = match_defect_sites(self.bulk, defect, "Substitution")
+        self.assertEqual([ind for ind, fc in poss_defect], [5])
+        self.assertEqual(len(matching), len(defect) - 1)
+        self.assertNotIn([5, 5], matching)
+
+    def test_interstitial(self):
+        defect = self.bulk.copy()
+        defect.append("Ga", [0.125, 0.125, 0.5])
+        matching, poss_defect = match_defect_sites(self.bulk, defect, "Interstitial")
+        self.assertEqual([ind for ind, fc in poss_defect], [len(defect) - 1])
+        self.assertEqual(sorted(matching), [[i, i] for i in range(len(self.bulk))])
+
+        self.assertRaises(ValueError, match_defect_sites, self.bulk, defect,
+                          "Antisite")
+
+    def test_structures_match_by_index(self):
+        self.assertTrue(structures_match_by_index(self.bulk, self.bulk.copy()))
+        # reordered sites, wrapped around the cell
+        shuffled = Structure(self.bulk.lattice,
+                             [site.specie for site in self.bulk][::-1],
+                             (self.bulk.frac_coords[::-1] + 1.) % 1. - 1.)
+        self.assertTrue(structures_match_by_index(self.bulk, shuffled))
+
+        substituted = self.bulk.copy()
+        substituted.replace(5, "Sb")
+        self.assertFalse(structures_match_by_index(self.bulk, substituted))
+        displaced = self.bulk.copy()
+        displaced.translate_sites([5], [0.05, 0, 0])
+        self.assertFalse(structures_match_by_index(self.bulk, displaced))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ from __future__ import division
 import os
 import glob
 import unittest
+from shutil import copyfile
 
 from monty.json import MontyDecoder
 from monty.tempfile import ScratchDir
@@ -56,6 +57,43 @@ class PotcarModTest(unittest.TestCase):
         self.assertIsNotNone(potcar)
 
 
+class ParallelizationTuningTest(unittest.TestCase):
+    def setUp(self):
+        self.structure = Structure.from_file(os.path.join(
+            file_loc, 'POSCAR_Cr2O3'))
+
+    def test_get_irreducible_kpoint_count(self):
+        gamma = Kpoints.gamma_automatic((2, 2, 2))
+        self.assertEqual(
+            get_irreducible_kpoint_count(gamma, self.structure, isym=0), 8)
+        self.assertEqual(
+            get_irreducible_kpoint_count(gamma, self.structure, isym=-1), 8)
+        mp = Kpoints.monkhorst_automatic((2, 2, 2))
+        self.assertEqual(
+            get_irreducible_kpoint_count(mp, self.structure, isym=0), 4)
+        gamma = Kpoints.gamma_automatic((3, 3, 3))
+        self.assertEqual(
+            get_irreducible_kpoint_count(gamma, self.structure, isym=0), 14)
+
+    def test_tune_parallelization(self):
+        self.assertEqual(tune_parallelization(4, 128, nbands=600),
+                         {'KPAR': 4, 'NCORE': 8, 'NPAR': 4})
+        self.assertEqual(tune_parallelization(1, 128, nbands=600),
+                         {'KPAR': 1, 'NCORE': 16, 'NPAR': 8})
+        self.assertEqual(tune_parallelization(3, 128, nodes=2, nbands=300),
+                         {'KPAR': 1, 'NCORE': 16, 'NPAR': 16})
+        # few bands limit the number of band groups
+        par = tune_parallelization(1, 128, nbands=4)
+        self.assertLessEqual(par['NPAR'], 4)
+
+    def test_defect_relax_set(self):
+        drs = DefectRelaxSet(self.structure,
+                             node_layout={'cores_per_node': 128, 'nodes': 1})
+        self.assertNotIn('NPAR', drs.incar)
+        self.assertIn('KPAR', drs.incar)
+        self.assertIn('NCORE', drs.incar)
+
+
 class DefectRelaxTest(unittest.TestCase):
     def setUp(self):
         self.structure = Structure.from_file(os.path.join(
@@ -170,6 +208,55 @@ class MakeVaspDefectFilesTest(unittest.TestCase):
     def test_hse_settings(self):
         pass
 
+    def test_prerelax_stage(self):
+        with ScratchDir('.'):
+            make_vasp_defect_files(self.defects, self.path, prerelax=True)
+            cr_def_path = glob.glob(os.path.join(self.path, 'vac*Cr'))[0]
+            def_loc = os.path.join(cr_def_path, 'charge_0')
+            prerelax_loc = os.path.join(def_loc, 'prerelax')
+            incar = Incar.from_file(os.path.join(prerelax_loc, "INCAR"))
+            self.assertEqual(incar['ENCUT'], 400)
+            self.assertEqual(incar['EDIFFG'], -0.05)
+            kpoints = Kpoints.from_file(os.path.join(prerelax_loc, 'KPOINTS'))
+            self.assertEqual(tuple(kpoints.kpts[0]), (1, 1, 1))
+            prod_incar = Incar.from_file(os.path.join(def_loc, "INCAR"))
+            self.assertEqual(prod_incar['EDIFFG'], -0.01)
+
+            manifest = loadfn(os.path.join(self.path, 'job_manifest.json'))
+            job = manifest[os.path.relpath(def_loc, self.path)]
+            self.assertEqual([stage['name'] for stage in job['stages']],
+                             ['prerelax', 'production'])
+            self.assertEqual(job['output_stage'], 'production')
+
+            # running prerelax stage is not handed over
+            copyfile(os.path.join(prerelax_loc, 'POSCAR'),
+                     os.path.join(prerelax_loc, 'CONTCAR'))
+            with open(os.path.join(prerelax_loc, 'vasprun.xml'), 'w') as f:
+                f.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<modeling>\n')
+            self.assertEqual(start_production_stages(self.path), [])
+            self.assertFalse(os.path.exists(os.path.join(def_loc, 'POSCAR.orig')))
+
+            with open(os.path.join(prerelax_loc, 'vasprun.xml'), 'a') as f:
+                f.write('</modeling>\n')
+            job_key = os.path.relpath(def_loc, self.path)
+            self.assertEqual(start_production_stages(self.path), [job_key])
+            self.assertTrue(os.path.exists(os.path.join(def_loc, 'POSCAR.orig')))
+            manifest = loadfn(os.path.join(self.path, 'job_manifest.json'))
+            self.assertTrue(manifest[job_key]['stages'][1]['structure_copied'])
+            # handed over once
+            self.assertEqual(start_production_stages(self.path), [])
+
+    def test_node_layout(self):
+        with ScratchDir('.'):
+            make_vasp_defect_files(self.defects, self.path,
+                                   node_layout={'cores_per_node': 128})
+            incar = Incar.from_file(os.path.join(self.path, 'bulk', "INCAR"))
+            self.assertNotIn('NPAR', incar)
+            manifest = loadfn(os.path.join(self.path, 'job_manifest.json'))
+            par = manifest['bulk']['stages'][0]['parallelization']
+            self.assertEqual(par['KPAR'], incar['KPAR'])
+            self.assertEqual(par['NCORE'], incar['NCORE'])
+
 
 class MakeVaspDielectricFilesTest(unittest.TestCase):
     def setUp(self):
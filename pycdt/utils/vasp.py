@@ -11,6 +11,8 @@ __status__ = "Development"
 __date__ = "November 4, 2012"
 
 import os
+import math
+import shutil
 from copy import deepcopy
 import functools
 import numpy as np
@@ -22,11 +24,95 @@ from monty.os.path import zpath
 from pymatgen import SETTINGS
 from pymatgen.io.vasp.inputs import Kpoints
 from pymatgen.io.vasp.sets import MPRelaxSet, MPStaticSet
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 from pymatgen.io.vasp.inputs import PotcarSingle, Potcar
 
+from pycdt.utils.manifest import write_job_manifest, get_job_key, \
+    load_job_manifest
+from pycdt.utils.output_readers import probe_calculation, resolve_output_path
 
 MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG = loadfn(os.path.join(MODULE_DIR, "DefectSet.yaml"))
+PRERELAX_DIR = "prerelax"
+
+
+def get_irreducible_kpoint_count(kpoints, structure, isym=0):
+    """
+    Number of irreducible k-points VASP uses for a Kpoints object.
+    Args:
+        kpoints (Kpoints): Kpoints object (automatic Gamma/Monkhorst-Pack
+            grid or explicit list)
+        structure (Structure): Structure of the calculation
+        isym (int): ISYM of the calculation. With ISYM = 0 only
+            time-reversal symmetry (k = -k) reduces the mesh, with
+            ISYM = -1 the full mesh is used.
+    """
+    if kpoints.style not in [Kpoints.supported_modes.Gamma,
+                             Kpoints.supported_modes.Monkhorst]:
+        return max(kpoints.num_kpts, 1)
+
+    mesh = [int(n) for n in kpoints.kpts[0]]
+    is_monkhorst = kpoints.style == Kpoints.supported_modes.Monkhorst
+    if isym == -1:
+        return int(np.prod(mesh))
+    elif isym == 0:
+        # points with k = -k (modulo G) are not paired by time reversal
+        if is_monkhorst:
+            self_inverse = np.prod([1 if n % 2 else 0 for n in mesh])
+        else:
+            self_inverse = np.prod([1 if n % 2 else 2 for n in mesh])
+        return int((np.prod(mesh) + self_inverse) // 2)
+
+    is_shift = [1 if is_monkhorst and not n % 2 else 0 for n in mesh]
+    return len(SpacegroupAnalyzer(structure).get_ir_reciprocal_mesh(
+        mesh=mesh, is_shift=is_shift))
+
+
+def get_default_nbands(nelect, nions, ispin=1):
+    """
+    Estimate of the default NBANDS of VASP
+    """
+    nbands = max(int(round((nelect + 2) / 2.)) + max(nions // 2, 3),
+                 int(0.6 * nelect))
+    if ispin == 2:
+        nbands = int(math.ceil(1.2 * nbands))
+    return nbands
+
+
+def tune_parallelization(nkpts, cores_per_node, nodes=1, nbands=None):
+    """
+    Choose the k-point (KPAR) and band (NCORE/NPAR) parallelization for
+    a job running on nodes x cores_per_node cores.
+
+    KPAR is the largest divisor of the core count that splits the
+    irreducible k-points evenly. Within each k-point group, NCORE is
+    chosen from the divisors of the cores per node (so that a band is
+    never split across nodes) closest to the square root of the group
+    size, keeping the number of band groups (NPAR) below NBANDS.
+
+    Args:
+        nkpts (int): number of irreducible k-points
+        cores_per_node (int): number of cores per node
+        nodes (int): number of nodes
+        nbands (int): number of bands. If None, the band count is not
+            used to limit NPAR.
+    Returns:
+        dict of {'KPAR': ..., 'NCORE': ..., 'NPAR': ...}
+    """
+    ncores = cores_per_node * nodes
+    kpar = max(d for d in range(1, min(nkpts, ncores) + 1)
+               if not ncores % d and not nkpts % d)
+    group_cores = ncores // kpar
+
+    ncore_choices = [d for d in range(1, cores_per_node + 1)
+                     if not group_cores % d and not cores_per_node % d]
+    if nbands:
+        allowed = [d for d in ncore_choices if group_cores // d <= nbands]
+        ncore_choices = allowed or [max(ncore_choices)]
+    ncore = min(ncore_choices, key=lambda d: (
+        abs(math.log(d) - 0.5 * math.log(group_cores)), -d))
+
+    return {'KPAR': kpar, 'NCORE': ncore, 'NPAR': group_cores // ncore}
 
 
 class PotcarSingleMod(PotcarSingle):
@@ -108,35 +194,75 @@ class PotcarMod(Potcar):
                 self.append(p)
 
 
+def _get_parallel_settings(vasp_input_set, incar, charge=0):
+    """
+    Tune the parallelization of a DefectRelaxSet/DefectStaticSet for its
+    node_layout ({'cores_per_node': ..., 'nodes': ...}) from its k-point
+    mesh and band count.
+    """
+    layout = vasp_input_set.node_layout
+    structure = vasp_input_set.structure
+    nkpts = get_irreducible_kpoint_count(vasp_input_set.kpoints, structure,
+                                         isym=incar.get('ISYM', 2))
+    nbands = incar.get('NBANDS')
+    if not nbands:
+        try:
+            nbands = get_default_nbands(vasp_input_set.nelect - charge,
+                                        len(structure),
+                                        ispin=incar.get('ISPIN', 1))
+        except (ValueError, IOError, OSError):
+            # Band count not known without POTCARs (no POTCAR directory
+            # set, or POTCAR of an element missing or unreadable)
+            nbands = None
+
+    return tune_parallelization(nkpts, layout['cores_per_node'],
+                                nodes=layout.get('nodes', 1), nbands=nbands)
+
+
 class DefectRelaxSet(MPRelaxSet):
     """
     Extension to MPRelaxSet which modifies some parameters appropriate
     for defect calculations
     Additional Args:
         charge: Charge of the defect structure
+        node_layout: Target node layout as {'cores_per_node': ...,
+            'nodes': ...}. If given, the fixed NPAR of the defect settings
+            is replaced by KPAR/NCORE tuned for the job.
     """
 
     def __init__(self, structure, **kwargs):
         charge = kwargs.pop('charge', 0)
+        node_layout = kwargs.pop('node_layout', None)
         user_incar_settings = kwargs.get('user_incar_settings', {})
         defect_settings = deepcopy(CONFIG['defect'])
         defect_settings.update(user_incar_settings)
         kwargs['user_incar_settings'] = defect_settings
 
-        super(self.__class__, self).__init__(structure, **kwargs)
+        super(DefectRelaxSet, self).__init__(structure, **kwargs)
         self.charge = charge
+        self.node_layout = node_layout
 
     @property
     def incar(self):
-        inc = super(self.__class__, self).incar
+        inc = super(DefectRelaxSet, self).incar
         try:
             if self.charge:
                 inc['NELECT'] = self.nelect - self.charge
         except:
             print("NELECT flag is not set due to non-availability of POTCARs")
 
+        if self.node_layout:
+            inc.pop('NPAR', None)
+            inc.update(self.get_parallel_settings(inc))
+
         return inc
 
+    def get_parallel_settings(self, incar):
+        """
+        KPAR/NCORE/NPAR tuned for node_layout. See tune_parallelization.
+        """
+        return _get_parallel_settings(self, incar, self.charge)
+
     @property
     def potcar(self):
         """
@@ -165,10 +291,42 @@ class DefectRelaxSet(MPRelaxSet):
                     'POSCAR': self.poscar}
 
 
+class DefectPreRelaxSet(DefectRelaxSet):
+    """
+    Cheap first stage of a two-stage defect relaxation. Uses the defect
+    settings loosened by the prerelax settings (lower ENCUT, loose EDIFFG,
+    no LOCPOT) and Gamma-only k-point sampling. The production stage is
+    then started from the CONTCAR of this stage.
+    Additional Args:
+        charge: Charge of the defect structure
+    """
+
+    def __init__(self, structure, **kwargs):
+        user_incar_settings = kwargs.get('user_incar_settings', {})
+        prerelax_settings = deepcopy(CONFIG['prerelax'])
+        prerelax_settings.update(kwargs.pop('user_prerelax_settings', {}))
+        incar_settings = deepcopy(user_incar_settings)
+        incar_settings.update(prerelax_settings)
+        kwargs['user_incar_settings'] = incar_settings
+
+        super(DefectPreRelaxSet, self).__init__(structure, **kwargs)
+
+    @property
+    def kpoints(self):
+        """
+        Gamma-only Kpoints object
+        """
+        return Kpoints.gamma_automatic()
+
+
 class DefectStaticSet(MPStaticSet):
     """
     Extension to MPStaticSet which modifies some parameters appropriate
     for bulk supercell calculation
+    Additional Args:
+        node_layout: Target node layout as {'cores_per_node': ...,
+            'nodes': ...}. If given, the fixed NPAR of the bulk settings
+            is replaced by KPAR/NCORE tuned for the job.
     """
 
     def __init__(self, structure, **kwargs):
@@ -176,8 +334,25 @@ class DefectStaticSet(MPStaticSet):
         bulk_settings = deepcopy(CONFIG['bulk'])
         bulk_settings.update(user_incar_settings)
         kwargs['user_incar_settings'] = bulk_settings
+        node_layout = kwargs.pop('node_layout', None)
 
         super(self.__class__, self).__init__(structure, **kwargs)
+        self.node_layout = node_layout
+
+    @property
+    def incar(self):
+        inc = super(DefectStaticSet, self).incar
+        if self.node_layout:
+            inc.pop('NPAR', None)
+            inc.update(self.get_parallel_settings(inc))
+
+        return inc
+
+    def get_parallel_settings(self, incar):
+        """
+        KPAR/NCORE/NPAR tuned for node_layout. See tune_parallelization.
+        """
+        return _get_parallel_settings(self, incar)
 
     @property
     def potcar(self):
@@ -285,7 +460,71 @@ def write_additional_files(path, trans_dict=None, incar={}, kpoints=None,
         incar.write_file(os.path.join(path, "INCAR.hse2"))
 
 
-def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
+def copy_prerelax_contcar(path):
+    """
+    Start the production stage of a two-stage defect relaxation from the
+    structure relaxed in the prerelax stage. The original POSCAR is kept
+    as POSCAR.orig.
+    Args:
+        path:
+            defect folder holding the production inputs and the
+            prerelax sub folder
+    """
+    contcar = os.path.join(path, PRERELAX_DIR, "CONTCAR")
+    if not os.path.exists(contcar):
+        raise IOError("No CONTCAR from prerelax stage in {}".format(path))
+
+    poscar = os.path.join(path, "POSCAR")
+    if os.path.exists(poscar) and \
+            not os.path.exists(os.path.join(path, "POSCAR.orig")):
+        shutil.copyfile(poscar, os.path.join(path, "POSCAR.orig"))
+    shutil.copyfile(contcar, poscar)
+
+
+def start_production_stages(path_base):
+    """
+    Hand the finished prerelax stages of the two-stage defect relaxations
+    recorded in the job manifest of path_base over to their production
+    stage: the prerelax CONTCAR is copied to the production POSCAR (see
+    copy_prerelax_contcar), and the hand-off is recorded in the manifest
+    ('structure_copied' of the production stage), so each job is handed
+    over once. Prerelax stages still running or without a CONTCAR are
+    left for a later call.
+    Args:
+        path_base:
+            root folder of the defect calculations
+    Returns:
+        sorted list of the manifest keys of the jobs handed over
+    """
+    manifest = load_job_manifest(path_base)
+    started = {}
+    for job_key, job in manifest.items():
+        stages = dict((stage['name'], stage) for stage in job.get('stages', []))
+        if 'prerelax' not in stages or 'production' not in stages or \
+                stages['production'].get('structure_copied'):
+            continue
+        job_fldr = os.path.join(path_base, *job_key.split('/'))
+        prerelax_fldr = os.path.join(job_fldr, stages['prerelax']['directory'])
+        if not os.path.exists(os.path.join(prerelax_fldr, "CONTCAR")) or \
+                not os.path.exists(resolve_output_path(
+                    os.path.join(prerelax_fldr, "vasprun.xml"))):
+            continue
+        # None for compressed outputs, only written once the run is done
+        probe = probe_calculation(prerelax_fldr)
+        if probe is not None and not probe['finished']:
+            continue
+
+        copy_prerelax_contcar(job_fldr)
+        stages['production']['structure_copied'] = True
+        started[job_key] = job
+
+    if started:
+        write_job_manifest(path_base, started)
+    return sorted(started)
+
+
+def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False,
+                           prerelax=False, node_layout=None):
     """
     Generates VASP files for defect computations
     Args:
@@ -299,8 +538,22 @@ def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
             generating vasp files. The format of the dictionary is
             {'defects:{'INCAR':{...},'KPOINTS':{...},
              'bulk':{'INCAR':{...},'KPOINTS':{...}}
+            INCAR settings for the prerelax stage are given under
+            'INCAR': {'prerelax': {...}}
         hse:
             hse run or not
+        prerelax:
+            If True, the defect relaxations are split in two stages:
+            a cheap Gamma-only prerelax stage written to the "prerelax"
+            sub folder, and the production stage in the defect folder,
+            to be started from the prerelax CONTCAR (see
+            start_production_stages). The stage layout is recorded in the
+            job manifest of path_base.
+        node_layout:
+            Target node layout of the jobs as {'cores_per_node': ...,
+            'nodes': ...}. If given, KPAR/NCORE/NPAR are tuned per job from
+            its band and irreducible k-point counts and recorded in the
+            job manifest.
     """
     bulk_sys = defects['bulk']['supercell']
     comb_defs = functools.reduce(lambda x, y: x+y, [
@@ -312,14 +565,22 @@ def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
     user_incar_blk_tmp = user_incar.pop('bulk', {})
     user_incar_blk_def = user_incar.pop('defects', {})
     user_incar.pop('dielectric', {})
+    user_incar_prerelax = user_incar.pop('prerelax', {})
     user_incar_blk = deepcopy(user_incar)
     user_incar_def = deepcopy(user_incar)
     user_incar_blk.update(user_incar_blk_tmp)
     user_incar_def.update(user_incar_blk_def)
     user_kpoints = user_settings.pop('KPOINTS', {})
+    kpoints = Kpoints.from_dict(user_kpoints) if user_kpoints else None
     potcar_settings = user_settings.pop('POTCAR', {})
     potcar_functional = potcar_settings.pop('functional', 'PBE')
 
+    def get_parallelization(vasp_input_set):
+        if not node_layout:
+            return None
+        return vasp_input_set.get_parallel_settings(vasp_input_set.incar)
+
+    manifest = {}
     for defect in comb_defs:
         for charge in defect['charges']:
             s = defect['supercell']
@@ -334,8 +595,10 @@ def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
 
             defect_relax_set = DefectRelaxSet(
                 s['structure'], user_incar_settings=user_incar_def,
+                user_kpoints_settings=kpoints,
                 user_potcar_settings=potcar_settings,
-                potcar_functional=potcar_functional, charge=charge)
+                potcar_functional=potcar_functional, charge=charge,
+                node_layout=node_layout)
 
             path = os.path.join(path_base, defect['name'],
                                 "charge_"+str(charge))
@@ -347,11 +610,31 @@ def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
             if potcar or not charge:
                 defect_relax_set.write_input(path)
                 incar = defect_relax_set.incar if hse else {}
-                kpoints = Kpoints.from_dict(user_kpoints) if user_kpoints \
-                    else None
 
                 write_additional_files(path, dict_transf, incar=incar,
                                        kpoints=kpoints, hse=hse)
+
+                stages = [{'name': 'production', 'directory': '.',
+                           'parallelization': get_parallelization(
+                               defect_relax_set)}]
+                if prerelax:
+                    defect_prerelax_set = DefectPreRelaxSet(
+                        s['structure'], user_incar_settings=user_incar_def,
+                        user_prerelax_settings=user_incar_prerelax,
+                        user_potcar_settings=potcar_settings,
+                        potcar_functional=potcar_functional, charge=charge,
+                        node_layout=node_layout)
+                    defect_prerelax_set.write_input(
+                        os.path.join(path, PRERELAX_DIR))
+                    stages[0]['structure_from'] = PRERELAX_DIR + '/CONTCAR'
+                    stages.insert(0, {'name': 'prerelax',
+                                      'directory': PRERELAX_DIR,
+                                      'parallelization': get_parallelization(
+                                          defect_prerelax_set)})
+
+                manifest[get_job_key(path_base, path)] = {
+                    'defect_type': defect['name'], 'charge': charge,
+                    'stages': stages, 'output_stage': 'production'}
             else:
                 os.makedirs(path)
                 with open(os.path.join(path, 'readme.txt'), 'w') as fp:
@@ -367,17 +650,25 @@ def make_vasp_defect_files(defects, path_base, user_settings={}, hse=False):
     #potcar_functional = user_potcar.get('functional', 'PBE')
     blk_static_set = DefectStaticSet(s['structure'],
                                      user_incar_settings=user_incar_blk,
+                                     user_kpoints_settings=kpoints,
                                      user_potcar_settings=potcar_settings,
-                                     potcar_functional=potcar_functional)
+                                     potcar_functional=potcar_functional,
+                                     node_layout=node_layout)
     path = os.path.join(path_base, 'bulk')
     blk_static_set.write_input(path)
 
     incar = blk_static_set.incar if hse else {}
-    kpoints = Kpoints.from_dict(user_kpoints) if user_kpoints else None
 
     write_additional_files(path, dict_transf, incar=incar, kpoints=kpoints,
                            hse=hse)
 
+    manifest['bulk'] = {'defect_type': 'bulk', 'charge': 0,
+                        'stages': [{'name': 'production', 'directory': '.',
+                                    'parallelization': get_parallelization(
+                                        blk_static_set)}],
+                        'output_stage': 'production'}
+    write_job_manifest(path_base, manifest)
+
 
 def make_vasp_defect_files_dos(defects, path_base, user_settings={}, 
                                hse=False, dos_limits=(-1,7)):
@@ -551,6 +842,7 @@ def make_vasp_dielectric_files(struct, path=None, user_settings={}, hse=False):
     user_incar = user_settings.pop('INCAR', {})
     user_incar.pop('bulk', {})
     user_incar.pop('defects', {})
+    user_incar.pop('prerelax', {})
     user_incar_diel = user_incar.pop('dielectric', {})
     user_incar.update(user_incar_diel)
     user_kpoints = user_settings.pop('KPOINTS', {})